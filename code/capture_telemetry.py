@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+
+"""
+Per channel capture telemetry for epg_assessment_channel_recorder.py.
+The recorder starts a ChannelTelemetry thread which samples every
+stream.mpeg2.ts its VLC demux dumps are writing to, and rewrites
+a Prometheus text format status file for the channel:
+  STORA_FOLDERS/telemetry/{channel}.prom
+
+Counters are kept in fixed size typed arrays, one slot per second
+over a rolling WINDOW, so memory stays flat over a broadcast day.
+VLC strips RTP headers before the demux dump, so RTP sequence gaps
+are measured as TS continuity counter gaps in the written packets.
+
+ChannelTelemetry.sample():
+1. Stat each tracked file, adding growth to bytes written this second
+   and the age of its last write (mtime) to write age samples
+2. Read newly written whole TS packets and count continuity
+   counter errors, packets lost in CC gaps and sync losses
+3. Read VLC media stats where available for bytes received
+4. Retire files that have stopped growing after a newer capture began
+5. Every QUALITY_EVERY seconds, and on retiring, write quality.json beside
+   each stream.mpeg2.ts: bytes, continuity errors, lost packets, seconds
+   without growth over GAP_SECONDS and byte offsets of packet losses, read
+   by merge_redundant_copies.py to choose between redundant recordings
+
+main():
+1. Serve every channel's .prom file concatenated at /metrics on
+   --port, so one scrape covers all channels on the host
+
+Usage:
+python3 capture_telemetry.py --port 9717
+
+2026
+"""
+
+import argparse
+import array
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_PATH = os.path.join(os.environ.get("STORA_FOLDERS", ""), "telemetry/")
+WINDOW = 60
+SAMPLES = 600
+RETIRE = 30
+TS_SIZE = 188
+SYNC = 0x47
+NULL_PID = 0x1FFF
+SCAN_LIMIT = 8 * 1024 * 1024
+GAP_SECONDS = 2
+QUALITY_EVERY = 30
+MAX_LOSSES = 10000
+
+
+class Rolling:
+    """
+    Per second totals over the last 'window' seconds,
+    slots are zeroed when reused for a new second
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.values = array.array("d", [0] * window)
+        self.seconds = array.array("q", [0] * window)
+
+    def add(self, second, value):
+        """
+        Add value to the slot for second
+        """
+        slot = second % self.window
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.values[slot] = 0
+        self.values[slot] += value
+
+    def total(self, second):
+        """
+        Sum of slots still inside the window
+        """
+        return sum(
+            self.values[slot]
+            for slot in range(0, self.window)
+            if second - self.window < self.seconds[slot] <= second
+        )
+
+
+class Samples:
+    """
+    Ring of the most recent 'size' samples for percentiles
+    """
+
+    def __init__(self, size=SAMPLES):
+        self.values = array.array("d", [0] * size)
+        self.count = 0
+
+    def add(self, value):
+        """
+        Overwrite oldest sample with value
+        """
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def percentile(self, pct):
+        """
+        Nearest rank percentile of held samples
+        """
+        held = sorted(self.values[: min(self.count, len(self.values))])
+        if not held:
+            return 0.0
+        return held[max(0, int(round(pct / 100 * len(held))) - 1)]
+
+
+class ChannelTelemetry:
+    """
+    Rolling capture counters for one channel, sampled
+    on a daemon thread and written as a .prom file
+    """
+
+    def __init__(self, channel, interval=1.0, path=TELEMETRY_PATH):
+        self.channel = channel
+        self.interval = interval
+        self.fpath = os.path.join(path, f"{channel}.prom")
+        self.lock = threading.Lock()
+        self.captures = {}
+        self.written = Rolling()
+        self.received = Rolling()
+        self.cc_errors = Rolling()
+        self.write_age = Samples()
+        self.totals = {"written": 0, "cc_errors": 0, "lost": 0, "sync": 0, "files": 0}
+        self.last_write = None
+        self.started = time.time()
+        self.halt = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Begin sampling in the background
+        """
+        if not self.interval or self.thread:
+            return
+        os.makedirs(os.path.dirname(self.fpath), exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name=f"telemetry-{self.channel}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        End sampling thread
+        """
+        self.halt.set()
+
+    def run(self):
+        """
+        Sample and rewrite status file every interval
+        """
+        while not self.halt.wait(self.interval):
+            try:
+                self.sample()
+                self.write()
+            except Exception as err:
+                # One bad sample must not end the thread
+                print(f"Telemetry sample failed for {self.channel}: {err!r}")
+
+    def track(self, outfile, media=None):
+        """
+        Follow a new capture file, ignoring bytes
+        already present where demux dump appends
+        """
+        try:
+            size = os.path.getsize(outfile)
+        except OSError:
+            size = 0
+        with self.lock:
+            previous = self.captures.get(outfile)
+            quality = previous["quality"] if previous else load_quality(outfile)
+            self.captures[outfile] = {
+                "media": media,
+                "size": size,
+                "offset": size,
+                "pending": b"",
+                "counters": {},
+                "read_bytes": None,
+                "grown": time.monotonic(),
+                "tracked": time.monotonic(),
+                "quality": quality,
+                "saved": time.monotonic(),
+            }
+            self.totals["files"] += 1
+
+    def sample(self):
+        """
+        Update counters from every tracked capture
+        """
+        now = time.time()
+        second = int(now)
+        mono = time.monotonic()
+        with self.lock:
+            captures = list(self.captures.items())
+        newest = max((cap["tracked"] for _, cap in captures), default=None)
+
+        for outfile, cap in captures:
+            try:
+                stat = os.stat(outfile)
+            except FileNotFoundError:
+                if mono - cap["tracked"] > RETIRE:
+                    self.retire(outfile)
+                continue
+
+            if stat.st_size < cap["size"]:
+                cap["offset"] = 0
+                cap["pending"] = b""
+                cap["counters"] = {}
+            grown = max(0, stat.st_size - cap["size"])
+            cap["size"] = stat.st_size
+            if grown:
+                if mono - cap["grown"] > GAP_SECONDS:
+                    cap["quality"]["gap_seconds"] += mono - cap["grown"]
+                cap["grown"] = mono
+                cap["quality"]["bytes"] = stat.st_size
+                self.written.add(second, grown)
+                self.totals["written"] += grown
+                self.last_write = max(self.last_write or 0, stat.st_mtime)
+                self.scan(outfile, cap, second)
+            elif cap["tracked"] != newest and mono - cap["grown"] > RETIRE:
+                self.retire(outfile)
+                continue
+            self.write_age.add(max(0.0, now - stat.st_mtime))
+            self.media_stats(cap, second)
+            if mono - cap["saved"] >= QUALITY_EVERY:
+                save_quality(outfile, cap)
+
+    def detach(self, media):
+        """
+        Drop references to media before the recorder
+        releases it, leaving its file followed until
+        it retires. Holds the lock media_stats() reads
+        under, so no get_stats() call is in progress
+        """
+        with self.lock:
+            for cap in self.captures.values():
+                if cap["media"] is media:
+                    cap["media"] = None
+
+    def retire(self, outfile):
+        """
+        Stop following a finished capture
+        """
+        with self.lock:
+            cap = self.captures.pop(outfile, None)
+        if cap and os.path.exists(outfile):
+            save_quality(outfile, cap)
+
+    def scan(self, outfile, cap, second):
+        """
+        Read only bytes written since last scan, from the
+        running offset, and count continuity counter errors
+        and lost packets. Bytes short of a whole packet are
+        kept in memory for the next scan, not reread
+        """
+        if cap["size"] - cap["offset"] > SCAN_LIMIT:
+            cap["offset"] = cap["size"] - SCAN_LIMIT
+            cap["pending"] = b""
+            cap["counters"] = {}
+        with open(outfile, "rb") as file:
+            file.seek(cap["offset"])
+            new = file.read(cap["size"] - cap["offset"])
+        data = cap["pending"] + new
+        base = cap["offset"] - len(cap["pending"])
+        cap["offset"] += len(new)
+
+        start = 0
+        if not data.startswith(bytes([SYNC])) or len(data) > TS_SIZE and data[TS_SIZE] != SYNC:
+            start = resync(data)
+            if start is None:
+                cap["pending"] = data[-TS_SIZE:]
+                return
+            self.totals["sync"] += 1
+        whole = (len(data) - start) // TS_SIZE
+        packets = data[start : start + whole * TS_SIZE]
+        syncs = packets[::TS_SIZE]
+        good = len(syncs) - len(syncs.lstrip(bytes([SYNC])))
+        packets = packets[: good * TS_SIZE]
+        cap["pending"] = data[start + len(packets) :]
+        base += start
+
+        errors = lost = 0
+        counters = cap["counters"]
+        losses = cap["quality"]["losses"]
+        for num, (pid_hi, pid_lo, flags) in enumerate(zip(packets[1::TS_SIZE], packets[2::TS_SIZE], packets[3::TS_SIZE])):
+            pid = (pid_hi & 0x1F) << 8 | pid_lo
+            if pid == NULL_PID or not flags & 0x10:
+                continue
+            counter = flags & 0x0F
+            last = counters.get(pid)
+            counters[pid] = counter
+            if last is None or counter == last:
+                continue
+            gap = (counter - last - 1) & 0x0F
+            if gap:
+                errors += 1
+                lost += gap
+                loss = base + num * TS_SIZE
+                if len(losses) < MAX_LOSSES and (not losses or losses[-1] != loss):
+                    losses.append(loss)
+
+        if errors:
+            self.cc_errors.add(second, errors)
+            self.totals["cc_errors"] += errors
+            self.totals["lost"] += lost
+            cap["quality"]["cc_errors"] += errors
+            cap["quality"]["lost"] += lost
+
+    def media_stats(self, cap, second):
+        """
+        Bytes received by VLC input since last sample
+        """
+        with self.lock:
+            if cap["media"] is None:
+                return
+            try:
+                import vlc
+
+                stats = vlc.MediaStats()
+                if not cap["media"].get_stats(stats):
+                    return
+            except (ImportError, AttributeError, TypeError):
+                cap["media"] = None
+                return
+        if cap["read_bytes"] is not None:
+            self.received.add(second, max(0, stats.read_bytes - cap["read_bytes"]))
+        cap["read_bytes"] = stats.read_bytes
+
+    def render(self):
+        """
+        Prometheus text exposition of current counters
+        """
+        now = time.time()
+        second = int(now)
+        span = max(1, min(WINDOW, now - self.started))
+        label = f'channel="{self.channel}"'
+        since = now - self.last_write if self.last_write else now - self.started
+        metrics = [
+            ("write_bytes_per_second", "gauge", "Bytes written per second over the window",
+             [("", self.written.total(second) / span)]),
+            ("receive_bytes_per_second", "gauge", "Bytes received by VLC per second over the window",
+             [("", self.received.total(second) / span)]),
+            ("written_bytes_total", "counter", "Bytes written since recorder start",
+             [("", self.totals["written"])]),
+            ("cc_errors_window", "gauge", "TS continuity counter errors over the window",
+             [("", self.cc_errors.total(second))]),
+            ("cc_errors_total", "counter", "TS continuity counter errors since recorder start",
+             [("", self.totals["cc_errors"])]),
+            ("lost_packets_total", "counter", "TS packets missing from continuity counter gaps",
+             [("", self.totals["lost"])]),
+            ("sync_losses_total", "counter", "TS sync byte losses in written data",
+             [("", self.totals["sync"])]),
+            ("write_age_seconds", "summary", "Age of the last write to capture files when sampled",
+             [(f',quantile="{pct / 100}"', self.write_age.percentile(pct)) for pct in (50, 95, 99)]),
+            ("last_packet_seconds", "gauge", "Seconds since any capture file last grew",
+             [("", since)]),
+            ("active_files", "gauge", "Capture files currently followed",
+             [("", len(self.captures))]),
+            ("files_total", "counter", "Capture files started since recorder start",
+             [("", self.totals["files"])]),
+        ]
+
+        lines = []
+        for name, kind, text, values in metrics:
+            lines.append(f"# HELP stora_capture_{name} {text}")
+            lines.append(f"# TYPE stora_capture_{name} {kind}")
+            for extra, value in values:
+                lines.append(f"stora_capture_{name}{{{label}{extra}}} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        Replace status file in one rename
+        """
+        tmp = f"{self.fpath}.tmp"
+        with open(tmp, "w") as file:
+            file.write(self.render())
+        os.replace(tmp, self.fpath)
+
+
+def quality_path(outfile):
+    """
+    quality.json beside a capture file
+    """
+    return os.path.join(os.path.dirname(outfile), "quality.json")
+
+
+def load_quality(outfile):
+    """
+    Quality stats already written for outfile, where
+    appending after a restart, adding the time since
+    the file last grew as a gap. Missing keys start
+    at zero, an unreadable file starts afresh
+    """
+    try:
+        with open(quality_path(outfile), "r") as file:
+            saved = json.load(file)
+        return {
+            "bytes": int(saved.get("bytes", 0)),
+            "cc_errors": int(saved.get("cc_errors", 0)),
+            "lost": int(saved.get("lost", 0)),
+            "gap_seconds": float(saved.get("gap_seconds", 0.0))
+            + max(0.0, time.time() - os.path.getmtime(outfile)),
+            "losses": [int(loss) for loss in saved.get("losses", [])],
+        }
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {"bytes": 0, "cc_errors": 0, "lost": 0, "gap_seconds": 0.0, "losses": []}
+
+
+def save_quality(outfile, cap):
+    """
+    Replace capture's quality.json in one rename
+    """
+    cap["saved"] = time.monotonic()
+    fpath = quality_path(outfile)
+    tmp = f"{fpath}.tmp"
+    try:
+        with open(tmp, "w") as file:
+            json.dump(cap["quality"], file)
+        os.replace(tmp, fpath)
+    except OSError as err:
+        print(f"Unable to write {fpath}: {err}")
+
+
+def resync(data):
+    """
+    Offset of first sync byte followed by another
+    one packet later, or None if not found
+    """
+    pos = data.find(bytes([SYNC]))
+    while 0 <= pos < len(data) - TS_SIZE:
+        if data[pos + TS_SIZE] == SYNC:
+            return pos
+        pos = data.find(bytes([SYNC]), pos + 1)
+    return None
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serve all channel status files at /metrics
+    """
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = []
+        for fname in sorted(os.listdir(self.server.path)):
+            if fname.endswith(".prom"):
+                with open(os.path.join(self.server.path, fname), "rb") as file:
+                    body.append(file.read())
+        body = b"".join(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Silence per-request logging to STDERR
+        """
+
+
+def main():
+    """
+    Serve channel telemetry files over HTTP
+    """
+    parser = argparse.ArgumentParser(description="Serve STORA capture telemetry for Prometheus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9717)
+    parser.add_argument("--path", default=TELEMETRY_PATH)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+    server.path = args.path
+    print(f"Serving {args.path} at http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+"""
+Shares the channels in channels.json between STORA recorder
+hosts through lease files on shared storage, so recording can scale
+past one server's NIC and disks and survive the loss of a host.
+
+Every host mounts the same STORA_LEASES folder, names itself with
+STORA_HOST (default its hostname) and runs this script each minute
+from crontab. LeaseStore keeps all file access in one place, so a
+test stand-in or a network coordinator can replace it.
+
+main():
+1. Write this host's heartbeat to hosts/{host}.json, keeping the
+   time it came up while its heartbeats stay fresh
+2. Hosts with a heartbeat under HOST_TIMEOUT seconds old are live
+3. Each channel is placed on a live host by rendezvous hashing, so
+   losing a host only moves that host's channels and a new host
+   only takes the channels it now wins
+4. Channels placed here are claimed when their lease in
+   channels/{channel}.json is absent, expired or held by a dead
+   host. Leases held here are renewed for LEASE_SECONDS. Every
+   lease write holds channels/{channel}.claim, created with
+   O_EXCL, and rereads the lease first, so two hosts cannot
+   both claim a channel
+5. A channel held here but placed on another host is handed to it
+   once that host has been live for STABLE_SECONDS, so a returning
+   host takes its channels back without flapping
+6. Logs the channels this host holds
+
+epg_assessment_channel_recorder.py reads the lease when STORA_LEASES
+is set and exits when another host holds its channel. The crontab
+restart script runs --holds before writing its restart marker, so a
+recorder is only launched on the lease holder.
+
+Usage:
+python3 channel_leases.py
+python3 channel_leases.py --status
+python3 channel_leases.py --holds CHANNEL (exit status 0 if held here)
+
+2026
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import time
+
+import channel_registry
+
+# Static global variables
+LEASES = os.environ.get('STORA_LEASES')
+HOST = os.environ.get('STORA_HOST', socket.gethostname())
+HOST_TIMEOUT = 90
+LEASE_SECONDS = 180
+STABLE_SECONDS = 300
+
+LOGGER = logging.getLogger('channel_leases')
+
+
+class LeaseStore:
+    """
+    Host heartbeats and channel leases held
+    as JSON files in a shared folder
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        os.makedirs(os.path.join(path, 'hosts'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'channels'), exist_ok=True)
+
+    def read(self, *parts):
+        """
+        JSON file under the store, None if absent
+        """
+        try:
+            with open(os.path.join(self.path, *parts), 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Caught mid write by another host
+            return None
+
+    def write(self, data, *parts):
+        """
+        Replace JSON file under the store via temporary
+        file, so other hosts never read a partial file
+        """
+        fpath = os.path.join(self.path, *parts)
+        temp_file = f"{fpath}.{HOST}.tmp"
+        with open(temp_file, 'w') as file:
+            json.dump(data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, fpath)
+
+    def heartbeat(self, host):
+        """
+        Record host as alive now
+        """
+        now = self.clock()
+        last = self.read('hosts', f"{host}.json")
+        started = now
+        if last and now - last['seen'] < HOST_TIMEOUT:
+            started = last['started']
+        self.write({'host': host, 'seen': now, 'started': started}, 'hosts', f"{host}.json")
+
+    def live_hosts(self):
+        """
+        Dictionary of live host names and the
+        time each came up
+        """
+        now = self.clock()
+        hosts = {}
+        for fname in os.listdir(os.path.join(self.path, 'hosts')):
+            if not fname.endswith('.json'):
+                continue
+            beat = self.read('hosts', fname)
+            if beat and now - beat['seen'] < HOST_TIMEOUT:
+                hosts[beat['host']] = beat['started']
+        return hosts
+
+    def lease(self, channel):
+        """
+        Current lease for channel or None
+        """
+        return self.read('channels', f"{channel}.json")
+
+    def grant(self, channel, host, seen):
+        """
+        Write channel's lease to host for LEASE_SECONDS where
+        it is still the lease seen, holding the channel's claim
+        file meanwhile. True if the lease was written
+        """
+        claim = os.path.join(self.path, 'channels', f"{channel}.claim")
+        try:
+            fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            self.clear_claim(claim)
+            return False
+        try:
+            os.write(fd, HOST.encode())
+            os.close(fd)
+            if self.lease(channel) != seen:
+                LOGGER.info("Lease for %s changed by another host, not written", channel)
+                return False
+            self.write({'channel': channel, 'host': host, 'expires': self.clock() + LEASE_SECONDS}, 'channels', f"{channel}.json")
+            return True
+        finally:
+            os.remove(claim)
+
+    def clear_claim(self, claim):
+        """
+        Remove a claim file left by a host that
+        died mid write, once HOST_TIMEOUT old
+        """
+        try:
+            if time.time() - os.path.getmtime(claim) > HOST_TIMEOUT:
+                LOGGER.warning("Removing stale claim %s", claim)
+                os.remove(claim)
+        except FileNotFoundError:
+            pass
+
+
+def placement(channel, hosts):
+    """
+    Rendezvous hashing, the live host with the
+    highest hash for the channel records it
+    """
+    if not hosts:
+        return None
+    return max(sorted(hosts), key=lambda host: hashlib.sha1(f"{channel}:{host}".encode()).digest())
+
+
+def balance(store, channels, host):
+    """
+    Claim, renew and hand over channel leases for
+    host, return list of channels it now holds
+    """
+    store.heartbeat(host)
+    hosts = store.live_hosts()
+    now = store.clock()
+    held = []
+    for channel in channels:
+        target = placement(channel, hosts)
+        lease = store.lease(channel)
+        holder = lease['host'] if lease else None
+        free = lease is None or lease['expires'] < now or holder not in hosts
+
+        if holder == host and target != host and now - hosts[target] >= STABLE_SECONDS:
+            LOGGER.info("Handing %s to %s", channel, target)
+            store.grant(channel, target, lease)
+        elif holder == host:
+            if store.grant(channel, host, lease):
+                held.append(channel)
+        elif target == host and free:
+            LOGGER.info("Claiming %s, lease was held by %s", channel, holder)
+            if store.grant(channel, host, lease):
+                held.append(channel)
+    return held
+
+
+def holds(path, channel, host=HOST):
+    """
+    True where host holds the channel's lease, False
+    where it is absent or another host's, None where
+    the lease file cannot be parsed
+    """
+    try:
+        with open(os.path.join(path, 'channels', f"{channel}.json"), 'r') as file:
+            return json.load(file)['host'] == host
+    except FileNotFoundError:
+        return False
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def main():
+    """
+    Heartbeat, then balance channel leases
+    across live recorder hosts
+    """
+    parser = argparse.ArgumentParser(description="Share STORA channels between recorder hosts")
+    parser.add_argument('--status', action='store_true', help="Print live hosts and channel leases only")
+    parser.add_argument('--holds', metavar='CHANNEL', help="Exit 0 if this host holds CHANNEL's lease, else 1")
+    args = parser.parse_args()
+    if not LEASES:
+        raise SystemExit("STORA_LEASES is not set, channels are not sharded")
+    if args.holds:
+        sys.exit(0 if holds(LEASES, args.holds) else 1)
+
+    logging.basicConfig(
+        filename=os.path.join(os.environ['STORA_FOLDERS'], 'logs/channel_leases.log'),
+        format='%(asctime)s\t%(levelname)s\t%(message)s', level=logging.INFO
+    )
+    channels = list(channel_registry.channels())
+    store = LeaseStore(LEASES)
+
+    if args.status:
+        print(f"Live hosts: {sorted(store.live_hosts())}")
+        for channel in channels:
+            print(f"{channel}: {store.lease(channel)}")
+        return
+
+    held = balance(store, channels, HOST)
+    LOGGER.info("%s holds %s channels: %s", HOST, len(held), ', '.join(held))
+
+
+if __name__ == '__main__':
+    main()
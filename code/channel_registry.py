@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Single registry of STORA channels, in place of channel lists kept
+in each script and the separate stream_config.json,
+stream_config_udp.json and channel_timings.json documents. Adding
+a channel means one entry in channels.json.
+
+Each channels.json entry holds:
+name - display name used in info.csv and schedule checks
+rtp - RTP address of the channel's FreeSat stream
+sid - DVB service ID
+udp - UDP address of the channel's EIT feed, optional
+pa - name of the environment variable holding the PATV channel ID,
+     optional for channels without PATV schedules
+timings - operational window for EIT failure checks as
+          "HH:MM:SS - hours", optional and defaults to all day
+
+channels():
+1. Reads and validates channels.json once per process, raising
+   RegistryError that lists every fault found
+2. Returns a read-only mapping of channel key to Channel, kept
+   for later calls so no script parses the config twice
+
+2026
+"""
+
+import collections
+import datetime
+import functools
+import json
+import os
+import re
+import types
+
+CONFIG = "channels.json"
+FORMAT = "%Y-%m-%d %H:%M:%S"
+ALL_DAY = "00:00:00 - 24"
+TIMINGS = re.compile(r"^(\d{2}:\d{2}:\d{2}) - (\d{1,2})$")
+
+
+class RegistryError(ValueError):
+    """
+    channels.json is missing or invalid
+    """
+
+
+class Channel(collections.namedtuple(
+    "Channel", ["key", "name", "rtp", "sid", "udp", "pa", "pa_id", "start", "hours"]
+)):
+    """
+    One channel's streams, PATV ID and operational window
+    """
+
+    __slots__ = ()
+
+    def window(self, day):
+        """
+        Operational start and end datetimes
+        for the given date
+        """
+        start = datetime.datetime.strptime(f"{day} {self.start}", FORMAT)
+        return start, start + datetime.timedelta(hours=self.hours)
+
+
+def config_path():
+    """
+    channels.json beside the code, as CODE is set
+    """
+    return os.path.join(os.environ.get("CODE", os.path.dirname(os.path.abspath(__file__))), CONFIG)
+
+
+def build(key, entry):
+    """
+    Channel for one entry, or list of faults
+    """
+    faults = []
+    if not isinstance(entry, dict):
+        return [f"{key}: entry is not an object"]
+    if not entry.get("name"):
+        faults.append(f"{key}: name missing")
+    if not str(entry.get("rtp", "")).startswith("rtp://"):
+        faults.append(f"{key}: rtp address missing or not rtp://")
+    if not isinstance(entry.get("sid"), int):
+        faults.append(f"{key}: sid missing or not an integer")
+    udp = entry.get("udp")
+    if udp is not None and not str(udp).startswith("udp://"):
+        faults.append(f"{key}: udp address not udp://")
+    match = TIMINGS.match(entry.get("timings", ALL_DAY))
+    if not match or not 0 < int(match.group(2)) <= 24:
+        faults.append(f"{key}: timings not 'HH:MM:SS - hours'")
+    if faults:
+        return faults
+
+    pa = entry.get("pa")
+    return Channel(
+        key=key,
+        name=entry["name"],
+        rtp=entry["rtp"],
+        sid=entry["sid"],
+        udp=udp,
+        pa=pa,
+        pa_id=os.environ.get(pa) if pa else None,
+        start=match.group(1),
+        hours=int(match.group(2)),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load(path):
+    """
+    Read and validate channels.json into
+    a read-only mapping of Channel
+    """
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError) as err:
+        raise RegistryError(f"Unable to read {path}: {err}") from err
+
+    registry = {}
+    faults = []
+    for key, entry in data.items():
+        if key == "help":
+            continue
+        channel = build(key, entry)
+        if isinstance(channel, list):
+            faults.extend(channel)
+        else:
+            registry[key] = channel
+    if faults:
+        raise RegistryError(f"{path} invalid: {'; '.join(faults)}")
+    return types.MappingProxyType(registry)
+
+
+def channels(path=None):
+    """
+    All channels keyed by channel name
+    """
+    return load(path or config_path())
+
+
+def channel(key, path=None):
+    """
+    Channel for key, RegistryError if absent
+    """
+    try:
+        return channels(path)[key]
+    except KeyError:
+        raise RegistryError(f"Channel {key} not in {path or config_path()}") from None
+
+
+def with_field(field, path=None):
+    """
+    Channels that have the given optional field set,
+    such as 'udp' or 'pa_id'
+    """
+    return {key: chnl for key, chnl in channels(path).items() if getattr(chnl, field) is not None}
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+"""
+Daily recording coverage and gap analysis per channel, in place of
+piecing gaps together by hand from restart_*.txt, epgrecording_*.txt
+and the recording logs.
+
+Programme folders are read from STORAGE_PATH and, once moved by
+stora_channel_move_qnap04.py, from STORA_PATH. Marker files and
+recording.log stay in STORAGE_PATH. Folders are parsed a channel/day
+at a time with folder_names.parse_listing(), so start and end times
+arrive as arrays of seconds from midnight and coverage is a sorted
+sweep over integers. A programme running past midnight covers the
+start of the following day.
+
+Folder names, epgrecording_*.txt markers and recording.log lines are
+UTC, while channels.json timings and restart_*.txt markers (named and
+filed by the shell's local date) are local wall-clock time. Those are
+converted to UTC before the sweep, so a day means a UTC day throughout.
+
+main():
+1. For each channel in channels.json and each day from --start to
+   --end (default yesterday), list programme folders and markers
+   from both storage paths, and size each stream.mpeg2.ts. Folders
+   without a stream, or with an empty one, cover nothing
+2. Expected seconds are the channel's operational window from
+   channels.json within the day
+3. Sweep folder intervals in start order for covered seconds, gaps
+   and overlapping seconds (recorded twice)
+4. Annotate each gap with restart_*.txt and epgrecording_*.txt
+   markers and 'Missed scheduled recording' log lines that fall
+   within MARKER_SLACK seconds of it
+5. Merge the days into STORA_FOLDERS/coverage/{channel}.json,
+   keyed by date, replacing days already reported
+
+With --query the reports are read without scanning storage, and
+channel/days below --below percent coverage are printed.
+
+Usage:
+python3 coverage_report.py [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--channel CHANNEL]
+python3 coverage_report.py --query [--below PERCENT] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+2026
+"""
+
+import argparse
+import array
+import collections
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+import channel_registry
+import folder_names
+import stora_core
+
+# Global paths
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+STORA_PTH = os.environ.get('STORA_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
+LOG_FILE = os.path.join(FOLDERS, 'logs/coverage_report.log')
+REPORTS = os.path.join(FOLDERS, 'coverage/')
+STREAM = 'stream.mpeg2.ts'
+RECORDING_LOG = 'recording.log'
+MISSED = 'Missed scheduled recording'
+MARKERS = {'restarts': 'restart_', 'epg': 'epgrecording_'}
+MARKER_FORMAT = '%Y-%m-%d_%H:%M:%S'
+LOCAL_MARKERS = ('restarts',)
+MARKER_SLACK = 600
+DAY = 86400
+
+ChannelDay = collections.namedtuple('ChannelDay', ['listing', 'sizes', 'markers'])
+
+
+def clock(offset):
+    """
+    Seconds from midnight as HH:MM:SS, 24:00:00 at day end
+    """
+    return f"{offset // 3600:02d}:{offset // 60 % 60:02d}:{offset % 60:02d}"
+
+
+def utc(local):
+    """
+    Naive local wall-clock datetime as naive UTC
+    """
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def scan(chnl, day):
+    """
+    Programme folder paths, marker offsets and
+    recording.log path for one channel/day
+    across both storage paths. The next day's
+    folder is read for local markers too, which
+    sit a day ahead late in the UTC day
+    """
+    folders = {}
+    markers = {kind: [] for kind in MARKERS}
+    markers['missed'] = []
+    midnight = folder_names.midnight(day)
+    for root in (STORA_PTH, STORAGE_PATH):
+        for date in (midnight, midnight + timedelta(1)):
+            chnl_path = os.path.join(stora_core.day_paths(root, date).path, chnl)
+            try:
+                entries = list(os.scandir(chnl_path))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    if date == midnight:
+                        folders.setdefault(entry.name, entry.path)
+                    continue
+                for kind, prefix in MARKERS.items():
+                    if entry.name.startswith(prefix) and entry.name.endswith('.txt'):
+                        try:
+                            when = datetime.strptime(entry.name[len(prefix):-4], MARKER_FORMAT)
+                        except ValueError:
+                            continue
+                        if kind in LOCAL_MARKERS:
+                            when = utc(when)
+                        offset = int((when - midnight).total_seconds())
+                        if 0 <= offset < DAY:
+                            markers[kind].append(offset)
+                if entry.name == RECORDING_LOG and date == midnight:
+                    markers['missed'].extend(missed_offsets(entry.path))
+    return folders, markers
+
+
+def missed_offsets(fpath):
+    """
+    Offsets of missed recordings noted
+    in a channel/day recording.log
+    """
+    offsets = []
+    try:
+        with open(fpath, 'r', errors='replace') as file:
+            for line in file:
+                if MISSED not in line:
+                    continue
+                try:
+                    offsets.append(folder_names.seconds(*line[:8].split(':')))
+                except (TypeError, ValueError):
+                    continue
+    except OSError:
+        pass
+    return offsets
+
+
+def channel_day(chnl, day):
+    """
+    ChannelDay of parsed folders, stream sizes and markers
+    """
+    folders, markers = scan(chnl, day)
+    listing = folder_names.parse_listing(sorted(folders), day)
+    sizes = array.array('q')
+    for name in listing.names:
+        try:
+            sizes.append(os.stat(os.path.join(folders[name], STREAM)).st_size)
+        except OSError:
+            sizes.append(0)
+    return ChannelDay(listing, sizes, {kind: sorted(offsets) for kind, offsets in markers.items()})
+
+
+def expected(chnl, day):
+    """
+    Operational window intervals within the UTC day,
+    in seconds, from the local windows of the day and
+    those either side, converted to UTC
+    """
+    midnight = folder_names.midnight(day)
+    intervals = []
+    for date in (midnight - timedelta(1), midnight, midnight + timedelta(1)):
+        start, end = (utc(when) for when in chnl.window(date.strftime('%Y-%m-%d')))
+        lo = max(int((start - midnight).total_seconds()), 0)
+        hi = min(int((end - midnight).total_seconds()), DAY)
+        if hi <= lo:
+            continue
+        if intervals and lo <= intervals[-1][1]:
+            intervals[-1] = (intervals[-1][0], max(hi, intervals[-1][1]))
+        else:
+            intervals.append((lo, hi))
+    return intervals
+
+
+def intervals(today, yesterday):
+    """
+    Start and end arrays of the day's folders with
+    a stream, plus the previous day's folders
+    running past midnight shifted onto this day
+    """
+    starts = array.array('l')
+    ends = array.array('l')
+    for idx, size in enumerate(today.sizes):
+        if size:
+            starts.append(today.listing.starts[idx])
+            ends.append(today.listing.ends[idx])
+    if yesterday:
+        for idx, size in enumerate(yesterday.sizes):
+            if size and yesterday.listing.ends[idx] > DAY:
+                starts.append(yesterday.listing.starts[idx] - DAY)
+                ends.append(yesterday.listing.ends[idx] - DAY)
+    return starts, ends
+
+
+def sweep(starts, ends, lo, hi):
+    """
+    Covered seconds, overlapping seconds and gaps
+    of the intervals between lo and hi seconds
+    """
+    covered = total = 0
+    gaps = []
+    reach = lo
+    for idx in sorted(range(len(starts)), key=starts.__getitem__):
+        start, end = max(starts[idx], lo), min(ends[idx], hi)
+        if end <= start:
+            continue
+        total += end - start
+        if start > reach:
+            gaps.append((reach, start))
+        if end > reach:
+            covered += end - max(start, reach)
+            reach = end
+    if reach < hi:
+        gaps.append((reach, hi))
+    return covered, total - covered, gaps
+
+
+def annotate(gap, markers):
+    """
+    Gap entry with the markers found near it
+    """
+    start, end = gap
+    entry = {'start': clock(start), 'end': clock(end), 'seconds': end - start}
+    for kind, offsets in markers.items():
+        entry[kind] = [clock(offset) for offset in offsets if start - MARKER_SLACK <= offset <= end + MARKER_SLACK]
+    return entry
+
+
+def analyse(chnl, day, today, yesterday):
+    """
+    Coverage report entry for one channel/day
+    """
+    starts, ends = intervals(today, yesterday)
+    window = expected(chnl, day)
+    covered = overlap = 0
+    gaps = []
+    for lo, hi in window:
+        cov, over, found = sweep(starts, ends, lo, hi)
+        covered += cov
+        overlap += over
+        gaps.extend(found)
+
+    due = sum(hi - lo for lo, hi in window)
+    listing = today.listing
+    return {
+        'expected': due,
+        'covered': covered,
+        'coverage': round(100 * covered / due, 2) if due else 100.0,
+        'overlap': overlap,
+        'folders': len(listing.names),
+        'bytes': sum(today.sizes),
+        'empty': [name for name, size in zip(listing.names, today.sizes) if not size],
+        'rejected': listing.rejected,
+        'gaps': [annotate(gap, today.markers) for gap in gaps],
+        'restarts': [clock(offset) for offset in today.markers['restarts']],
+        'epg': [clock(offset) for offset in today.markers['epg']],
+        'missed': [clock(offset) for offset in today.markers['missed']],
+    }
+
+
+def read_report(chnl):
+    """
+    Channel's report keyed by date, empty if none
+    """
+    try:
+        with open(os.path.join(REPORTS, f"{chnl}.json"), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_report(chnl, days):
+    """
+    Merge days into the channel's report via
+    temporary file, replacing dates present
+    """
+    report = read_report(chnl)
+    report.update(days)
+    fpath = os.path.join(REPORTS, f"{chnl}.json")
+    temp_file = f"{fpath}.tmp"
+    with open(temp_file, 'w') as file:
+        json.dump(dict(sorted(report.items())), file, indent=1)
+    os.replace(temp_file, fpath)
+
+
+def query(channels, dates, below):
+    """
+    Print channel/days under below percent
+    coverage from the stored reports
+    """
+    for chnl in channels:
+        report = read_report(chnl)
+        for date in dates:
+            entry = report.get(date)
+            if entry is None or entry['coverage'] >= below:
+                continue
+            print(
+                f"{chnl}\t{date}\t{entry['coverage']:.2f}%\t{len(entry['gaps'])} gaps\t"
+                f"{len(entry['restarts'])} restarts\t{len(entry['epg'])} epg\t{len(entry['missed'])} missed"
+            )
+
+
+def main(today=None):
+    """
+    Analyse or query coverage of each channel
+    over the days requested
+    """
+    yesterday = ((today or datetime.now()) - timedelta(1)).strftime('%Y-%m-%d')
+    parser = argparse.ArgumentParser(description="Report daily recording coverage and gaps per channel")
+    parser.add_argument('--start', default=yesterday)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--channel', default=None, help="Single channel from channels.json")
+    parser.add_argument('--query', action='store_true', help="Print days from stored reports only")
+    parser.add_argument('--below', type=float, default=100.0, help="Coverage percent to print under with --query")
+    args = parser.parse_args()
+    stora_core.require_env('STORAGE_PATH', 'STORA_PATH', 'STORA_FOLDERS')
+
+    first = folder_names.midnight(args.start)
+    last = folder_names.midnight(args.end or args.start)
+    days = [first + timedelta(num) for num in range((last - first).days + 1)]
+    channels = [args.channel] if args.channel else list(channel_registry.channels())
+    if args.query:
+        query(channels, [day.strftime('%Y-%m-%d') for day in days], args.below)
+        return
+
+    logging.basicConfig(filename=LOG_FILE, filemode='a', format=stora_core.LOG_FORMAT, level=logging.INFO)
+    os.makedirs(REPORTS, exist_ok=True)
+    logging.info("========= COVERAGE REPORT START %s to %s ====================", days[0].date(), days[-1].date())
+    for key in channels:
+        chnl = channel_registry.channel(key)
+        previous = channel_day(key, days[0] - timedelta(1))
+        results = {}
+        for day in days:
+            current = channel_day(key, day)
+            entry = analyse(chnl, day, current, previous)
+            results[day.strftime('%Y-%m-%d')] = entry
+            previous = current
+            if entry['gaps'] or entry['rejected']:
+                logging.info(
+                    "%s %s coverage %s%%, %s gaps, %s overlap seconds, rejected %s",
+                    key, day.date(), entry['coverage'], len(entry['gaps']), entry['overlap'], entry['rejected'],
+                )
+        write_report(key, results)
+    logging.info("========= COVERAGE REPORT END ====================\n")
+
+
+if __name__ == '__main__':
+    main()
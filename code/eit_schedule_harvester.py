@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+
+"""
+Harvest DVB EIT actual schedule tables (table_id 0x50-0x5F) from
+each channel's UDP feed and build multi-day schedules locally, in
+the same {channel}_schedule_{YYYY-MM-DD}.json format as
+fetch_stora_schedule.py. A zero API cost fallback and cross-check
+for PATV when the network or PATV is slow or down.
+
+main():
+1. For each channel with a UDP EIT feed in channels.json (or those
+   given as arguments) read the feed for STORA_EIT_HARVEST seconds (default
+   90, long enough for the slowest schedule repetition), keeping
+   only EIT PID 0x12 packets
+2. Reassemble sections with ts_filter.SectionReader, drop any that
+   fail CRC, are not 'actual' schedule tables or belong to another
+   service than the channel's SID in channels.json. A section
+   version change discards the table's older sections
+3. Decode events (MJD/BCD start, BCD duration, short event
+   descriptor title) and group them by UTC start date
+4. Only days whose three hour segments are all complete, from the
+   current segment on, are written to schedules/eit/. Partial days
+   are logged with their section coverage
+5. Each written day is compared with the PATV schedule where one
+   exists, logging programmes missing from either and mismatched
+   titles. With --fallback, days with no PATV schedule are also
+   copied to schedules/ for the recorders and listed in
+   schedules/eit/fallback.json. Later harvests refresh listed copies
+   and fetch_stora_schedule.py replaces them once PATV returns the day
+6. EIT schedules over two days old are removed
+
+Freesat Huffman coded titles (0x1F) are not decoded, those events
+are written with a null programme title.
+
+Usage:
+python3 eit_schedule_harvester.py [--fallback] [channel ...]
+python3 eit_schedule_harvester.py --file stream.mpeg2.ts bbconehd
+
+2026
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import logging
+import os
+import socket
+import struct
+import time
+
+import channel_registry
+import stora_core
+import stora_records
+import ts_filter
+
+# Static global variables
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
+SCHEDULES = os.path.join(FOLDERS, 'schedules/')
+EIT_SCHEDULES = os.path.join(SCHEDULES, 'eit/')
+FALLBACKS = os.path.join(EIT_SCHEDULES, 'fallback.json')
+HARVEST = int(os.environ.get('STORA_EIT_HARVEST', 90))
+FDATE = "%Y-%m-%d"
+MJD_EPOCH = datetime.date(1858, 11, 17)
+SCHEDULE_TABLES = range(0x50, 0x60)
+SEGMENT_HOURS = 3
+TS_SIZE = ts_filter.TS_SIZE
+DATAGRAM = 65536
+
+# Setup logging, file handler added in main()
+LOGGER = logging.getLogger('eit_schedule_harvester')
+
+
+def crc_table():
+    """
+    MPEG-2 CRC32 lookup table
+    """
+    table = []
+    for num in range(0, 256):
+        crc = num << 24
+        for _ in range(0, 8):
+            crc = (crc << 1) ^ 0x04C11DB7 if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+CRC_TABLE = crc_table()
+
+
+def crc_ok(section):
+    """
+    Check section CRC32, zero over the whole
+    section including the CRC when intact
+    """
+    crc = 0xFFFFFFFF
+    for byte in section:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ CRC_TABLE[(crc >> 24) ^ byte]
+    return crc == 0
+
+
+def bcd(byte):
+    """
+    Two digit binary coded decimal
+    """
+    return (byte >> 4) * 10 + (byte & 0x0F)
+
+
+def dvb_time(data):
+    """
+    MJD date and BCD UTC time to datetime,
+    None where undefined
+    """
+    if data == b"\xff" * 5:
+        return None
+    date = MJD_EPOCH + datetime.timedelta(days=data[0] << 8 | data[1])
+    try:
+        return datetime.datetime(date.year, date.month, date.day, bcd(data[2]), bcd(data[3]), bcd(data[4]))
+    except ValueError:
+        return None
+
+
+def dvb_text(raw):
+    """
+    Decode a DVB text field, dropping emphasis and
+    other control codes. None for Huffman coded text
+    """
+    if not raw:
+        return ""
+    first = raw[0]
+    if first == 0x1F:
+        return None
+    if first == 0x15:
+        text = raw[1:].decode("utf-8", "replace")
+    elif first == 0x10:
+        text = raw[3:].decode("latin1")
+    elif first < 0x20:
+        text = raw[1:].decode("latin1")
+    else:
+        text = raw.decode("latin1")
+    # 0x8A is a DVB line break, other C1 codes are emphasis
+    text = "".join(" " if char == "\x8a" else char for char in text if char == "\x8a" or not "\x80" <= char <= "\x9f")
+    return " ".join(text.split())
+
+
+def event_title(descriptors):
+    """
+    Event name from the first short event descriptor
+    """
+    pos = 0
+    while pos + 2 <= len(descriptors):
+        tag = descriptors[pos]
+        length = descriptors[pos + 1]
+        body = descriptors[pos + 2 : pos + 2 + length]
+        pos += 2 + length
+        if tag == 0x4D and len(body) >= 4:
+            return dvb_text(body[4 : 4 + body[3]])
+    return ""
+
+
+def parse_events(section):
+    """
+    Events of an EIT section as dictionaries
+    """
+    events = []
+    pos = 14
+    end = len(section) - 4
+    while pos + 12 <= end:
+        event_id = section[pos] << 8 | section[pos + 1]
+        start = dvb_time(section[pos + 2 : pos + 7])
+        seconds = bcd(section[pos + 7]) * 3600 + bcd(section[pos + 8]) * 60 + bcd(section[pos + 9])
+        loop = (section[pos + 10] & 0x0F) << 8 | section[pos + 11]
+        descriptors = section[pos + 12 : pos + 12 + loop]
+        pos += 12 + loop
+        if start is None:
+            continue
+        events.append({
+            "event_id": event_id,
+            "start": start,
+            "seconds": seconds,
+            "title": event_title(descriptors),
+        })
+    return events
+
+
+class ScheduleHarvest:
+    """
+    Collect EIT schedule sections for one service
+    """
+
+    def __init__(self, sid):
+        self.sid = int(sid)
+        self.reader = ts_filter.SectionReader()
+        self.versions = {}
+        self.sections = {}
+        self.segments = {}
+        self.last_sections = {}
+        self.counts = {"sections": 0, "crc": 0, "versions": 0}
+        self.carry = b""
+
+    def feed(self, data):
+        """
+        Read EIT packets from whole TS packets in data,
+        holding a trailing partial packet
+        """
+        data = self.carry + data
+        pos = data.find(b"\x47")
+        while 0 <= pos <= len(data) - TS_SIZE:
+            # A sync byte is only trusted with another one packet on
+            if data[pos] != ts_filter.SYNC or data[pos + TS_SIZE : pos + TS_SIZE + 1] not in (b"", b"\x47"):
+                pos = data.find(b"\x47", pos + 1)
+                continue
+            packet = data[pos : pos + TS_SIZE]
+            pos += TS_SIZE
+            if (packet[1] & 0x1F) << 8 | packet[2] != ts_filter.EIT_PID:
+                continue
+            for section in self.reader.feed(packet):
+                self.add_section(section)
+        self.carry = data[pos:] if pos >= 0 else b""
+
+    def add_section(self, section):
+        """
+        Keep a current schedule section for the service
+        """
+        if len(section) < 18 or section[0] not in SCHEDULE_TABLES:
+            return
+        if section[3] << 8 | section[4] != self.sid or not section[5] & 0x01:
+            return
+        if not crc_ok(section):
+            self.counts["crc"] += 1
+            return
+        table_id = section[0]
+        version = (section[5] >> 1) & 0x1F
+        number = section[6]
+        if self.versions.get(table_id, version) != version:
+            self.counts["versions"] += 1
+            for key in [key for key in self.sections if key[0] == table_id]:
+                del self.sections[key]
+            for key in [key for key in self.segments if key[0] == table_id]:
+                del self.segments[key]
+        self.versions[table_id] = version
+        self.last_sections[table_id] = section[7]
+        self.segments[(table_id, number // 8)] = section[12]
+        if (table_id, number) not in self.sections:
+            self.counts["sections"] += 1
+        self.sections[(table_id, number)] = parse_events(section)
+
+    def events(self):
+        """
+        Harvested events sorted by start, one per EventId
+        """
+        events = {}
+        for section in self.sections.values():
+            for event in section:
+                events[(event["event_id"], event["start"])] = event
+        return sorted(events.values(), key=lambda event: event["start"])
+
+    def segment_complete(self, table_id, segment):
+        """
+        All sections of a three hour segment received
+        """
+        last = self.segments.get((table_id, segment))
+        if last is None:
+            return False
+        return all((table_id, num) in self.sections for num in range(segment * 8, last + 1))
+
+    def day_complete(self, day, now):
+        """
+        Every segment for day offset from today, from
+        the current segment on, received
+        """
+        table_id = 0x50 + day // 4
+        if table_id not in self.last_sections:
+            return False
+        first = (day % 4) * 8
+        segments = range(first, first + 8)
+        if day == 0:
+            segments = range(now.hour // SEGMENT_HOURS, 8)
+        return all(self.segment_complete(table_id, segment) for segment in segments)
+
+    def coverage(self, day):
+        """
+        Count of received sections for the day's segments
+        """
+        table_id = 0x50 + day // 4
+        first = (day % 4) * 64
+        return sum(1 for num in range(first, first + 64) if (table_id, num) in self.sections)
+
+
+def open_feed(udp):
+    """
+    Socket reading a udp://host:port feed, joining
+    the group where host is multicast
+    """
+    address = udp.split("://")[-1].lstrip("@")
+    host, port = address.rsplit(":", 1)
+    host = "" if host in ("", "0", "0.0.0.0") else host
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    multicast = bool(host) and ipaddress.ip_address(host).is_multicast
+    sock.bind((host if multicast else "", int(port)))
+    if multicast:
+        group = struct.pack("4s4s", socket.inet_aton(host), socket.inet_aton("0.0.0.0"))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group)
+    sock.settimeout(5)
+    return sock
+
+
+def harvest_udp(harvest, udp, seconds):
+    """
+    Feed harvest from UDP datagrams for seconds,
+    stripping RTP headers where present
+    """
+    sock = open_feed(udp)
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            try:
+                data = sock.recv(DATAGRAM)
+            except socket.timeout:
+                LOGGER.warning("No data from %s for five seconds", udp)
+                continue
+            if data[:1] != b"\x47" and data[12:13] == b"\x47":
+                data = data[12:]
+            harvest.feed(data)
+    finally:
+        sock.close()
+
+
+def harvest_file(harvest, fpath):
+    """
+    Feed harvest from a recorded TS file
+    """
+    with open(fpath, "rb") as file:
+        while True:
+            data = file.read(ts_filter.CHUNK_SIZE)
+            if not data:
+                break
+            harvest.feed(data)
+
+
+def build_days(harvest, channel, today, now):
+    """
+    Schedule lists of complete days keyed by date
+    """
+    days = {}
+    for event in harvest.events():
+        day = (event["start"].date() - today).days
+        if day < 0:
+            continue
+        entry = stora_records.ScheduleEntry(event["start"], int(round(event["seconds"] / 60)), channel, event["title"])
+        days.setdefault(day, []).append(entry.to_json())
+
+    complete = {}
+    for day, schedule in sorted(days.items()):
+        date = (today + datetime.timedelta(days=day)).strftime(FDATE)
+        if harvest.day_complete(day, now):
+            complete[date] = schedule
+        else:
+            LOGGER.info("%s %s incomplete, %s sections of day received", channel, date, harvest.coverage(day))
+    return complete
+
+
+def cross_check(channel, date, schedule, patv):
+    """
+    Log differences between EIT and PATV day schedules
+    """
+    eit = {entry["start"]: entry for entry in schedule}
+    pa = {entry["start"]: entry for entry in patv}
+    for start in sorted(set(pa) - set(eit)):
+        LOGGER.warning("%s %s: PATV %s '%s' not in EIT", channel, date, start, pa[start]["programme"])
+    for start in sorted(set(eit) - set(pa)):
+        LOGGER.warning("%s %s: EIT %s '%s' not in PATV", channel, date, start, eit[start]["programme"])
+    for start in sorted(set(eit) & set(pa)):
+        title = eit[start]["programme"]
+        if title is not None and title.lower() != str(pa[start]["programme"]).lower():
+            LOGGER.info("%s %s: %s EIT '%s' PATV '%s'", channel, date, start, title, pa[start]["programme"])
+
+
+def write_schedule(fpath, schedule):
+    """
+    Write schedule via temporary file
+    """
+    temp_file = f"{fpath}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(schedule, f, indent=4)
+    os.replace(temp_file, fpath)
+
+
+def load_fallbacks():
+    """
+    Schedule filenames copied to schedules/ as
+    fallbacks and not yet replaced by PATV
+    """
+    if not os.path.exists(FALLBACKS):
+        return []
+    with open(FALLBACKS, "r") as inf:
+        return json.load(inf)
+
+
+def clean_up(today):
+    """
+    Remove EIT schedules and fallback
+    entries over two days old
+    """
+    two_days = (today - datetime.timedelta(days=2)).strftime(FDATE)
+    for file in os.listdir(EIT_SCHEDULES):
+        if "_schedule_" in file and file.split("_")[-1][:-5] < two_days:
+            os.remove(os.path.join(EIT_SCHEDULES, file))
+    fallbacks = load_fallbacks()
+    if fallbacks:
+        write_schedule(FALLBACKS, [fname for fname in fallbacks if fname.split("_")[-1][:-5] >= two_days])
+
+
+def main():
+    """
+    Harvest EIT schedules for channels and
+    write complete days beside PATV schedules
+    """
+    parser = argparse.ArgumentParser(description="Build STORA schedules from EIT schedule tables")
+    parser.add_argument("channels", nargs="*")
+    parser.add_argument("--fallback", action="store_true", help="Copy days PATV has not supplied to schedules/")
+    parser.add_argument("--file", help="Harvest from a recorded TS file instead of the UDP feed")
+    parser.add_argument("--seconds", type=int, default=HARVEST)
+    args = parser.parse_args()
+    stora_core.require_env('STORA_FOLDERS')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/eit_schedule_harvester.log'))
+
+    channels = args.channels or list(channel_registry.with_field('udp'))
+    os.makedirs(EIT_SCHEDULES, exist_ok=True)
+    now = datetime.datetime.utcnow()
+    today = now.date()
+
+    LOGGER.info("========= EIT SCHEDULE HARVEST START ====================")
+    for channel in channels:
+        try:
+            chnl = channel_registry.channel(channel)
+            harvest = ScheduleHarvest(chnl.sid)
+            if args.file:
+                harvest_file(harvest, args.file)
+            elif chnl.udp:
+                harvest_udp(harvest, chnl.udp, args.seconds)
+            else:
+                raise ValueError("no UDP EIT feed in channels.json")
+        except (KeyError, ValueError, OSError) as err:
+            LOGGER.warning("Unable to harvest EIT schedule for %s: %s", channel, err)
+            continue
+        LOGGER.info("%s SID %s: %s", channel, harvest.sid, harvest.counts)
+
+        for date, schedule in build_days(harvest, channel, today, now).items():
+            fname = f"{channel}_schedule_{date}.json"
+            write_schedule(os.path.join(EIT_SCHEDULES, fname), schedule)
+            patv = os.path.join(SCHEDULES, fname)
+            # Reread each time, fetch_stora_schedule.py may release one
+            if fname in load_fallbacks():
+                write_schedule(patv, schedule)
+            elif os.path.exists(patv):
+                with open(patv, "r") as inf:
+                    cross_check(channel, date, schedule, json.load(inf))
+            elif args.fallback:
+                LOGGER.info("No PATV schedule, using EIT schedule: %s", fname)
+                write_schedule(patv, schedule)
+                write_schedule(FALLBACKS, load_fallbacks() + [fname])
+
+    clean_up(today)
+    LOGGER.info("========= EIT SCHEDULE HARVEST END ====================\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+Tracks EIT present/following sections for one channel so
+epg_assessment_channel_recorder.py only acts on real changes,
+in place of comparing EventIds against a short trimmed list.
+
+dvbtee delivers each EIT table whole, so the present event is
+section 0 and the following event section 1 of its table. Each
+section is keyed on (service_id, table_id, section_number) and
+holds its version_number with the EventId and runningStatus.
+
+EitState:
+1. update() takes dvbtee EIT and returns a Change for each
+   section whose version_number differs from the last read.
+   A runningStatus flip or new EventId in a section also counts,
+   covering dvbtee output without a table version
+2. Unchanged sections cost one tuple comparison per poll
+3. running() returns the last running EventId for the service
+
+2026
+"""
+
+import collections
+
+PF_TABLE = 0x4E
+
+Change = collections.namedtuple("Change", ["key", "version", "event_id", "running", "event"])
+
+
+class EitState:
+    """
+    Section versions last seen for one channel
+    """
+
+    def __init__(self, sid=None):
+        self.sid = int(sid) if sid is not None else None
+        self.sections = {}
+
+    def update(self, events):
+        """
+        Store dvbtee EIT sections, return list
+        of Change for those that are new
+        """
+        try:
+            table = events or {}
+            service_id = int(table.get("serviceId", self.sid or 0))
+            table_id = int(table.get("tableId", PF_TABLE))
+            version = table.get("version")
+            entries = table.get("events", [])[:2]
+        except (AttributeError, TypeError, ValueError):
+            return []
+
+        changes = []
+        for number, event in enumerate(entries):
+            try:
+                state = (version, event.get("eventId"), str(event.get("runningStatus")))
+            except AttributeError:
+                continue
+            key = (service_id, table_id, number)
+            if self.sections.get(key) == state:
+                continue
+            self.sections[key] = state
+            changes.append(Change(key, *state, event))
+        return changes
+
+    def running(self):
+        """
+        EventId last seen running, or None
+        """
+        for key, (_, event_id, running) in self.sections.items():
+            if key[2] == 0 and running == "4":
+                return event_id
+        return None
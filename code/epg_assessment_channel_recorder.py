@@ -5,49 +5,43 @@ A script to capture RTP network streams using VLC
 taking prompts from UDP EIT table 'runningStatus' data,
 or where absent reverting to EPG schedule recording.
 Has to be run in virtual environment to access VLC Python
-bindings and Tenacity.
+bindings and Tenacity. Optional behaviour (PID filtering,
+stall restarts, EIT polling, journal, upgrade handover and
+host leases) is set by the STORA_* environment variables
+read below the imports.
 
 main():
 -- running status recording --
 1. Launches recording then monitors EIT 'runningStatus'
-   data for change in the '4' running category.
+   data for change in the '4' running category, by section
+   version changes reported by eit_state.py.
    Uses libdvbtee to grab Network Service ID from EIT.
-2. EIT not found check, script launches EPG schedule recording if script
-   fails to find EIT 15 consecutive attempts (skip to step 6)
-3. EIT found so loops continually while 'active'. To turn 'active' to False,
-   control_json needs changing and script exits.
+2. EIT lost check, if EIT reads have failed for STORA_EIT_LOSS seconds
+   (default 20) from the first failed read, within channel timings,
+   hand over to the EPG schedule (skip to step 6)
+3. EIT found so loops continually while stora_control.json leaves
+   the channel active, otherwise recordings end and script exits.
 4. When a change is found in current recording, the script
    stops current VLC media instance, initialises a new
    stream recording in new folder path.
 5. Starts the recording again and continues monitoring
    'runningStatus' for another change. Runs continually without break
 
-launch_epg()
--- epg schedule recording --
-6. Calculates launch time and configures recording date for channels/schedules.
-7. Load the day's schedule for channel received and maps all programmes to a
-   'recordings' dictionary. Stores last modification time for the schedule.
-8. Launches while loop which continues until busy=False, ie no more scheduled
-   recordings for the day. The loop runs through these steps continually:
-   i. Checks schedule for new modification, if altered then reloads schedule
-      to accomodate any changes introduced to programme start/end times.
-   ii. Checks if any existing recordings end times older than now in the 'handles'
-      dictionary which contains details of items currently recording. If so the
-      recording is stopped and the item handle is added to a recordings_deleted
-      dictionary, and the item is removed from handled dictionary.
-   iii. Checks through recordings dictionary items for any programmes
-      not yet being recorded and whose start time is older than the time now.
-      If found an MPEG TS folder is created and a VLC instance is launched and
-      recording begins.
-   iv. Deleted any items in recordings_deleted dictionary from recordings
-      dictionary.
-   v. Calculates if any items remain in handles and recordings dictionary. If no,
-      then busy=False and the script exits.
-   vi. Checks if stora_control.json requires recording to stop for this channel.
-      If active==False, then the VLC recordings are ended immediately and the
-      script exits.
-9. Script completes EPG schedule recording and resets at start of code block in
-   main() with rs checks for EIT re-establishment (step 1)
+-- epg schedule failover --
+6. Throughout, refresh_day() keeps the day's schedule loaded, reloading
+   it when modified or the date changes, and timeline_reconciler.py keeps
+   it alongside EIT present/following, logging divergences and drift.
+   start_failover() hands boundaries to that reconciled timeline. The live
+   capture is not restarted, it carries on until the next programme starts.
+7. Each second epg_step() cuts the capture over to a new MPEG TS folder
+   when a later programme has started by the reconciled timeline: the last
+   EIT following start, else the schedule shifted by observed drift. With
+   no capture running, recording starts for the programme airing now.
+   prewarm_epg() prepares the next programme's capture PREWARM seconds
+   ahead of its reconciled start, as prewarm_rs() does under EIT.
+8. Every STORA_EIT_PROBE seconds (default 10) a short EIT capture is tried.
+   When EIT returns the running EventId is adopted by the current capture,
+   so running status boundaries resume (step 1) without a restart.
 
 Partially developed with inspiration from a Py2 script found on code.activestate.com:
 https://code.activestate.com/recipes/579096-vlcpy-stream-capture-scheduler-script/
@@ -60,27 +54,92 @@ import ast
 import datetime
 import json
 import os
+import select
+import socket
 import subprocess
 import sys
 import time
 
-import tenacity
-import vlc
-
-# Global variables
-CHANNEL = sys.argv[1]
-STORA_PATH = os.environ["STORAGE_PATH"]
-FOLDERS = os.environ["STORA_FOLDERS"]
+import capture_telemetry
+import channel_leases
+import channel_registry
+import eit_state
+import folder_names
+import stora_core
+import stora_records
+import timeline_reconciler
+import ts_filter
+
+tenacity = stora_core.lazy_module("tenacity")
+vlc = stora_core.lazy_module("vlc")
+
+# Global variables, main() exits where no channel argument is given
+CHANNEL = sys.argv[1] if len(sys.argv) > 1 else ""
+STORA_PATH = os.environ.get("STORAGE_PATH", "")
+FOLDERS = os.environ.get("STORA_FOLDERS", "")
 LOG_PATH = os.path.join(FOLDERS, f"logs/epg_channel_recorder_{CHANNEL}.log")
 SCHEDULES = os.path.join(FOLDERS, "schedules/")
-CODEPTH = os.environ["CODE"]
-CONFIG_FILE = os.path.join(CODEPTH, "stream_config.json")
-CONFIG_UDP = os.path.join(CODEPTH, "stream_config_udp.json")
+CODEPTH = os.environ.get("CODE", "")
 CONTROL = os.path.join(CODEPTH, "stora_control.json")
-TIMINGS = os.path.join(CODEPTH, "channel_timings.json")
-DVBTEE = os.environ["DVBTEE"]
+DVBTEE = os.environ.get("DVBTEE", "")
 FORMAT = "%Y-%m-%d %H:%M:%S"
 FTIME = "%H-%M-%S"
+EPG_POLL = 1
+PID_FILTER = bool(os.environ.get("STORA_PID_FILTER"))
+STALL_SECONDS = int(os.environ.get("STORA_STALL_SECONDS", 30))
+EIT_CAPTURE = 6
+EIT_FAST = 3
+EIT_IDLE = int(os.environ.get("STORA_EIT_IDLE", 60))
+EIT_WINDOW = int(os.environ.get("STORA_EIT_WINDOW", 120))
+POLL_STEP = 5
+PREWARM = int(os.environ.get("STORA_PREWARM", 120))
+EIT_LOSS = int(os.environ.get("STORA_EIT_LOSS", 20))
+EIT_PROBE = int(os.environ.get("STORA_EIT_PROBE", 10))
+JOURNAL = os.path.join(FOLDERS, "journal", f"{CHANNEL}.json")
+JOURNAL_EVERY = 10
+HANDOVER = os.path.join(FOLDERS, "handover", f"{CHANNEL}.sock")
+HANDOVER_WAIT = 120
+HANDOVER_CONFIRM = 5
+PEER = {"conn": None, "since": None, "outfile": None}
+UPGRADE = bool(os.environ.get("STORA_UPGRADE"))
+LEASES = os.environ.get("STORA_LEASES")
+LEASE_CHECK = 15
+LEASE = {"checked": None, "held": True}
+POOL = {"inst": None, "players": [], "telemetry": None}
+
+
+class Clock:
+    """
+    Wall clock for all recording decisions, replaced
+    by a virtual clock in simulation/replay_recorder.py
+    """
+
+    def now(self):
+        """
+        Local time now
+        """
+        return datetime.datetime.now()
+
+    def utcnow(self):
+        """
+        UTC time now
+        """
+        return datetime.datetime.utcnow()
+
+    def today(self):
+        """
+        Local date today
+        """
+        return datetime.date.today()
+
+    def sleep(self, seconds):
+        """
+        Pause between loop iterations
+        """
+        time.sleep(seconds)
+
+
+CLOCK = Clock()
 
 
 def check_control():
@@ -102,11 +161,11 @@ def time_calc():
     midnight or on recording day
     """
 
-    now = str(datetime.datetime.now())
+    now = str(CLOCK.now())
     if " 23:5" in now:
-        return str(datetime.date.today() + datetime.timedelta(days=1))
+        return str(CLOCK.today() + datetime.timedelta(days=1))
 
-    return str(datetime.date.today())
+    return str(CLOCK.today())
 
 
 def channel_timings(chnl):
@@ -114,45 +173,28 @@ def channel_timings(chnl):
     Check channel for operational timings
     Return datetime start/stop for checks
     """
-    with open(TIMINGS, "r") as t:
-        time_data = json.load(t)
-    for key, val in time_data.items():
-        if chnl == key:
-            start_time, duration = val.split(" - ")
-    if not start_time:
-        return None, None
-
-    start = f"{str(datetime.date.today())} {start_time}"
-    start_dt = datetime.datetime.strptime(start, FORMAT)
-    end_dt = start_dt + datetime.timedelta(minutes=int(duration))
-    return start_dt, end_dt
+    return channel_registry.channel(chnl).window(CLOCK.today())
 
 
 def fetch_udp():
     """
-    Read UDP stream for channel
+    Return UDP EIT stream for channel
     """
-
-    with open(CONFIG_UDP, "r") as file:
-        cjson = json.load(file)
-
-    for key, val in cjson.items():
-        if key == CHANNEL:
-            return val
+    return channel_registry.channel(CHANNEL).udp
 
 
 def fetch_rtp():
     """
-    Read stream_config and return
-    list of items
+    Return RTP stream for channel
     """
+    return channel_registry.channel(CHANNEL).rtp
 
-    with open(CONFIG_FILE, "r") as file:
-        cjson = json.load(file)
 
-    for key, val in cjson.items():
-        if key == CHANNEL:
-            return val.split(", ")[0]
+def fetch_sid():
+    """
+    Return service ID for channel
+    """
+    return str(channel_registry.channel(CHANNEL).sid)
 
 
 def write_print(text, epg_arg):
@@ -163,7 +205,7 @@ def write_print(text, epg_arg):
     if epg_arg:
         log_path = LOG_PATH
     else:
-        now = datetime.datetime.utcnow().strftime("%Y/%m/%d")
+        now = CLOCK.utcnow().strftime("%Y/%m/%d")
         log_path = os.path.join(STORA_PATH, now, CHANNEL)
         if not os.path.exists(log_path):
             os.makedirs(log_path, exist_ok=True)
@@ -181,7 +223,7 @@ def time_print(text, arg, dt=None):
     """
 
     if dt is None:
-        now = datetime.datetime.utcnow()
+        now = CLOCK.utcnow()
         dt = now.strftime("%H:%M:%S")
 
     write_print(f"{dt}  {text}", arg)
@@ -198,23 +240,17 @@ def indent_print(text, arg):
 
 def load_channel_config(silent=False):
     """
-    Load the stream configuration file.
+    Return the channel's registry entry
     """
 
-    with open(CONFIG_FILE, "r") as file:
-        cjson = json.load(file)
-
-    for key, val in cjson.items():
-        if key == CHANNEL:
-            channel_config = {f"{key}": f"{val}"}
-
+    channel_config = channel_registry.channel(CHANNEL)
     if not silent:
-        write_print(f"{channel_config} channel available.", True)
+        write_print(f"{channel_config.key} {channel_config.rtp}, {channel_config.sid} channel available.", True)
 
     return channel_config
 
 
-@tenacity.retry(stop=tenacity.stop_after_attempt(5))
+@stora_core.retry(lambda: {"stop": tenacity.stop_after_attempt(5)})
 def load_schedule(sched_path, silent=False):
     """
     Load the scheduled recordings file
@@ -237,25 +273,11 @@ def load_schedule(sched_path, silent=False):
         print(err)
 
 
-@tenacity.retry(stop=tenacity.stop_after_attempt(5))
-def get_mod_time(mod_time_prev, date):
-    """
-    Retrieve modification time
-    of current schedule, seconds since
-    epoch time of file.
-    """
-
-    schedule = os.path.join(SCHEDULES, f"{CHANNEL}_schedule_{date}.json")
-    mod_time = os.path.getmtime(schedule)
-    if mod_time != mod_time_prev:
-        return mod_time
-
-
-def parse_schedule(schedule, channels):
+def parse_schedule(schedule, chnl):
     """
     Parse the schedule and return recordings dictionary
-    with one entry per programme including RTP url, channel
-    start, end times, programme title and SID.
+    with one Recording per programme including RTP url,
+    channel, start, end times, programme title and SID.
     """
 
     recordings = {}
@@ -275,12 +297,6 @@ def parse_schedule(schedule, channels):
         if "programme" in entry:
             programme = entry["programme"]
 
-        address = ""
-        for key, val in channels.items():
-            if key == CHANNEL:
-                address = val
-
-        address_split = address.split(",")
         pid = f"{start} {channel}"
 
         # Check for an endtime or a duration
@@ -317,352 +333,371 @@ def parse_schedule(schedule, channels):
                 True,
             )
 
-        recordings[pid] = {
-            "url": address_split[0],
-            "channel": channel,
-            "start": date_time,
-            "duration": duration,
-            "end": endtime,
-            "programme": programme,
-            "sid": address_split[1],
-        }
+        if offset is None:
+            duration = int((endtime - date_time).total_seconds() // 60)
+
+        recordings[pid] = stora_records.Recording(
+            url=chnl.rtp,
+            channel=channel,
+            start=date_time,
+            duration=duration,
+            end=endtime,
+            programme=programme,
+            sid=str(chnl.sid),
+        )
 
     return recordings
 
 
-def reload_schedule(sched_path, existing, running):
-    """
-    Schedule reload only necessary if schedule
-    checks scripts have updated recordings based
-    on new duration timings
-    """
-
-    now = datetime.datetime.utcnow()
-    revised = initialise(sched_path, True)
-
-    # Get the schedule id for each of the running recordings
-    running_ids = {}
-    for runs in running:
-        sid = running[runs]["sid"]
-        running_ids[sid] = runs
-
-    # Get the schedule id for each of the upcoming recordings
-    upcoming_ids = {}
-    for item in existing:
-        sid = existing[item]["sid"]
-        upcoming_ids[sid] = item
-
-    new_rec = 0
-
-    # Compare the revised schedule against the existing
-    for revs in revised:
-        data = revised[revs]
-        sched_id = data["sid"]
-        endtime = data["end"]
-
-        # If this recording is already running
-        if sched_id in running_ids:
-            handle = running_ids[sched_id]
-
-            # Check if it's the same channel and programme
-            chnl = data["channel"] == running[handle]["channel"]
-            prog = data["programme"] == running[handle]["programme"]
-
-            # If it's the same channel and programme, check if we need to revise the end time
-            if prog and chnl and endtime != running[handle]["end"]:
-                time_print("Changed end time for running recording:", True)
-
-                if data["programme"] is not None:
-                    indent_print(f"{data}(programme)s ({data}(channel)s)", True)
-                else:
-                    indent_print(f"{handle}", True)
-
-                indent_print(
-                    f"{running[handle]['end'].strftime(FORMAT)} to {endtime.strftime(FORMAT)}",
-                    True,
-                )
-
-                running[handle]["end"] = endtime
-
-        # Only consider programmes that haven't finished yet
-        elif endtime > now:
-            if sched_id in upcoming_ids:
-                ids = upcoming_ids[sched_id]
-
-                # Remove the old data so that it can be replaced with the new
-                temp = existing.pop(ids, None)
-
-                # Check if it's the same channel and programme
-                chnl = data["channel"] == temp["channel"]
-                prog = data["programme"] == temp["programme"]
-
-                # Only notify a change if it's the same programme
-                if temp != data and chnl and (prog or temp["programme"] is None):
-                    time_print("Changes made to scheduled recording:", True)
-
-                    if data["programme"] is not None:
-                        indent_print("{data}(programme)s ({data}(channel)s)", True)
-                    else:
-                        indent_print(f"{ids}", True)
-
-            else:
-                new_rec += 1
-
-            existing[revs] = data
-
-    if new_rec > 0:
-        time_print(f"Added {new_rec} new scheduled recordings.", True)
-
-    return (existing, running)
-
-
 def main():
     """
     While loop set to active (unless check_control() changes status)
     checks channel's EIT runningStatus and eventId continually for change.
     When change found, stop current recording and initialise new one
     using the UNIX start time and calculated duration from UNIX end time
-    - If EIT runningStatus is lost from stream at any point, the script
-    moves on to EPG schedule recording until end of schedule is reached
-    and script restarts in main and tries EIT data again.
+    - If EIT is lost for EIT_LOSS seconds the live capture is handed to
+    the day's EPG schedule, which cuts it at scheduled starts. EIT is
+    probed every EIT_PROBE seconds and when it returns running status
+    boundaries take over again. Neither handover restarts the capture.
     """
 
+    stora_core.require_env("STORAGE_PATH", "STORA_FOLDERS", "CODE", "DVBTEE")
     if len(sys.argv) != 2:
         time_print(
             f"Script exit: sys.argv has not received correct arguments to select channel: {sys.argv}",
             False,
         )
         sys.exit("SCRIPT EXIT: SYSARG HAS NOT RECEIVED CORRECT ARGUMENTS")
+    if not lease_held():
+        # Another host records this channel, leave no marker or journal work
+        sys.exit(f"SCRIPT EXIT: {CHANNEL} lease held by another host")
 
     time_print(f"{CHANNEL} script launch - recording start", False)
+    telemetry().start()
 
     # Get channel streams
     rtp = fetch_rtp()
     udp = fetch_udp()
+    sid = fetch_sid()
     start_rec, end_rec = channel_timings(CHANNEL)
-    active = True
-    event_list = []
-    eit_fail = 0
-
-    while active:
+    eit = eit_state.EitState(sid)
+    running, not_running = {}, {}
+    if UPGRADE:
+        # Take the running recorder's capture over
+        capture, current_event = take_over(rtp, sid)
+    else:
+        # Pick up a recording interrupted by a crash
+        capture, current_event = resume_capture(rtp, sid)
+    listener = open_handover()
+    prepared = None
+    failover = False
+    capture_seconds = EIT_CAPTURE
+    lost_since = None
+    refused = None
+    last_probe = None
+    timeline = timeline_reconciler.TimelineReconciler(lambda text: time_print(text, False))
+    day = None
+
+    while not exit_requested(capture, prepared):
+
+        # Hand capture to an upgraded recorder and exit
+        if listener and hand_over(listener, capture, current_event, prepared):
+            telemetry().stop()
+            return
+
+        # Restart a stalled capture without leaving the programme
+        if capture:
+            watch_capture(capture, False)
+
+        # Keep schedule timeline current alongside EIT
+        day = refresh_day(day, timeline)
+
+        polled = CLOCK.now()
+        if failover:
+            # Reconciled boundaries while EIT lost, probe for its return
+            capture, prepared = epg_step(day, timeline, capture, prepared, rtp, sid)
+            prepared = prewarm_epg(day, timeline, prepared, rtp, sid)
+            if last_probe and (CLOCK.now() - last_probe).total_seconds() < EIT_PROBE:
+                CLOCK.sleep(EPG_POLL)
+                continue
+            last_probe = CLOCK.now()
+            events = get_events(udp, EIT_FAST)
+        else:
+            # Fetch events from channel's UDP EIT table
+            events = get_events(udp, capture_seconds)
 
-        # Fetch events from channel's UDP EIT table
-        events = get_events(udp)
         if not events:
-            time_print(f"Failed to retrieve events - times: {eit_fail}", False)
-            if start_rec <= datetime.datetime.now() <= end_rec:
-                eit_fail += 1
-            # Look for 15 consistent failures
-            if eit_fail == 15:
-                time_print("EIT access failed 15 consecutive times.", False)
-                time_print(
-                    "Launching EPG schedule recorder, creating text file notification.",
-                    False,
-                )
-                now = datetime.datetime.utcnow().strftime("%Y/%m/%d")
-                now_txt = datetime.datetime.utcnow().strftime("%Y-%m-%d_%H:%M:%S")
-                try:
-                    with open(
-                        os.path.join(
-                            STORA_PATH, now, CHANNEL, f"epgrecording_{now_txt}.txt"
-                        ),
-                        "a+",
-                    ) as fp:
-                        pass
-                except FileNotFoundError:
-                    pass
-                launch_epg()
-                eit_fail = 0
+            # Loss runs from the first failed read, not the last good one
+            # which may be an EIT_IDLE wait earlier
+            if lost_since is None:
+                lost_since = polled
+            gap = (CLOCK.now() - lost_since).total_seconds()
+            time_print(f"Failed to retrieve events - {gap:.0f}s of failed reads", False)
+            # Without a schedule try again only once refresh_day() reloads
+            if not failover and refused is not day and gap >= EIT_LOSS and start_rec <= CLOCK.now() <= end_rec:
+                failover = start_failover(capture, day, timeline, gap)
+                refused = None if failover else day
+                if prepared and failover:
+                    discard_capture(prepared, False)
+                    prepared = None
             continue
+        lost_since = None
+        refused = None
+        timeline.update_eit(events, CLOCK.utcnow())
+
+        # Only sections with a new version (or running status) need work
+        changes = eit.update(events)
+        for change in changes:
+            time_print(f"EIT section {change.key} version {change.version}: EventId {change.event_id} runningStatus {change.running}", False)
+        if changes or failover:
+            # Separate to running(4)/not_running(1)
+            running, not_running = read_eit(events)
+        if failover:
+            # Hand back to running status, current capture carries on
+            time_print("EIT restored, running status boundaries take over.", False)
+            if prepared:
+                discard_capture(prepared, False)
+                prepared = None
+            if capture:
+                current_event = eit.running()
+                write_journal(capture, current_event, capture["end"])
+            failover = False
 
-        # Prevent build up of occasional failures over day
-        eit_fail = 0
+        for key, val in running.items():
+            if key == current_event:
+                continue
+            current_event = key
+            time_print(f"New running EventId: {key}", False)
+            name = f"{val.start_hms}-{key}-{val.duration_hms}"
 
-        # Separate to running(4)/not_running(1)
-        running, not_running = read_eit(events)
-        # Stop event_list getting big, delete first
-        if len(event_list) > 5:
-            del event_list[0]
+            # Initialise recording path - needs date paths adding
+            if prepared and prepared["name"] == name:
+                outfile = prepared["outfile"]
+            else:
+                outfile = initialise_ts_rs(val.start_hms, key, val.duration_hms)
 
-        for key, val in running.items():
-            if key not in event_list:
-                # Add current eventId to event_list
-                event_list.append(key)
-                time_print(f"New running EventId: {key}", False)
-                time_print(f"Event list updated: {event_list}", False)
-                prog_info = val.split(", ")
-
-                # Initialise recording path - needs date paths adding
-                outfile = initialise_ts_rs(prog_info[1], key, prog_info[0])
-
-                if len(event_list) > 1:
-                    # Stop existing recording
-                    time_print("Ending recording for previous programme", False)
-                    player.stop()  # Stop playback
-                    player.release()  # Close the player
-                    inst.release()  # Destroy the instance
-                    indent_print(
-                        f"STOP Instance: {inst}, Player: {player}, Media: {media}",
-                        False,
-                    )
-
-                # Start new recording using initialised outfile as destination
-                time_print(f"Initialising recording for path: {outfile}", False)
-                (inst, player, media) = record_stream(rtp, outfile)
-                player.play()
-                indent_print(
-                    f"START Instance: {inst}, Player: {player}, Media: {media}", False
-                )
-                indent_print(f"Started recording: {prog_info[4]} ({CHANNEL})", False)
+            if capture:
+                # Stop existing recording
+                time_print("Ending recording for previous programme", False)
+                stop_capture(capture["player"], capture["media"])
                 indent_print(
-                    f"{prog_info[1]} to {prog_info[2]} - duration {prog_info[0]}", False
+                    f"STOP Player: {capture['player']}, Media: {capture['media']}",
+                    False,
                 )
 
+            # Start new recording using prepared or initialised outfile
+            time_print(f"Initialising recording for path: {outfile}", False)
+            if prepared and prepared["outfile"] == outfile:
+                (inst, player, media) = (
+                    prepared["inst"],
+                    prepared["player"],
+                    prepared["media"],
+                )
             else:
-                continue
+                if prepared:
+                    discard_capture(prepared, False)
+                (inst, player, media) = record_stream(rtp, outfile, sid)
+            prepared = None
+            start_capture(player, media, outfile)
+            capture = new_capture(inst, player, media, outfile, rtp, sid)
+            write_journal(capture, key, val.end)
+            indent_print(
+                f"START Instance: {inst}, Player: {player}, Media: {media}", False
+            )
+            indent_print(f"Started recording: {val.title} ({CHANNEL})", False)
+            indent_print(
+                f"{val.start_hms} to {val.end_hms} - duration {val.duration_hms}", False
+            )
 
-        check = check_control()
-        if check is False:
-            time_print("Script exit requested by stora_control.json", False)
-            time_print("Ending current recording following exit request.", False)
-            player.stop()
-            player.release()
-            inst.release()
-            active = False
+        # Prepare following programme's capture ahead of the boundary
+        prepared = prewarm_rs(events, not_running, prepared, rtp, sid)
 
+        # Poll rarely mid programme, closely around the boundary
+        delay, capture_seconds = poll_delay(events, start_rec, end_rec)
+        wait_for_poll(delay, capture)
 
-def launch_epg():
+
+def exit_requested(capture, prepared):
     """
-    import main() from epg recording script here
-    Calculates time to accommodate pre-midnight launch
+    Check stora_control.json and end the current
+    and any prepared capture if asked to stop
     """
-    date = time_calc()
-    date_path = os.path.join(STORA_PATH, f"{date[0:4]}/{date[5:7]}/{date[8:10]}/")
-    chnl_path = os.path.join(date_path, CHANNEL)
+    if check_control() is not False and lease_held():
+        return False
+
+    time_print("Script exit requested by stora_control.json or channel lease", False)
+    time_print("Ending current recording following exit request.", False)
+    if capture:
+        stop_capture(capture["player"], capture["media"])
+    if prepared:
+        discard_capture(prepared, False)
+    clear_journal()
+    return True
+
 
-    # Get schedule name for day
+def lease_held():
+    """
+    True unless channels are sharded and another host
+    holds this channel's lease. Reread every LEASE_CHECK
+    seconds, shared storage errors keep the last answer
+    """
+    if not LEASES:
+        return True
+    now = CLOCK.now()
+    if LEASE["checked"] and (now - LEASE["checked"]).total_seconds() < LEASE_CHECK:
+        return LEASE["held"]
+    LEASE["checked"] = now
+    try:
+        held = channel_leases.holds(LEASES, CHANNEL)
+    except OSError as err:
+        time_print(f"Unable to read channel lease, carrying on: {err}", False)
+        return LEASE["held"]
+    if held is None:
+        time_print("Unable to parse channel lease, carrying on", False)
+        return LEASE["held"]
+    if not held:
+        time_print(f"Channel lease not held by {channel_leases.HOST}", False)
+    LEASE["held"] = held
+    return held
+
+
+def refresh_day(day, timeline):
+    """
+    Load the day's schedule into the timeline when
+    the date changes or the schedule is modified
+    """
+    date = time_calc()
     schedule = os.path.join(SCHEDULES, f"{CHANNEL}_schedule_{date}.json")
-    mod_time = os.path.getmtime(schedule)
-    recordings = initialise(schedule)
-    handles = {}
-    busy = True
-    first = True
-
-    while busy:
-        # Check for schedule modification change
-        new_mod_time = get_mod_time(mod_time, date)
-        if new_mod_time:
-            # Update modification time and reload_schedule
-            mod_time = new_mod_time
-            (recordings, handles) = reload_schedule(schedule, recordings, handles)
+    try:
+        mod_time = os.path.getmtime(schedule)
+    except OSError:
+        mod_time = None
+    if day and day["date"] == date and day["mod_time"] == mod_time:
+        return day
+
+    recordings = {}
+    if mod_time:
+        try:
+            recordings = initialise(schedule, True) or {}
+        except tenacity.RetryError as err:
+            time_print(f"Unable to load schedule {schedule}: {err}", False)
+        if day:
             write_print("Schedules reloaded due to modification update", True)
+    timeline.update_schedule(recordings)
+
+    chnl_path = os.path.join(STORA_PATH, f"{date[0:4]}/{date[5:7]}/{date[8:10]}/", CHANNEL)
+    os.makedirs(chnl_path, exist_ok=True)
+    return {
+        "date": date,
+        "mod_time": mod_time,
+        "recordings": recordings,
+        "path": chnl_path,
+        "slot": day["slot"] if day else None,
+    }
 
-        handles_deleted = recordings_deleted = []
-        now = datetime.datetime.utcnow()
-        # Check existing recordings
-        hs = handles.keys()
-        for h in hs:
-            data = handles[h]
-            end = data["end"]
-            channel = data["channel"]
-            programme = data["programme"]
-            if now > end:
-                time_print(f"Finished recording {programme} ({channel}).", True)
-                try:
-                    data["player"].stop()  # Stop playback
-                    data["player"].release()  # Close the player
-                    data["inst"].release()  # Destroy the instance
-                    handles_deleted.append(h)
-                except Exception as err:
-                    time_print("Unable to destroy player reference due to error:", True)
-                    write_print(str(err), True)
-
-        # Deletion of handles item in dictionary
-        if len(handles_deleted) > 0:
-            for hd in handles_deleted:
-                if hd in handles.keys():
-                    print(f"=== HANDLE FOR DELETION {hd}")
-                    del handles[hd]
-
-        # Loop through the schedule
-        rs = recordings.keys()
-        for r in rs:
-            data = recordings[r]  # Schedule entry details
-            start = data["start"]
-            duration = data["duration"]
-            end = data["end"]
-            channel = data["channel"]
-            programme = data["programme"]
-            # If we're not recording the stream but we're between the
-            # start and end times for the programme, record it
-
-            if r not in handles and (now > start):
-                print(f"if {now} < {end}")
-                if now < end:
-                    # Determine a suitable output filename
-                    fn = initialise_ts(chnl_path, start, duration, first)
-                    # Create the VLC instance and player
-                    (inst, player, media) = record_stream(data["url"], fn)
-
-                    # Store the handle to the VLC instance and relevant data
-                    handles[r] = {
-                        "inst": inst,
-                        "player": player,
-                        "media": media,
-                        "end": end,
-                        "programme": programme,
-                        "channel": channel,
-                        "sid": data["sid"],
-                    }
-
-                    # Start the stream and hence the recording
-                    player.play()
-                    time_print("Started recording:", True)
-                    indent_print(f"{programme} ({channel})", True)
-                    indent_print(
-                        f"{start.strftime(FORMAT)} to {end.strftime(FORMAT)}", True
-                    )
-                    first = False
-                else:
-                    time_print("Missed scheduled recording:", True)
-                    indent_print(f"{programme} ({channel})", True)
-                    indent_print(
-                        f"{start.strftime(FORMAT)} to {end.strftime(FORMAT)}", True
-                    )
-                    write_print(f"*** Deleting key: {r}", True)
-
-                # Remove the item from the schedule to prevent it being
-                # processed again
-                recordings_deleted.append(r)
-
-        # Deletion of recording dictionary entry
-        if len(recordings_deleted) > 0:
-            for rd in recordings_deleted:
-                try:
-                    print(f"=== RECORDING FOR DELETION {rd}")
-                    del recordings[rd]
-                except KeyError:
-                    pass
-
-        # Count remaining keys/handles for today's schedule
-        k = len(handles.keys()) + len(recordings.keys())
-        busy = k > 0
-        # Exit after last recording complete
-        # Crontab independently launches next script for next day's schedule
-        if not busy:
-            time_print("Exiting EPG capture for this schedule...\n", True)
-
-        check = check_control()
-        if check is False:
-            time_print("Script exit requested by stora_control.json", True)
-            time_print("Ending current recording following exit request.", True)
-            player.stop()
-            player.release()
-            inst.release()
-            sys.exit("stora_control.json requests script exits")
-
-
-def get_events(udp):
+
+def start_failover(capture, day, timeline, gap):
+    """
+    Hand boundaries to the reconciled schedule after
+    EIT loss. A live capture carries on to the next
+    start, without one recording starts straight away
+    """
+    if not day["recordings"]:
+        time_print("EIT lost and no schedule available for EPG failover.", False)
+        return False
+
+    time_print(f"EIT lost for {gap:.0f}s, schedule boundaries take over.", False)
+    time_print("Creating text file notification of EPG recording.", False)
+    now = CLOCK.utcnow().strftime("%Y/%m/%d")
+    now_txt = CLOCK.utcnow().strftime("%Y-%m-%d_%H:%M:%S")
+    try:
+        with open(
+            os.path.join(STORA_PATH, now, CHANNEL, f"epgrecording_{now_txt}.txt"),
+            "a+",
+        ) as fp:
+            pass
+    except FileNotFoundError:
+        pass
+
+    data, _ = timeline.current(CLOCK.utcnow())
+    day["slot"] = data.start if capture and data else None
+    return True
+
+
+def epg_step(day, timeline, capture, prepared, rtp, sid):
+    """
+    Cut the capture over when a later programme
+    has started by the reconciled timeline, using
+    its prepared capture if there is one. Logs
+    programmes passed over since the last cut
+    """
+    data, start = timeline.current(CLOCK.utcnow())
+    if data is None or (day["slot"] and data.start <= day["slot"]):
+        return capture, prepared
+    if day["slot"]:
+        for missed in sorted(day["recordings"].values(), key=lambda rec: rec.start):
+            if day["slot"] < missed.start < data.start:
+                time_print("Missed scheduled recording:", False)
+                indent_print(f"{missed.programme} ({missed.channel})", False)
+                indent_print(f"{missed.start.strftime(FORMAT)} to {missed.end.strftime(FORMAT)}", False)
+    day["slot"] = data.start
+
+    outfile = initialise_ts(day["path"], data.start, data.duration, True)
+    if capture and capture["outfile"] == outfile:
+        return capture, prepared
+    if capture:
+        time_print("Ending recording for previous programme at reconciled start", False)
+        stop_capture(capture["player"], capture["media"])
+
+    if prepared and prepared["outfile"] == outfile:
+        (inst, player, media) = (
+            prepared["inst"],
+            prepared["player"],
+            prepared["media"],
+        )
+    else:
+        if prepared:
+            discard_capture(prepared, False)
+        (inst, player, media) = record_stream(rtp, outfile, sid)
+    prepared = None
+    start_capture(player, media, outfile)
+    time_print("Started scheduled recording:", False)
+    indent_print(f"{data.programme} ({data.channel})", False)
+    indent_print(
+        f"{start.strftime(FORMAT)} to {data.end.strftime(FORMAT)}, scheduled {data.start.strftime(FORMAT)}",
+        False,
+    )
+    capture = new_capture(inst, player, media, outfile, rtp, sid)
+    write_journal(capture, None, data.end)
+    return capture, prepared
+
+
+def prewarm_epg(day, timeline, prepared, rtp, sid):
+    """
+    Within PREWARM seconds of the next reconciled
+    start create its folder and capture, replacing
+    any prepared capture the timeline has moved off
+    """
+    now = CLOCK.utcnow()
+    for start, _, data in timeline.starts(now):
+        if start <= now or (day["slot"] and data.start <= day["slot"]):
+            continue
+        if (start - now).total_seconds() > PREWARM:
+            return prepared
+        outfile = initialise_ts(day["path"], data.start, data.duration, True)
+        if prepared and prepared["outfile"] == outfile:
+            return prepared
+        if prepared:
+            discard_capture(prepared, False)
+        prepared = prepare_capture(outfile, rtp, sid)
+        prepared["name"] = outfile
+        time_print(f"Prepared capture for scheduled {data.programme}: {outfile}", False)
+        return prepared
+
+    return prepared
+
+
+def get_events(udp, seconds=EIT_CAPTURE):
     """
     Dump libdvbtee EIT data to dict
     then pass back to main. Retry if fails.
@@ -671,13 +706,13 @@ def get_events(udp):
     cmd = [
         DVBTEE,
         '-i', udp,
-        '-t', '6', '-j'
+        '-t', str(seconds), '-j'
     ]
 
     try:
         capture = subprocess.check_output(cmd, timeout=15, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as exc:
-        time_print(f"Failed to retrive DVBTEE:\n{exc}")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as exc:
+        time_print(f"Failed to retrive DVBTEE:\n{exc}", False)
         return None
 
     capture = capture.decode("latin1").splitlines()
@@ -692,62 +727,96 @@ def get_events(udp):
         split_data_clean = split_data.replace(":true,", ":True,")
         jdata = ast.literal_eval(split_data_clean)
         return jdata
-    except IndexError as exc:
-        raise Exception from exc
-    except SyntaxError as exc:
-        raise Exception from exc
-    except Exception as exc:
-        raise Exception from exc
+    except (IndexError, SyntaxError, ValueError) as exc:
+        time_print(f"Failed to parse DVBTEE EIT data: {exc}", False)
+        return None
+
+
+def following_start(events):
+    """
+    UNIX start time of the following
+    (not running) event, if present
+    """
+    try:
+        for event in events["events"][:2]:
+            if str(event.get("runningStatus")) == "1" and event.get("unixTimeBegin"):
+                return int(event["unixTimeBegin"])
+    except (TypeError, KeyError, AttributeError):
+        pass
+    return None
+
+
+def poll_delay(events, start_rec, end_rec):
+    """
+    Seconds until next EIT poll and dvbtee capture
+    length. Polls every EIT_IDLE seconds mid programme
+    or outside channel timings, back to back within
+    EIT_WINDOW of the following event's start, and
+    with shorter captures once that start has passed
+    """
+    if not start_rec <= CLOCK.now() <= end_rec:
+        return EIT_IDLE, EIT_CAPTURE
+
+    begin = following_start(events)
+    if begin is None:
+        return 0, EIT_CAPTURE
+
+    now = CLOCK.utcnow().replace(tzinfo=datetime.timezone.utc).timestamp()
+    to_boundary = begin - now
+    if to_boundary > EIT_WINDOW:
+        return min(EIT_IDLE, to_boundary - EIT_WINDOW), EIT_CAPTURE
+    if to_boundary > 0:
+        return 0, EIT_CAPTURE
+    return 0, EIT_FAST
+
+
+def prewarm_rs(events, not_running, prepared, rtp, sid):
+    """
+    Within PREWARM seconds of the following event
+    create its folder and capture, replacing any
+    prepared capture the EIT no longer matches
+    """
+    begin = following_start(events)
+    now = CLOCK.utcnow().replace(tzinfo=datetime.timezone.utc).timestamp()
+    if begin is None or begin - now > PREWARM:
+        return prepared
+
+    for key, val in not_running.items():
+        if key == "":
+            continue
+        name = f"{val.start_hms}-{key}-{val.duration_hms}"
+        if prepared and prepared["name"] == name:
+            return prepared
+        if prepared:
+            discard_capture(prepared, False)
+        outfile = initialise_ts_rs(val.start_hms, key, val.duration_hms)
+        prepared = prepare_capture(outfile, rtp, sid)
+        prepared["name"] = name
+        time_print(f"Prepared capture for following EventId {key}: {outfile}", False)
+        return prepared
+
+    return prepared
+
+
+def wait_for_poll(delay, capture):
+    """
+    Sleep until the next EIT poll in short
+    steps, still restarting a stalled capture
+    """
+    until = CLOCK.now() + datetime.timedelta(seconds=delay)
+    while CLOCK.now() < until:
+        CLOCK.sleep(min(POLL_STEP, (until - CLOCK.now()).total_seconds()))
+        if capture:
+            watch_capture(capture, False)
 
 
 def read_eit(events):
     """
     Search through event data
     return running/not running
-    dictionary of entries
+    dictionaries of EitEvent
     """
-    running = {}
-    not_running = {}
-    for num in range(0, 2):
-        try:
-            event_id = events["events"][num]["eventId"]
-            print(event_id)
-        except (TypeError, IndexError, KeyError):
-            event_id = ""
-        try:
-            title = events["events"][num]["descriptors"][0]["name"]
-            title = title.replace("\x86", "")
-            title = title.replace("\x87", "")
-            title = title.replace("Â", "")
-            print(title)
-        except (TypeError, IndexError, KeyError):
-            title = ""
-        try:
-            run_stat = events["events"][num]["runningStatus"]
-        except (TypeError, IndexError, KeyError):
-            run_stat = ""
-        try:
-            ts_start = events["events"][num]["unixTimeBegin"]
-            start = datetime.datetime.utcfromtimestamp(ts_start).strftime(FTIME)
-        except (TypeError, IndexError, KeyError):
-            ts_start = ""
-        try:
-            ts_end = events["events"][num]["unixTimeEnd"]
-            end = datetime.datetime.utcfromtimestamp(ts_end).strftime(FTIME)
-        except (TypeError, IndexError, KeyError):
-            ts_end = ""
-
-        if ts_end and ts_start:
-            seconds = int(ts_end) - int(ts_start)
-            duration = str(time.strftime(FTIME, time.gmtime(seconds)))
-        else:
-            duration = ""
-        if str(run_stat) == "4":
-            running[event_id] = f"{duration}, {start}, {end}, {run_stat}, {title}"
-        if str(run_stat) == "1":
-            not_running[event_id] = f"{duration}, {start}, {end}, {run_stat}, {title}"
-
-    return running, not_running
+    return stora_records.present_following(events)
 
 
 def initialise_ts(chnl_path, start_time, duration, first):
@@ -759,14 +828,10 @@ def initialise_ts(chnl_path, start_time, duration, first):
     and appends stream to end of existing.
     """
 
-    start_str = start_time.strftime(FORMAT)
-    start = start_str[11:].replace(":", "-")
-    seconds = duration * 60
-    dur = time.strftime("%H-%M-%S", time.gmtime(seconds))
-    dur = str(dur)
+    start = start_time.strftime(stora_records.FTIME)
 
     # Folder creation for new mpeg file
-    fname = f"{start}-{CHANNEL}-{dur}"
+    fname = folder_names.encode(start_time, CHANNEL, duration * 60)
     if first:
         folder_check = [x for x in os.listdir(chnl_path) if x.startswith(start)]
         if len(folder_check) == 1:
@@ -789,14 +854,14 @@ def initialise_ts_rs(start_time, event_id, duration):
     day folder when they launch before midnight
     """
 
-    now_check = str(datetime.datetime.utcnow())
+    now_check = str(CLOCK.utcnow())
     if " 23:5" in now_check and "00-00-00" in start_time:
-        date_dash = str(datetime.datetime.utcnow() + datetime.timedelta(days=1)).split(
+        date_dash = str(CLOCK.utcnow() + datetime.timedelta(days=1)).split(
             " ", maxsplit=1
         )[0]
         now = date_dash.replace("-", "/")
     else:
-        now = datetime.datetime.utcnow().strftime("%Y/%m/%d")
+        now = CLOCK.utcnow().strftime("%Y/%m/%d")
 
     # Folder creation for new mpeg file
     fname = f"{start_time}-{event_id}-{duration}"
@@ -807,33 +872,448 @@ def initialise_ts_rs(start_time, event_id, duration):
     return os.path.join(fpath, "stream.mpeg2.ts")
 
 
-def record_stream(instream, outfile):
+def telemetry():
+    """
+    Return the channel's ChannelTelemetry,
+    created on first use rather than at import
+    """
+
+    if POOL["telemetry"] is None:
+        POOL["telemetry"] = capture_telemetry.ChannelTelemetry(
+            CHANNEL,
+            float(os.environ.get("STORA_TELEMETRY", 1)),
+            os.path.join(FOLDERS, "telemetry/"),
+        )
+    return POOL["telemetry"]
+
+
+def capture_instance():
+    """
+    Return the channel's libVLC instance,
+    created once and kept for all captures
+    """
+
+    if POOL["inst"] is None:
+        POOL["inst"] = vlc.Instance("-vv")
+    return POOL["inst"]
+
+
+def record_stream(instream, outfile, sid=None):
     """
     Record the network stream to the output file.
-    Create VLC instance that launches demux dump and
-    appends to stream (if already exists) or creates new
+    Create media on the channel's VLC instance that
+    launches demux dump and appends to stream (if
+    already exists) or creates new, and attach it to
+    an idle player. When PID_FILTER set dump goes
+    via a FIFO filtered to SID
     """
 
-    inst = vlc.Instance(
-        "-vv", "--demux=dump", f"--demuxdump-file={outfile}", "--demuxdump-append"
+    dumpfile = outfile
+    if PID_FILTER and sid:
+        dumpfile = ts_filter.start_filter(outfile, sid)
+        indent_print(f"PID filter for SID {sid} via {dumpfile}", False)
+
+    inst = capture_instance()
+    media = inst.media_new(
+        instream, ":demux=dump", f":demuxdump-file={dumpfile}", ":demuxdump-append"
     )
-    player = inst.media_player_new()
-    media = inst.media_new(instream)
     media.get_mrl()
+    if POOL["players"]:
+        player = POOL["players"].pop()
+    else:
+        player = inst.media_player_new()
     player.set_media(media)
     return (inst, player, media)
 
 
-@tenacity.retry(stop=tenacity.stop_after_attempt(5))
+def start_capture(player, media, outfile):
+    """
+    Play a recorded or prepared capture and
+    follow its outfile in channel telemetry
+    """
+
+    player.play()
+    telemetry().track(outfile, media)
+
+
+def stop_capture(player, media, reuse=True):
+    """
+    Stop capture and release its media, returning
+    the player to the idle pool unless it stalled.
+    Telemetry drops the media first so it is not
+    read after release
+    """
+
+    player.stop()
+    telemetry().detach(media)
+    media.release()
+    if reuse:
+        POOL["players"].append(player)
+    else:
+        player.release()
+
+
+def new_capture(inst, player, media, outfile, url, sid):
+    """
+    Capture handle with the details needed
+    to restart it, and file growth tracking
+    """
+
+    try:
+        size = os.path.getsize(outfile)
+    except OSError:
+        size = 0
+
+    return {
+        "inst": inst,
+        "player": player,
+        "media": media,
+        "outfile": outfile,
+        "url": url,
+        "stream_sid": sid,
+        "size": size,
+        "grown": CLOCK.now(),
+        "stalled": None,
+        "event_id": None,
+        "end": None,
+        "journaled": None,
+    }
+
+
+def prepare_capture(outfile, url, sid):
+    """
+    Build VLC instance, player and media for
+    outfile ahead of its start, without play()
+    """
+
+    (inst, player, media) = record_stream(url, outfile, sid)
+    return {"inst": inst, "player": player, "media": media, "outfile": outfile}
+
+
+def discard_capture(prepared, epg_arg):
+    """
+    Release a prepared capture that will not be used
+    and remove its folder if nothing was written
+    """
+
+    time_print(f"Discarding prepared capture: {prepared['outfile']}", epg_arg)
+    try:
+        stop_capture(prepared["player"], prepared["media"])
+    except Exception as err:
+        time_print("Unable to destroy prepared player reference due to error:", epg_arg)
+        write_print(str(err), epg_arg)
+    ts_filter.cancel(prepared["outfile"])
+    try:
+        os.rmdir(os.path.dirname(prepared["outfile"]))
+    except OSError:
+        pass
+
+
+def watch_capture(capture, epg_arg):
+    """
+    Check capture's outfile has grown, if not for
+    STALL_SECONDS stop and relaunch VLC appending to
+    the same outfile. Logs stall and its duration.
+    """
+
+    if not STALL_SECONDS:
+        return False
+    now = CLOCK.now()
+    try:
+        size = os.path.getsize(capture["outfile"])
+    except OSError:
+        size = 0
+
+    if size != capture["size"]:
+        if capture["stalled"]:
+            stall = (now - capture["stalled"]).total_seconds()
+            time_print(f"Capture resumed after {stall:.0f}s stall:", epg_arg)
+            indent_print(capture["outfile"], epg_arg)
+            capture["stalled"] = None
+        capture["size"] = size
+        capture["grown"] = now
+        if capture["journaled"] and (now - capture["journaled"]).total_seconds() >= JOURNAL_EVERY:
+            write_journal(capture, capture["event_id"], capture["end"])
+        return False
+
+    if (now - capture["grown"]).total_seconds() < STALL_SECONDS:
+        return False
+
+    if not capture["stalled"]:
+        capture["stalled"] = capture["grown"]
+    stall = (now - capture["stalled"]).total_seconds()
+    time_print(f"Capture stalled for {stall:.0f}s, restarting in place:", epg_arg)
+    indent_print(capture["outfile"], epg_arg)
+    try:
+        stop_capture(capture["player"], capture["media"], reuse=False)
+    except Exception as err:
+        time_print("Unable to destroy stalled player reference due to error:", epg_arg)
+        write_print(str(err), epg_arg)
+
+    (inst, player, media) = record_stream(
+        capture["url"], capture["outfile"], capture["stream_sid"]
+    )
+    start_capture(player, media, capture["outfile"])
+    capture.update({"inst": inst, "player": player, "media": media, "grown": now})
+    indent_print(f"START Instance: {inst}, Player: {player}, Media: {media}", epg_arg)
+    return True
+
+
+def write_journal(capture, event_id, end):
+    """
+    Record capture's outfile, EventId, expected UTC end
+    and bytes written in the channel journal, fsync'd so
+    a relaunch after a crash can resume the recording
+    """
+
+    capture.update({"event_id": event_id, "end": end, "journaled": CLOCK.now()})
+    entry = {
+        "outfile": capture["outfile"],
+        "event_id": event_id,
+        "end": end.strftime(FORMAT) if end else None,
+        "offset": capture["size"],
+        "written": CLOCK.utcnow().strftime(FORMAT),
+    }
+    try:
+        os.makedirs(os.path.dirname(JOURNAL), exist_ok=True)
+        temp_file = f"{JOURNAL}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, JOURNAL)
+    except OSError as err:
+        time_print(f"Unable to write recording journal {JOURNAL}: {err}", False)
+
+
+def clear_journal():
+    """
+    Remove the channel journal, no recording to resume
+    """
+
+    try:
+        os.remove(JOURNAL)
+    except OSError:
+        pass
+
+
+def resume_capture(rtp, sid):
+    """
+    Restart the journalled capture appending to its
+    outfile if its programme has not ended. Logs gap
+    since the file was last written, returns capture
+    and EventId or (None, None)
+    """
+
+    try:
+        with open(JOURNAL, "r") as f:
+            entry = json.load(f)
+        outfile = entry["outfile"]
+        end = datetime.datetime.strptime(entry["end"], FORMAT) if entry["end"] else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+    now = CLOCK.utcnow()
+    if end is None or end <= now or not os.path.isdir(os.path.dirname(outfile)):
+        time_print(f"Journal recording {outfile} has ended, not resuming", False)
+        clear_journal()
+        return None, None
+
+    try:
+        size = os.path.getsize(outfile)
+        last = datetime.datetime.utcfromtimestamp(os.path.getmtime(outfile))
+    except OSError:
+        size = 0
+        last = datetime.datetime.strptime(entry["written"], FORMAT)
+    gap = (now - last).total_seconds()
+
+    (inst, player, media) = record_stream(rtp, outfile, sid)
+    start_capture(player, media, outfile)
+    capture = new_capture(inst, player, media, outfile, rtp, sid)
+    write_journal(capture, entry["event_id"], end)
+    time_print(f"Resuming EventId {entry['event_id']} after restart, {gap:.1f}s gap since last write:", False)
+    indent_print(outfile, False)
+    indent_print(f"{size} bytes on disk, {entry['offset']} journalled, expected end {entry['end']}", False)
+    return capture, entry["event_id"]
+
+
+def open_handover():
+    """
+    Listen on the channel's Unix socket for an
+    upgraded recorder asking to take over
+    """
+
+    try:
+        os.makedirs(os.path.dirname(HANDOVER), exist_ok=True)
+        if os.path.exists(HANDOVER):
+            os.remove(HANDOVER)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(HANDOVER)
+        listener.listen(1)
+        listener.setblocking(False)
+        return listener
+    except OSError as err:
+        time_print(f"Unable to listen for upgrade handover on {HANDOVER}: {err}", False)
+        return None
+
+
+def send_message(conn, message):
+    """
+    Send one JSON line to the handover peer
+    """
+
+    conn.sendall(f"{json.dumps(message)}\n".encode())
+
+
+def read_message(conn):
+    """
+    Read one JSON line from the handover peer
+    """
+
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ConnectionError("handover peer closed the connection")
+        data += chunk
+    return json.loads(data)
+
+
+def drop_peer():
+    """
+    Close the upgraded recorder's connection
+    """
+
+    if PEER["conn"]:
+        PEER["conn"].close()
+    PEER.update({"conn": None, "since": None, "outfile": None})
+
+
+def hand_over(listener, capture, current_event, prepared):
+    """
+    Called each loop, never waits for the upgraded
+    recorder beyond HANDOVER_CONFIRM. Sends it the
+    recording state when it connects, stops the
+    capture once it reports ready and returns True
+    when it confirms recording. On failure or after
+    HANDOVER_WAIT recording carries on
+    """
+
+    if PEER["conn"] is None:
+        try:
+            conn, _ = listener.accept()
+        except (BlockingIOError, OSError):
+            return False
+        time_print("Upgraded recorder connected, handing over capture", False)
+        PEER.update({"conn": conn, "since": CLOCK.now(), "outfile": capture["outfile"] if capture else None})
+        state = {"event_id": current_event, "outfile": None, "end": None, "offset": 0}
+        if capture:
+            state.update({
+                "outfile": capture["outfile"],
+                "end": capture["end"].strftime(FORMAT) if capture["end"] else None,
+                "offset": capture["size"],
+            })
+        try:
+            conn.settimeout(HANDOVER_CONFIRM)
+            send_message(conn, state)
+        except OSError as err:
+            time_print(f"Upgrade handover abandoned, carrying on recording: {err}", False)
+            drop_peer()
+        return False
+
+    conn = PEER["conn"]
+    readable, _, _ = select.select([conn], [], [], 0)
+    if not readable:
+        if (CLOCK.now() - PEER["since"]).total_seconds() > HANDOVER_WAIT:
+            time_print("Upgrade handover abandoned, upgraded recorder not ready", False)
+            drop_peer()
+        return False
+
+    stopped = False
+    try:
+        if read_message(conn).get("status") != "ready":
+            raise ConnectionError("upgraded recorder not ready")
+        if (capture["outfile"] if capture else None) != PEER["outfile"]:
+            raise ConnectionError("programme changed since state was sent")
+        if capture:
+            stop_capture(capture["player"], capture["media"])
+        stopped = True
+        send_message(conn, {"status": "stopped"})
+        if read_message(conn).get("status") != "recording":
+            raise ConnectionError("upgraded recorder not recording")
+    except (OSError, ValueError, ConnectionError) as err:
+        time_print(f"Upgrade handover abandoned, carrying on recording: {err}", False)
+        if stopped and capture:
+            (inst, player, media) = record_stream(capture["url"], capture["outfile"], capture["stream_sid"])
+            start_capture(player, media, capture["outfile"])
+            capture.update({"inst": inst, "player": player, "media": media, "grown": CLOCK.now()})
+        return False
+    finally:
+        drop_peer()
+
+    if prepared:
+        discard_capture(prepared, False)
+    listener.close()
+    time_print("Upgraded recorder confirmed recording, script exit for upgrade.", False)
+    return True
+
+
+def take_over(rtp, sid):
+    """
+    Receive the running recorder's state, prepare
+    the same capture and play it once the old one
+    has stopped, appending to its outfile. Returns
+    capture and EventId. Without a recorder to take
+    over from, resumes any journal
+    """
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(HANDOVER_WAIT)
+    try:
+        conn.connect(HANDOVER)
+    except OSError as err:
+        conn.close()
+        time_print(f"No running recorder to take over from: {err}", False)
+        return resume_capture(rtp, sid)
+
+    prepared = None
+    with conn:
+        try:
+            state = read_message(conn)
+            outfile = state["outfile"]
+            if outfile:
+                prepared = prepare_capture(outfile, rtp, sid)
+            send_message(conn, {"status": "ready"})
+            if read_message(conn).get("status") != "stopped":
+                raise ConnectionError("running recorder did not stop")
+            capture = None
+            if prepared:
+                start_capture(prepared["player"], prepared["media"], outfile)
+                capture = new_capture(prepared["inst"], prepared["player"], prepared["media"], outfile, rtp, sid)
+                end = datetime.datetime.strptime(state["end"], FORMAT) if state["end"] else None
+                write_journal(capture, state["event_id"], end)
+            send_message(conn, {"status": "recording"})
+        except (OSError, ValueError, KeyError, ConnectionError) as err:
+            time_print(f"Upgrade handover failed, previous recorder keeps recording: {err}", False)
+            if prepared:
+                discard_capture(prepared, False)
+            sys.exit("SCRIPT EXIT: UPGRADE HANDOVER FAILED")
+
+    time_print(f"Took over EventId {state['event_id']} from previous recorder:", False)
+    indent_print(f"{outfile} from {state['offset']} bytes", False)
+    return capture, state["event_id"]
+
+
+@stora_core.retry(lambda: {"stop": tenacity.stop_after_attempt(5)})
 def initialise(sched_path, silent=False):
     """
     Load the channel list and scheduled recordings.
     Tenacity to manage moments when schedule absent.
     """
 
-    channels = load_channel_config(silent)  # Get the available channels
+    chnl = load_channel_config(silent)  # Get the channel's streams
     schedule = load_schedule(sched_path, silent)  # Get the schedule
-    recordings = parse_schedule(schedule, channels)  # Parse the schedule information
+    recordings = parse_schedule(schedule, chnl)  # Parse the schedule information
 
     if recordings:
         return recordings
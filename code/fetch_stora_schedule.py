@@ -1,19 +1,35 @@
 #!/usr/bin/env python3.8
 
 """
-Fetch JSON from PATV EPG metadata API for next four day's shows (not today's)
+Fetch JSON from PATV EPG metadata API for a rolling horizon of days (not today's)
 Overwrite each time and split into channels and place into correct channel/date folder
 
 main():
-1. Creates STORA schedules for next four days if not already created
-2. Call the API for next four days programming metadata, using fetch():
-3. If first fetch fails, fetch(): will retry with tenacity until successful (10 retries)
-4. When downloaded outputs to date/channel folder
-5. Iterates channel programmes extracting a day schedule for given day/channel
+1. Builds the date horizon of STORA_FETCH_DAYS days (default four) from tomorrow
+   and creates STORA channel folders for each day if not already created
+2. Checks fetch_state.json for each channel/day. Near days (STORA_NEAR_DAYS,
+   default two) are refreshed every run, far days only every STORA_FAR_REFRESH
+   hours (default six) or where no schedule exists yet
+3. Call the API for each due channel/day's programming metadata, using fetch():
+   Requests are conditional on the ETag/Last-Modified of the last payload, and
+   an unchanged response (304) skips the channel/day entirely
+   Transient failures (connection errors, 429/5xx, broken streams, per-request
+   deadline) are retried by fetch_schedule(): with jittered exponential backoff
+   up to STORA_FETCH_ATTEMPTS times, drawing on a global STORA_RETRY_BUDGET
+   Channels failing STORA_BREAKER_THRESHOLD channel/days in a row, or with a
+   permanent 4xx error, have their circuit broken and are skipped for the run
+   Failures are recorded in fetch_state.json and always retried next run.
+   Launching with --retry-failed retries only failed channel/days
+4. Streams the response body through an incremental item parser, so
+   the full payload is never held in memory or written to disk. Where
+   STORA_DEBUG is set the raw payload is kept in the date/channel folder
+5. Each streamed programme is converted to a day schedule entry for given day/channel
    Populates JSON list with dictionaries containing: start time, duration, channel, programme
    (No handles used for these due to inability for demux dump to overlap)
+   Where the payload hash matches the last fetch, schedule comparison is skipped
 6. Writes new schedules to json with filename formatted {channel}_schedule_{YYYY-MM-DD}.json
-7. Where json list already exists compares data and updates if changes have occurred
+7. Where json list already exists compares data and updates if changes have occurred.
+   EIT fallback schedules from eit_schedule_harvester.py are replaced outright
 8. Places finished schedules for radox recording scripts in schedules/
 9. Move schedules over two days old to completed/schedules folder
 
@@ -21,270 +37,505 @@ Joanna White
 2022
 """
 
+import argparse
 import datetime
+import hashlib
 import json
 import logging
 # Public packages
 import os
+import re
 import shutil
+import time
+from contextlib import closing
 
-import requests
-import tenacity
-
-# Date variables for EPG API calls
-TOD = datetime.date.today()
-TOM1 = TOD + datetime.timedelta(days=1)
-TOM2 = TOM1 + datetime.timedelta(days=1)
-TOM3 = TOM2 + datetime.timedelta(days=1)
-TOM4 = TOM3 + datetime.timedelta(days=1)
-TOM1 = TOM1.strftime("%Y-%m-%d")
-TOM2 = TOM2.strftime("%Y-%m-%d")
-TOM3 = TOM3.strftime("%Y-%m-%d")
-TOM4 = TOM4.strftime("%Y-%m-%d")
-START1 = f"{TOM1}T00:00:00"
-END1 = f"{TOM1}T23:59:00"
-START2 = f"{TOM2}T00:00:00"
-END2 = f"{TOM2}T23:59:00"
-START3 = f"{TOM3}T00:00:00"
-END3 = f"{TOM3}T23:59:00"
-START4 = f"{TOM4}T00:00:00"
-END4 = f"{TOM4}T23:59:00"
+import channel_registry
+import stora_core
+
+requests = stora_core.lazy_module('requests')
+tenacity = stora_core.lazy_module('tenacity')
+
+# Date variables for EPG API calls, today is set when main() runs
+FETCH_DAYS = int(os.environ.get('STORA_FETCH_DAYS', 4))
+NEAR_DAYS = int(os.environ.get('STORA_NEAR_DAYS', 2))
+FAR_REFRESH = int(os.environ.get('STORA_FAR_REFRESH', 6))
 # If a different date period needs targeting use:
-#START1 = '2024-11-05T00:00:00'
-#END1 = '2024-11-05T23:59:00'
+#FIRST_DAY = datetime.date(2024, 11, 5)
+FIRST_DAY = None
 
 # Global path variables
 FORMAT = '%Y-%m-%d'
-STORAGE_PATH = os.environ.get('STORAGE_PATH')
-FOLDERS = os.environ.get('STORA_FOLDERS')
-COMPLETE_PTH = os.environ.get('STORA_COMPLETE')
+STATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
+COMPLETE_PTH = os.environ.get('STORA_COMPLETE', '')
 SCHEDULE_PATH = os.path.join(FOLDERS, 'schedules/')
+EIT_FALLBACKS = os.path.join(SCHEDULE_PATH, 'eit/fallback.json')
 COMPLETED = os.path.join(COMPLETE_PTH, 'schedules/')
 LOG_FILE = os.path.join(FOLDERS, 'logs/fetch_stora_schedule.log')
+STATE_FILE = os.path.join(FOLDERS, 'fetch_state.json')
+# Set STORA_DEBUG to keep raw PATV payloads in date/channel folders
+DEBUG = bool(os.environ.get('STORA_DEBUG'))
+CHUNK_SIZE = 65536
+ITEM_ARRAY = re.compile(r'"item"\s*:\s*\[')
+
+# Fault handling for PATV fetches
+MAX_ATTEMPTS = int(os.environ.get('STORA_FETCH_ATTEMPTS', 3))
+RETRY_BUDGET = {"remaining": int(os.environ.get('STORA_RETRY_BUDGET', 30))}
+BREAKER_THRESHOLD = int(os.environ.get('STORA_BREAKER_THRESHOLD', 2))
+BREAKERS = {}
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+REQUEST_DEADLINE = int(os.environ.get('STORA_REQUEST_DEADLINE', 180))
 
+# PATV API details including unique identifiers for in-scope channels
+URL = os.environ.get("PATV_URL", "")
+HEADERS = {"accept": "application/json", "apikey": os.environ.get("PATV_KEY", "")}
 
-# TARGET DATE PATHS
-DATE_PATH1 = START1[0:4] + "/" + START1[5:7] + "/" + START1[8:10]
-DATE_PATH2 = START2[0:4] + "/" + START2[5:7] + "/" + START2[8:10]
-DATE_PATH3 = START3[0:4] + "/" + START3[5:7] + "/" + START3[8:10]
-DATE_PATH4 = START4[0:4] + "/" + START4[5:7] + "/" + START4[8:10]
-PATHS = [
-    os.path.join(STORAGE_PATH, DATE_PATH1),
-    os.path.join(STORAGE_PATH, DATE_PATH2),
-    os.path.join(STORAGE_PATH, DATE_PATH3),
-    os.path.join(STORAGE_PATH, DATE_PATH4),
-]
-
-# Setup logging
-logging.basicConfig(
-    filename=LOG_FILE,
-    filemode="a",
-    format="%(asctime)s\t%(levelname)s\t%(message)s",
-    level=logging.INFO,
-)
+# Dictionary of Redux channel names and unique EPG retrieval paths, filled in main()
+CHANNEL = {}
 
-# PATV API details including unique identifiers for in-scope channels
-URL = os.environ["PATV_URL"]
-HEADERS = {"accept": "application/json", "apikey": os.environ["PATV_KEY"]}
-
-# Dictionary of Redux channel names and unique EPG retrieval paths
-CHANNEL = {
-    "bbconehd": os.environ['PA_BBCONE'],
-    "bbctwohd": os.environ['PA_BBCTWO'],
-    "bbcthree": os.environ['PA_BBCTHREE'],
-    "bbcfourhd": os.environ['PA_BBCFOUR'],
-    "bbcnewshd": os.environ['PA_BBCNEWS'],
-    "cbbchd": os.environ['PA_CBBC'],
-    "cbeebieshd": os.environ['PA_CBEEBIES'],
-    "itv1": os.environ['PA_ITV1'],
-    "itv2": os.environ['PA_ITV2'],
-    "itv3": os.environ['PA_ITV3'],
-    "itv4": os.environ['PA_ITV4'],
-    "channel4": os.environ['PA_CHANNEL4'],
-    "more4": os.environ['PA_MORE4'],
-    "film4": os.environ['PA_FILM4'],
-    "five": os.environ['PA_FIVE'],
-    "5star": os.environ['PA_5STAR'],
-    "e4": os.environ['PA_E4']
-}
-
-
-@tenacity.retry(wait=tenacity.wait_fixed(60))
-def fetch(value, pth):
+
+class FetchError(Exception):
     """
-    Retrieval of EPG metadata dependent on date
+    Transient PATV failure, eligible for retry
+    """
+
+
+class ChannelError(Exception):
+    """
+    Permanent PATV failure for channel, not retried
+    """
+
+
+def date_range(first_day, days, today):
+    """
+    Build the fetch horizon from first_day
+    returning a dictionary per day with API
+    start/end and STORAGE_PATH date path
+    """
+    horizon = []
+    for num in range(0, days):
+        day = first_day + datetime.timedelta(days=num)
+        date = day.strftime(FORMAT)
+        horizon.append({
+            "date": date,
+            "offset": (day - today).days,
+            "start": f"{date}T00:00:00",
+            "end": f"{date}T23:59:00",
+            "path": os.path.join(STORAGE_PATH, day.strftime("%Y/%m/%d")),
+        })
+    return horizon
+
+
+def load_state(today):
+    """
+    Load record of last fetch per channel/day
+    keyed '{channel} {YYYY-MM-DD}', dropping
+    entries for days already passed
+    """
+    if not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, "r") as inf:
+            state = json.load(inf)
+    except (OSError, ValueError) as err:
+        logging.warning("Unable to read fetch state, all days will be refreshed: %s", err)
+        return {}
+
+    today = today.strftime(FORMAT)
+    return {key: val for key, val in state.items() if key.split(" ")[-1] > today}
+
+
+def save_state(state):
+    """
+    Write fetch state via temporary file
+    so a failed run never truncates it
+    """
+    temp_file = f"{STATE_FILE}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(temp_file, STATE_FILE)
+
+
+def refresh_due(entry, key, day):
+    """
+    Near days are refreshed every run, far days
+    only when FAR_REFRESH hours have passed or
+    there is no schedule for the day yet
+    """
+    if not entry or entry.get("failed"):
+        return True
+    if day["offset"] <= NEAR_DAYS:
+        return True
+    if not os.path.exists(schedule_path(key, day["date"])):
+        return True
+    fetched = datetime.datetime.strptime(entry["fetched"], STATE_FORMAT)
+    return datetime.datetime.now() - fetched >= datetime.timedelta(hours=FAR_REFRESH)
+
+
+def schedule_path(key, date):
+    """
+    Return path for channel's day schedule
+    """
+    return os.path.join(SCHEDULE_PATH, f"{key}_schedule_{date}.json")
+
+
+def breaker_open(key):
+    """
+    Check if channel's circuit is broken
     """
-    if pth[-2:] == START1[8:10]:
-        start, end = START1, END1
-    elif pth[-2:] == START2[8:10]:
-        start, end = START2, END2
-    elif pth[-2:] == START3[8:10]:
-        start, end = START3, END3
-    elif pth[-2:] == START4[8:10]:
-        start, end = START4, END4
+    return BREAKERS.get(key, 0) >= BREAKER_THRESHOLD
+
+
+def trip_breaker(key, permanent=False):
+    """
+    Count a failed channel/day, permanent
+    failures break the circuit immediately
+    """
+    if permanent:
+        BREAKERS[key] = BREAKER_THRESHOLD
     else:
-        return None
+        BREAKERS[key] = BREAKERS.get(key, 0) + 1
+    if breaker_open(key):
+        logging.critical("Circuit broken for %s, remaining days skipped this run", key)
+
+
+def budget_exhausted(retry_state):
+    """
+    Tenacity stop condition for global retry budget
+    """
+    return RETRY_BUDGET["remaining"] <= 0
+
+
+def spend_budget(retry_state):
+    """
+    Tenacity hook, take one retry from budget
+    """
+    RETRY_BUDGET["remaining"] -= 1
+    logging.warning(
+        "Retrying fetch after failure: %s. Retry budget remaining %s",
+        retry_state.outcome.exception(),
+        RETRY_BUDGET["remaining"],
+    )
+
+
+@stora_core.retry(lambda: dict(
+    retry=tenacity.retry_if_exception_type(FetchError),
+    wait=tenacity.wait_random_exponential(multiplier=5, max=60),
+    stop=tenacity.stop_any(tenacity.stop_after_attempt(MAX_ATTEMPTS), budget_exhausted),
+    before_sleep=spend_budget,
+    reraise=True,
+))
+def fetch_schedule(key, value, day, entry=None):
+    """
+    Fetch and stream parse one channel/day within
+    REQUEST_DEADLINE. Returns dictionary of results,
+    with no schedule where PATV reports no change.
+    The request is only conditional while the day's
+    schedule file exists, else a 304 leaves it unwritten
+    """
+    deadline = time.monotonic() + REQUEST_DEADLINE
+    if not os.path.exists(schedule_path(key, day["date"])):
+        entry = None
+    req = fetch(value, day, entry)
+    with closing(req):
+        result = {
+            "fetched": datetime.datetime.now().strftime(STATE_FORMAT),
+            "etag": req.headers.get("ETag"),
+            "last_modified": req.headers.get("Last-Modified"),
+        }
+        if req.status_code == 304:
+            return result
+        digest = hashlib.sha256()
+        chunks = iter_response_chunks(key, day["path"], req, digest, deadline)
+        schedule = schedule_extraction(chunks, key)
+    if schedule is False:
+        raise FetchError("No programme items retrieved from stream")
+
+    result["schedule"] = schedule
+    result["hash"] = digest.hexdigest()
+    return result
+
+
+def fetch(value, day, entry=None):
+    """
+    Retrieval of EPG metadata dependent on date
+    Returns the open streamed response, the body
+    is consumed incrementally by stream_items()
+    """
+    headers = dict(HEADERS)
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    params = {"channelId": f"{value}", "start": day["start"], "end": day["end"], "aliases": "True"}
+    print(params)
     try:
-        params = {"channelId": f"{value}", "start": start, "end": end, "aliases": "True"}
-        print(params)
-        req = requests.request("GET", URL, headers=HEADERS, params=params, timeout=1200)
-        print(req.text, params)
-        dct = json.loads(req.text)
-        return dct
-    except Exception as err:
-        print(f"fetch(): {err} **** PROBLEM: Cannot fetch EPG metadata. Tenacity will retry every 60 seconds")
-        logging.critical("**** PROBLEM: Cannot fetch EPG metadata. Tenacity will retry every 60 second")
-        return None
+        req = requests.request(
+            "GET", URL, headers=headers, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True
+        )
+    except requests.exceptions.RequestException as err:
+        raise FetchError(f"Cannot fetch EPG metadata: {err}") from err
 
+    if req.status_code == 429 or req.status_code >= 500:
+        req.close()
+        raise FetchError(f"PATV returned status {req.status_code}")
+    if req.status_code not in (200, 304):
+        req.close()
+        raise ChannelError(f"PATV returned status {req.status_code}")
+    if req.encoding is None:
+        req.encoding = "utf-8"
+    return req
 
-def main():
+
+def main(today=None, argv=None):
     """
-    Create json dumps of programming
+    Stream programming for each due channel/day
     Sort into new JSON schedule for off-air recording
     """
 
+    parser = argparse.ArgumentParser(description="Fetch PATV schedules for the coming days")
+    parser.add_argument('--retry-failed', action='store_true', help="Retry only failed channel/days")
+    args = parser.parse_args(argv)
+    stora_core.require_env('STORAGE_PATH', 'STORA_FOLDERS', 'STORA_COMPLETE', 'PATV_URL', 'PATV_KEY')
+    logging.basicConfig(filename=LOG_FILE, filemode="a", format=stora_core.LOG_FORMAT, level=logging.INFO)
+    if not CHANNEL:
+        CHANNEL.update({key: chnl.pa_id for key, chnl in channel_registry.with_field('pa_id').items()})
+    today = today or datetime.date.today()
+    horizon = date_range(FIRST_DAY or today + datetime.timedelta(days=1), FETCH_DAYS, today)
+    state = load_state(today)
+
     # Checks if all channel folders exist in storage_path
     logging.info("========= FETCH RADOX SCHEDULE START ====================")
+    for key, chnl in channel_registry.channels().items():
+        if chnl.pa and not chnl.pa_id:
+            logging.warning("Skipping %s, PATV channel ID %s not set in environment", key, chnl.pa)
     for item in CHANNEL.keys():
-        for pth in PATHS:
-            item_path = os.path.join(pth, item)
+        for day in horizon:
+            item_path = os.path.join(day["path"], item)
             if not os.path.exists(item_path):
                 logging.info("Generating new path for JSON schedules: %s", item_path)
                 os.makedirs(item_path, exist_ok=True)
             else:
                 continue
 
-    list_of_json = []
-    for pth in PATHS:
+    for day in horizon:
         # If metadata cannot be retrieved the script continues to next
         logging.info(
             "Requests will now attempt to retrieve the EPG channel metadata for path: %s",
-            pth,
+            day["path"],
         )
         for key, value in CHANNEL.items():
-            dct = fetch(value, pth)
-            if not dct:
-                logging.warning("No Dictionary retrieved for %s - %s", value, pth)
+            state_key = f"{key} {day['date']}"
+            entry = state.get(state_key, {})
+            if args.retry_failed and not entry.get("failed"):
                 continue
-            fname = retrieve_dct_data(key, pth, dct)
-            list_of_json.append(fname)
-            if not fname:
-                print(f"Data retrieval failed for {key}: {pth}")
+            if not refresh_due(entry, key, day):
+                logging.info("Skipping %s, last fetched %s", state_key, entry["fetched"])
+                continue
+            if breaker_open(key):
+                state[state_key] = dict(entry, failed=True, reason="Circuit broken for channel")
                 continue
 
-    for item in list_of_json:
-        print(item)
-        schedule = []
-        schedule = schedule_extraction(item)
-        # assess schedule for missing duration times
-        if "'end': 'None'" in str(schedule):
-            logging.warning("* PROBLEM WITH DURATION IN THIS SCHEDULE: %s", item)
-        channel_pth = os.path.split(item)[0]
-        date_path_split = os.path.split(channel_pth)
-        date_path = date_path_split[0]
-        if "/video/" in date_path:
-            date_only = date_path.split("/video/")[1]
-        else:
-            date_only = date_path.split("/STORA/")[1]
-        date_only = date_only.rstrip("/")
-        date_now = date_only.replace("/", "-")
-        day_schedule = os.path.join(
-            SCHEDULE_PATH, f"{date_path_split[1]}_schedule_{date_now}.json"
-        )
-        if not os.path.exists(day_schedule):
-            logging.info("New schedule being created: %s", day_schedule)
-            with open(day_schedule, "w") as f:
-                json.dump(schedule, f, indent=4)
-        else:
-            logging.info(
-                "Schedule already exists, checking for mismatched data before replacing: %s",
-                day_schedule,
-            )
-            with open(day_schedule, "r") as inf:
-                existing_schedule = json.load(inf)
-                if len(schedule) == len(existing_schedule):
-                    logging.info(
-                        "Length of current schedule and new schedule match. Likely data is good quality"
-                    )
-                else:
-                    os.remove(item)
-                    continue
-
-            # If already exists, compare and update any changes
-            result = compare_schedule(day_schedule, schedule)
-            if "Mismatch" in result:
-                logging.info("Schedule does not match, updates required")
-                try:
-                    os.remove(day_schedule)
-                    with open(day_schedule, "w") as f:
-                        json.dump(schedule, f, indent=4)
-                except Exception:
-                    print(f"Unable to delete {day_schedule} or make new one")
-
-        try:
-            os.remove(item)
-        except Exception as exc:
-            raise logging.warning("Unable to remove file %s", item) from exc
-
+            try:
+                result = fetch_schedule(key, value, day, entry)
+            except (FetchError, ChannelError) as err:
+                print(f"Data retrieval failed for {key}: {day['path']}")
+                logging.critical("**** PROBLEM: Cannot fetch EPG metadata for %s: %s", state_key, err)
+                trip_breaker(key, isinstance(err, ChannelError))
+                state[state_key] = dict(entry, failed=True, reason=str(err))
+                continue
+            BREAKERS[key] = 0
+
+            schedule = result.pop("schedule", None)
+            if schedule is None:
+                logging.info("EPG metadata unchanged since last fetch: %s", state_key)
+                entry.pop("failed", None)
+                entry.pop("reason", None)
+                state[state_key] = dict(entry, fetched=result["fetched"])
+                continue
+            if result["hash"] == entry.get("hash") and os.path.exists(schedule_path(key, day["date"])):
+                logging.info("EPG payload identical to last fetch, no update needed: %s", state_key)
+            else:
+                update_schedule(key, day["date"], schedule)
+            state[state_key] = result
+
+    save_state(state)
+    failed = [key for key, val in state.items() if val.get("failed")]
+    if failed:
+        logging.warning("%s channel/days failed, retried next run: %s", len(failed), ", ".join(failed))
+    logging.info("Retry budget remaining: %s", RETRY_BUDGET["remaining"])
     logging.info("Schedule created completed. Cleaning up old schedules.")
     clean_up()
     logging.info("========= FETCH RADOX SCHEDULE END ====================\n")
 
 
-def retrieve_dct_data(key, pth, dct=None):
+def update_schedule(key, date_now, schedule):
     """
-    Check if DCT data is None, if not instigate json_split
+    Write new day schedule, or compare with
+    existing schedule and replace if changed
     """
-    if dct is None:
-        logging.critical(
-            "FAILED: Multiple attempt to retrieve metadata. Script exiting."
+
+    # assess schedule for missing duration times
+    if "'end': 'None'" in str(schedule):
+        logging.warning("* PROBLEM WITH DURATION IN THIS SCHEDULE: %s - %s", key, date_now)
+    day_schedule = schedule_path(key, date_now)
+    if not os.path.exists(day_schedule) or release_fallback(day_schedule):
+        logging.info("New schedule being created: %s", day_schedule)
+        with open(day_schedule, "w") as f:
+            json.dump(schedule, f, indent=4)
+        return
+
+    logging.info(
+        "Schedule already exists, checking for mismatched data before replacing: %s",
+        day_schedule,
+    )
+    with open(day_schedule, "r") as inf:
+        existing_schedule = json.load(inf)
+    if len(schedule) == len(existing_schedule):
+        logging.info(
+            "Length of current schedule and new schedule match. Likely data is good quality"
         )
-        return False
     else:
-        logging.info("EPG metadata successfully retrieved. Dumping to channel path")
-        fname = os.path.join(pth, key, f"schedule_{key}.json")
-        with open(fname, "w") as f:
-            json.dump(dct, f, indent=4)
-        return fname
+        return
+
+    # If already exists, compare and update any changes
+    result = compare_schedule(existing_schedule, schedule)
+    if "Mismatch" in result:
+        logging.info("Schedule does not match, updates required")
+        try:
+            os.remove(day_schedule)
+            with open(day_schedule, "w") as f:
+                json.dump(schedule, f, indent=4)
+        except Exception:
+            print(f"Unable to delete {day_schedule} or make new one")
 
 
-def schedule_extraction(json_path):
+def release_fallback(day_schedule):
     """
-    For each JSON, open and extract title, date, start and end time
-    Use this data to populate a top level channel JSON schedule
-    Located in the STORAGE_PATH/CHANNEL
+    Remove schedule from eit_schedule_harvester.py's
+    fallback list, True if it was an EIT fallback
+    that PATV should now replace
     """
-    pth = os.path.split(json_path)[0]
-    key = os.path.split(pth)[1]
-
-    with open(json_path) as inf:
-        dct = json.load(inf)
-    if type(dct) is not dict:
+    fname = os.path.basename(day_schedule)
+    try:
+        with open(EIT_FALLBACKS, "r") as inf:
+            fallbacks = json.load(inf)
+    except (OSError, ValueError):
+        return False
+    if fname not in fallbacks:
         return False
+    logging.info("Replacing EIT fallback schedule with PATV schedule: %s", fname)
+    fallbacks.remove(fname)
+    temp_file = f"{EIT_FALLBACKS}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(fallbacks, f, indent=4)
+    os.replace(temp_file, EIT_FALLBACKS)
+    return True
+
+
+def iter_response_chunks(key, pth, req, digest, deadline):
+    """
+    Generator of decoded text chunks from the PATV
+    response body, for stream_items() to parse,
+    updating digest for change detection. If
+    STORA_DEBUG is set the raw payload is also
+    kept in the channel path for inspection
+    """
+    payload = None
+    if DEBUG:
+        fname = os.path.join(pth, key, f"schedule_{key}.json")
+        logging.info("STORA_DEBUG set, keeping raw EPG metadata: %s", fname)
+        payload = open(fname, "w")
+
+    try:
+        for chunk in req.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True):
+            if time.monotonic() > deadline:
+                raise FetchError(f"Request deadline of {REQUEST_DEADLINE} seconds exceeded")
+            digest.update(chunk.encode("utf-8"))
+            if payload:
+                payload.write(chunk)
+            yield chunk
+    finally:
+        if payload:
+            payload.close()
+
+
+def stream_items(chunks):
+    """
+    Incrementally decode each programme dictionary
+    from the PATV 'item' array as the chunks arrive
+    Raises ValueError if no 'item' array is found
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    in_items = False
+    for chunk in chunks:
+        buffer += chunk
+        if not in_items:
+            match = ITEM_ARRAY.search(buffer)
+            if not match:
+                continue
+            buffer = buffer[match.end():]
+            in_items = True
+
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos_end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item incomplete, wait for next chunk
+                break
+            pos = pos_end
+            yield item
+        buffer = buffer[pos:]
+
+    if not in_items:
+        raise ValueError("No 'item' array found in PATV response")
+    raise ValueError("PATV response ended before 'item' array closed")
+
+
+def schedule_extraction(chunks, key):
+    """
+    For each streamed programme extract title, date,
+    start and end time. Use this data to populate a
+    channel JSON schedule, False if stream unreadable
+    """
 
     channel_schedule = []
-    for subdct in dct["item"]:
-        title = date_time = duration = ""
-        try:
-            title = subdct["title"]
-        except (IndexError, KeyError, TypeError):
-            title = ""
-        try:
-            date_time = subdct["dateTime"]
-        except (IndexError, KeyError, TypeError):
-            date_time = ""
-        try:
-            duration = subdct["duration"]
-            duration = int(duration)
-        except (IndexError, KeyError, TypeError):
-            duration = 0
+    try:
+        for subdct in stream_items(chunks):
+            title = date_time = duration = ""
+            try:
+                title = subdct["title"]
+            except (IndexError, KeyError, TypeError):
+                title = ""
+            try:
+                date_time = subdct["dateTime"]
+            except (IndexError, KeyError, TypeError):
+                date_time = ""
+            try:
+                duration = subdct["duration"]
+                duration = int(duration)
+            except (IndexError, KeyError, TypeError):
+                duration = 0
 
-        # Skip over programmes with '0' duration
-        if duration == 0:
-            continue
+            # Skip over programmes with '0' duration
+            if duration == 0:
+                continue
 
-        progdct = build_timings(title, date_time, duration, key)
-        channel_schedule.append(progdct)
+            progdct = build_timings(title, date_time, duration, key)
+            channel_schedule.append(progdct)
+    except (ValueError, requests.exceptions.RequestException) as err:
+        logging.warning("Unable to stream EPG metadata for %s: %s", key, err)
+        return False
 
     return channel_schedule
 
@@ -318,14 +569,12 @@ def build_timings(title, date_time, duration, key):
     return data
 
 
-def compare_schedule(schedule_path, data):
+def compare_schedule(existing_schedule, data):
     """
-    Open existing schedule and compare current
+    Compare existing schedule to current
     schedule to see if it's changed. Map change to logs
     Update different lines of original schedule
     """
-    with open(schedule_path) as inf:
-        existing_schedule = json.load(inf)
     json1 = existing_schedule
     json2 = data
 
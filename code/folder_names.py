@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+Codec for STORA programme folder names, in place of slicing
+folder[0:8] and folder[-8:] and calling strptime per folder in
+each cron script.
+
+Folders are named HH-MM-SS-{eventId or channel}-HH-MM-SS, the
+programme's UTC start time, then the EventId where recorded from
+EIT running status or the channel name where recorded from the
+EPG schedule, then its duration. Folders sit in the YYYY/MM/DD
+path of the day they start, except items launched just before
+midnight for a 00-00-00 start, which are written to the next day.
+A duration carrying the end past midnight gives an end on the
+following day.
+
+encode() - folder name from start datetime, identifier and seconds
+parse() - Folder for one name and day, None where it does not match
+parse_listing() - Listing of a whole channel/day folder listing,
+                  with starts and ends as second offsets from the
+                  day's midnight in two arrays, from one regex pass
+                  over the listing. folders() returns them all,
+                  ended() and running() select them against a
+                  time with integer comparisons
+
+2026
+"""
+
+import array
+import collections
+import datetime
+import re
+
+import stora_records
+
+PATTERN = r"([01]\d|2[0-3])-([0-5]\d)-([0-5]\d)-(.+)-(\d{2})-([0-5]\d)-([0-5]\d)"
+FOLDER = re.compile(f"^{PATTERN}$")
+LISTING = re.compile(f"^{PATTERN}$", re.MULTILINE)
+
+
+class Folder(collections.namedtuple(
+    "Folder", ["name", "ident", "start", "end"]
+)):
+    """
+    Programme folder with start and end datetimes
+    """
+
+    __slots__ = ()
+
+    @property
+    def seconds(self):
+        """
+        Duration in seconds
+        """
+        return int((self.end - self.start).total_seconds())
+
+    @property
+    def duration_hms(self):
+        """
+        Duration as %H-%M-%S, as in the name
+        """
+        return stora_records.hms(self.seconds)
+
+
+def midnight(day):
+    """
+    Datetime at the start of a date, datetime
+    or YYYY-MM-DD string
+    """
+    if isinstance(day, str):
+        day = datetime.datetime.strptime(day[:10], "%Y-%m-%d")
+    return datetime.datetime(day.year, day.month, day.day)
+
+
+def seconds(hour, mins, secs):
+    """
+    Seconds from HH, MM, SS strings
+    """
+    return int(hour) * 3600 + int(mins) * 60 + int(secs)
+
+
+def encode(start, ident, duration):
+    """
+    Folder name for a programme starting at
+    datetime start lasting duration seconds
+    """
+    return f"{start.strftime(stora_records.FTIME)}-{ident}-{stora_records.hms(duration)}"
+
+
+def parse(name, day):
+    """
+    Folder for name in the given day's path,
+    None where name is not a programme folder
+    """
+    match = FOLDER.match(name)
+    if not match:
+        return None
+    hour, mins, secs, ident, d_hour, d_mins, d_secs = match.groups()
+    start = midnight(day) + datetime.timedelta(seconds=seconds(hour, mins, secs))
+    return Folder(name, ident, start, start + datetime.timedelta(seconds=seconds(d_hour, d_mins, d_secs)))
+
+
+class Listing(collections.namedtuple(
+    "Listing", ["day", "names", "idents", "starts", "ends", "rejected"]
+)):
+    """
+    Programme folders of one channel/day. starts and
+    ends are arrays of seconds from the day's midnight,
+    rejected lists names that are not programme folders
+    """
+
+    __slots__ = ()
+
+    def folder(self, idx):
+        """
+        Folder for the listing entry at idx
+        """
+        return Folder(
+            self.names[idx],
+            self.idents[idx],
+            self.day + datetime.timedelta(seconds=self.starts[idx]),
+            self.day + datetime.timedelta(seconds=self.ends[idx]),
+        )
+
+    def offset(self, when):
+        """
+        Seconds from the listing's midnight to when
+        """
+        return int((when - self.day).total_seconds())
+
+    def folders(self):
+        """
+        Folder for every listing entry
+        """
+        return [self.folder(idx) for idx in range(len(self.names))]
+
+    def ended(self, now):
+        """
+        Folders whose end has passed at now
+        """
+        cut = self.offset(now)
+        return [self.folder(idx) for idx, end in enumerate(self.ends) if end < cut]
+
+    def running(self, now):
+        """
+        Folders not yet ended at now
+        """
+        cut = self.offset(now)
+        return [self.folder(idx) for idx, end in enumerate(self.ends) if end >= cut]
+
+
+def parse_listing(names, day):
+    """
+    Listing for folder names in the given
+    day's path, in the order given
+    """
+    names = list(names)
+    found = list(LISTING.finditer("\n".join(names)))
+    parsed = [match.group(0) for match in found]
+    starts = array.array("l", (seconds(*match.group(1, 2, 3)) for match in found))
+    durations = array.array("l", (seconds(*match.group(5, 6, 7)) for match in found))
+    ends = array.array("l", map(sum, zip(starts, durations)))
+    rejected = []
+    if len(parsed) != len(names):
+        matched = set(parsed)
+        rejected = [name for name in names if name not in matched]
+    return Listing(midnight(day), parsed, [match.group(4) for match in found], starts, ends, rejected)
@@ -25,74 +25,18 @@ import os
 import subprocess
 from datetime import datetime, timedelta
 
+import channel_registry
+import folder_names
+import stora_core
+
 # Static global variables
 FORMAT = '%Y-%m-%d %H-%M-%S'
-STORAGE_PATH = os.environ['STORAGE_PATH']
-STORA_PTH = os.environ['STORA_PATH']
-CODEPTH = os.environ['CODE']
-FOLDERS = os.environ['STORA_FOLDERS']
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
-TODAY = datetime.now()
-YEST = TODAY - timedelta(1)
-DATE_PATH = os.path.join(
-    STORAGE_PATH, f"{str(TODAY)[0:4]}/{str(TODAY)[5:7]}/{str(TODAY)[8:10]}/"
-)
-YEST_PATH = os.path.join(
-    STORAGE_PATH, f"{str(YEST)[0:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/"
-)
-TODAY_DATE = f"{str(TODAY)[0:4]}-{str(TODAY)[5:7]}-{str(TODAY)[8:10]}"
-YEST_DATE = f"{str(YEST)[0:4]}-{str(YEST)[5:7]}-{str(YEST)[8:10]}"
-
-# Setup logging
-LOGGER = logging.getLogger('get_stream_info')
-HDLR = logging.FileHandler(os.path.join(FOLDERS, 'logs/get_stream_info.log'))
-FORMATTER = logging.Formatter('%(asctime)s\t%(levelname)s\t%(message)s')
-HDLR.setFormatter(FORMATTER)
-LOGGER.addHandler(HDLR)
-LOGGER.setLevel(logging.INFO)
-
-CHANNELS = {'bbconehd': 'BBC One HD',
-            'bbctwohd': 'BBC Two HD',
-            'bbcthree': 'BBC Three HD',
-            'bbcfourhd': 'BBC Four HD',
-            'bbcnewshd': 'BBC NEWS HD',
-            'cbbchd': 'CBBC HD',
-            'cbeebieshd': 'CBeebies HD',
-            'channel4': 'Channel 4 HD',
-            'five': 'Channel 5 HD',
-            'film4': 'Film4',
-            '5star': '5STAR',
-            'itv1': 'ITV HD',
-            'itv2': 'ITV2',
-            'itv3': 'ITV3',
-            'itv4': 'ITV4',
-            'e4': 'E4',
-            'more4': 'More4'}
-
-
-def get_end_time(folder, date):
-    """
-    Cut up folder start time/duration
-    and return as datetime object
-    """
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+STORA_PTH = os.environ.get('STORA_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
 
-    tm = folder[0:8]
-    duration = folder[-8:]
-    dur = duration.replace("-", ":")
-    print(f"{tm} ---- {duration}")
-    dt_str = f"{date} {tm}"
-    dt_start = datetime.strptime(dt_str, FORMAT)
-    hours, mins, secs = duration.split("-")
-    minutes = (
-        int(
-            timedelta(
-                hours=int(hours), minutes=int(mins), seconds=int(secs)
-            ).total_seconds()
-        )
-        / 60
-    )
-    dt_end = dt_start + timedelta(minutes=minutes)
-    return (dt_end, dt_start, dur)
+# Setup logging, file handler added in main()
+LOGGER = logging.getLogger('get_stream_info')
 
 
 def get_metadata(filepath):
@@ -123,9 +67,7 @@ def configure_data(metadata, channel, actual_duration):
     Cut up metadata string and format for CSV write
     """
 
-    for key, val in CHANNELS.items():
-        if key == channel:
-            chnl = val
+    chnl = channel_registry.channel(channel).name
 
     if type(metadata) == list:
         metadata = metadata[0]
@@ -180,7 +122,66 @@ def get_duration(fpath):
         return str(duration)[:8]
 
 
-def main():
+def info_folders(chnl, chnl_path, folders, day):
+    """
+    Create info.csv from 'Running' metadata for each
+    folder in a channel/day whose broadcast has ended
+    """
+
+    listing = folder_names.parse_listing(folders, day)
+    for folder in listing.ended(datetime.utcnow()):
+        fpath = os.path.join(chnl_path, folder.name)
+        files = os.listdir(fpath)
+        if "info.csv" in files or "stream.mpeg2.ts" not in files:
+            continue
+        LOGGER.info("Working in channel: %s", chnl)
+        LOGGER.info("Trying folder: %s", fpath)
+        LOGGER.info("Broadcast end: %s", datetime.strftime(folder.end, FORMAT))
+        LOGGER.info("Passed end time for broadcast, checking for metadata 'Running' data")
+        streampath = os.path.join(fpath, 'stream.mpeg2.ts')
+        try:
+            os.chmod(streampath, 0o777)
+        except OSError as err:
+            print(err)
+        actual_duration = get_duration(streampath)
+        running_data = get_metadata(streampath)
+        if not running_data:
+            LOGGER.warning(
+                "No 'Running' metadata found in this folderpath: %s",
+                streampath,
+            )
+            continue
+
+        match = ""
+        if len(running_data) > 1:
+            LOGGER.info(
+                "Multiple 'Running' outputs, checking which matches folder start time"
+            )
+            LOGGER.info("%s", running_data)
+            # Run comparison
+            for d in running_data:
+                match = check_times(d, folder.start)
+                if match:
+                    break
+        else:
+            LOGGER.info(
+                "Single 'Running' output, confirming it matches folder start time"
+            )
+            LOGGER.info("%s", running_data)
+            match = check_times(running_data, folder.start)
+
+        if not match:
+            continue
+        match_data = configure_data(match, chnl, actual_duration)
+        LOGGER.info("Matched data found: %s", match_data)
+        # Create info.csv and write data to it
+        csv_path = os.path.join(fpath, "info.csv")
+        LOGGER.info("Writing data to: %s", csv_path)
+        if match_data:
+            write_to_csv(csv_path, match_data)
+
+
+def main(today=None):
     """
     Iterate today's/yesterday's redux paths looking
     for folders that have end times > now time
@@ -188,140 +189,22 @@ def main():
     already present
     """
 
+    stora_core.require_env('STORAGE_PATH', 'STORA_PATH', 'STORA_FOLDERS')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/get_stream_info.log'))
+    today = today or datetime.now()
+    tod = stora_core.day_paths(STORAGE_PATH, today)
+    yest = stora_core.day_paths(STORAGE_PATH, today - timedelta(1))
     LOGGER.info("GET STREAM INFO START ==============================")
 
-    for chnl in CHANNELS.keys():
-        spath = os.path.join(DATE_PATH, chnl)
-        ypath = os.path.join(YEST_PATH, chnl)
-
-        try:
-            s_folders = [x for x in os.listdir(spath) if os.path.isdir(os.path.join(spath, x))]
-            s_folders.sort()
-            num_fold = len(s_folders) - 1
-        except Exception:
-            num_folder = 0
-            s_folders = []
-
-        # Ensure last folder is never processed (allow for full duration)
-        for num in range(0, num_fold):
-            folder = s_folders[num]
-            running_data = []
-            actual_duration = ""
-            fpath = os.path.join(spath, folder)
-            dt_end, dt_start, duration = get_end_time(folder, TODAY_DATE)
-            now = datetime.utcnow()
-            if now > dt_end:
-                files = os.listdir(fpath)
-                if "info.csv" in files:
-                    continue
-                if "stream.mpeg2.ts" in files:
-                    LOGGER.info("Working in channel: %s", chnl)
-                    LOGGER.info("Trying folder: %s", fpath)
-                    LOGGER.info("Broadcast end: %s", datetime.strftime(dt_end, FORMAT))
-                    LOGGER.info("Passed end time for broadcast, checking for metadata 'Running' data")
-                    streampath = os.path.join(fpath, 'stream.mpeg2.ts')
-                    try:
-                        os.chmod(streampath, 0o777)
-                    except OSError as err:
-                        print(err)
-                    actual_duration = get_duration(streampath)
-                    running_data = get_metadata(streampath)
-                    if not running_data:
-                        LOGGER.warning(
-                            "No 'Running' metadata found in this folderpath: %s",
-                            streampath,
-                        )
-                        continue
-
-            match = ""
-            if len(running_data) > 1:
-                LOGGER.info(
-                    "Multiple 'Running' outputs, checking which matches folder start time"
-                )
-                LOGGER.info("%s", running_data)
-                # Run comparison
-                for d in running_data:
-                    match = check_times(d, dt_start)
-                    if match:
-                        break
-            elif len(running_data) == 1:
-                LOGGER.info(
-                    "Single 'Running' output, confirming it matches folder start time"
-                )
-                LOGGER.info("%s", running_data)
-                match = check_times(running_data, dt_start)
-
-            if not match:
-                continue
-            match_data = configure_data(match, chnl, actual_duration)
-            LOGGER.info("Matched data found: %s", match_data)
-            # Create info.csv and write data to it
-            csv_path = os.path.join(fpath, "info.csv")
-            LOGGER.info("Writing data to: %s", csv_path)
-            if match_data:
-                write_to_csv(csv_path, match_data)
-
-        try:
-            y_folders = [x for x in os.listdir(ypath) if os.path.isdir(os.path.join(ypath, x))]
-            y_folders.sort()
-            num_fold = len(y_folders) - 1
-        except Exception:
-            y_folders = []
-
-        if not y_folders:
-            continue
-
-        # Ensure last folder is never processed (allow for full duration)
-        for num in range(0, num_fold):
-            folder = y_folders[num]
-            actual_duration = ""
-            running_data = []
-            fpath = os.path.join(ypath, folder)
-            dt_end, dt_start, duration = get_end_time(folder, YEST_DATE)
-            now = datetime.utcnow()
-            if now > dt_end:
-                files = os.listdir(fpath)
-                if "info.csv" in files:
-                    continue
-                if "stream.mpeg2.ts" in files:
-                    LOGGER.info("Working in channel: %s", chnl)
-                    LOGGER.info("Trying folder: %s", fpath)
-                    LOGGER.info("Broadcast end: %s", datetime.strftime(dt_end, FORMAT))
-                    LOGGER.info("Passed end time for broadcast, checking for metadata 'Running' data")
-                    streampath = os.path.join(fpath, 'stream.mpeg2.ts')
-                    actual_duration = get_duration(streampath)
-                    running_data = get_metadata(streampath)
-                    if not running_data:
-                        LOGGER.warning(
-                            "No 'Running' metadata found in this folderpath: %s",
-                            streampath,
-                        )
-                        continue
-            if len(running_data) > 1:
-                LOGGER.info(
-                    "Multiple 'Running' outputs, checking which matches folder start time"
-                )
-                LOGGER.info("%s", running_data)
-                # Run comparison
-                for d in running_data:
-                    match = check_times(d, dt_start)
-                    if match:
-                        break
-            elif len(running_data) == 1:
-                LOGGER.info(
-                    "Single 'Running' output, confirming it matches folder start time"
-                )
-                LOGGER.info("%s", running_data)
-                match = check_times(running_data, dt_start)
-
-            if not match:
+    for chnl in channel_registry.channels():
+        for day in (tod, yest):
+            chnl_path = os.path.join(day.path, chnl)
+            try:
+                folders = sorted(x for x in os.listdir(chnl_path) if os.path.isdir(os.path.join(chnl_path, x)))
+            except OSError:
                 continue
-            match_data = configure_data(match, chnl, actual_duration)
-            LOGGER.info("Matched data found: %s", match_data)
-            # Create info.csv and write data to it
-            csv_path = os.path.join(fpath, "info.csv")
-            LOGGER.info("Writing data to %s", csv_path)
-            write_to_csv(csv_path, match_data)
+            # Ensure last folder is never processed (allow for full duration)
+            info_folders(chnl, chnl_path, folders[:-1], day.day)
 
     LOGGER.info("GET STREAM INFO END ==============================\n")
 
@@ -25,86 +25,37 @@ import os
 import subprocess
 from datetime import datetime, timedelta
 
-import requests
-import tenacity
+import channel_registry
+import folder_names
+import stora_core
+
+requests = stora_core.lazy_module('requests')
+tenacity = stora_core.lazy_module('tenacity')
 
 # Static global variables
-FORMAT = '%Y-%m-%d %H:%M:%S'
 TFORM = '%Y-%m-%dT%H:%M:%S'
-STORAGE_PATH = os.environ['STORAGE_PATH']
-STORA_PTH = os.environ['STORA_PATH']
-CODEPTH = os.environ['CODE']
-FOLDERS = os.environ['STORA_FOLDERS']
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
-TODAY = datetime.now()
-YEST = TODAY - timedelta(1)
-YEST_PATH = os.path.join(
-    STORAGE_PATH, f"{str(YEST)[0:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/"
-)
-YEST_DATE = f"{str(YEST)[0:4]}-{str(YEST)[5:7]}-{str(YEST)[8:10]}"
-
-# Setup logging
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+STORA_PTH = os.environ.get('STORA_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
+
+# Setup logging, file handler added in main()
 LOGGER = logging.getLogger('make_info_from_schedule')
-HDLR = logging.FileHandler(os.path.join(FOLDERS, 'logs/make_info_from_schedule.log'))
-FORMATTER = logging.Formatter('%(asctime)s\t%(levelname)s\t%(message)s')
-HDLR.setFormatter(FORMATTER)
-LOGGER.addHandler(HDLR)
-LOGGER.setLevel(logging.INFO)
 
 # PATV API details including unique identifiers for in-scope channels
-URL = os.environ["PATV_URL"]
-HEADERS = {"accept": "application/json", "apikey": os.environ["PATV_KEY"]}
-
-# Dictionary of Redux channel names and unique EPG retrieval paths
-API_KEY = {
-    "bbconehd": os.environ["PA_BBCONE"],
-    "bbctwohd": os.environ["PA_BBCTWO"],
-    "bbcthree": os.environ["PA_BBCTHREE"],
-    "bbcfourhd": os.environ["PA_BBCFOUR"],
-    "bbcnewshd": os.environ["PA_BBCNEWS"],
-    "cbbchd": os.environ["PA_CBBC"],
-    "cbeebieshd": os.environ["PA_CBEEBIES"],
-    "itv1": os.environ["PA_ITV1"],
-    "itv2": os.environ["PA_ITV2"],
-    "itv3": os.environ["PA_ITV3"],
-    "itv4": os.environ["PA_ITV4"],
-    "channel4": os.environ["PA_CHANNEL4"],
-    "more4": os.environ["PA_MORE4"],
-    "film4": os.environ["PA_FILM4"],
-    "five": os.environ["PA_FIVE"],
-    "5star": os.environ["PA_5STAR"],
-}
-
-CHANNELS = {
-    "bbconehd": "BBC One HD",
-    "bbctwohd": "BBC Two HD",
-    "bbcthree": "BBC Three HD",
-    "bbcfourhd": "BBC Four HD",
-    "bbcnewshd": "BBC NEWS HD",
-    "cbbchd": "CBBC HD",
-    "cbeebieshd": "CBeebies HD",
-    "channel4": "Channel 4 HD",
-    "five": "Channel 5 HD",
-    "film4": "Film4",
-    "5star": "5STAR",
-    "itv1": "ITV HD",
-    "itv2": "ITV2",
-    "itv3": "ITV3",
-    "itv4": "ITV4",
-    "more4": "More4",
-}
-
-
-@tenacity.retry(wait=tenacity.wait_random(min=50, max=60))
-def check_api():
+URL = os.environ.get("PATV_URL", "")
+HEADERS = {"accept": "application/json", "apikey": os.environ.get("PATV_KEY", "")}
+
+
+@stora_core.retry(lambda: {'wait': tenacity.wait_random(min=50, max=60)})
+def check_api(date):
     """
-    Run standard check with today's date on BBC One HD
+    Run standard check with given date on BBC One HD
     """
 
     params = {
-        "channelId": f"{os.environ['PA_BBCONE']}",
-        "start": f"{YEST_DATE}T21:00:00",
-        "end": "{YEST_DATE}T23:00:00",
+        "channelId": f"{channel_registry.channel('bbconehd').pa_id}",
+        "start": f"{date}T21:00:00",
+        "end": f"{date}T23:00:00",
         "aliases": "True",
     }
 
@@ -121,9 +72,7 @@ def fetch(chnl, start, end):
     Retrieval of EPG metadata here
     """
 
-    for key, val in API_KEY.items():
-        if chnl == key:
-            value = val
+    value = channel_registry.channel(chnl).pa_id
     print(f"API KEY: {value}")
     try:
         params = {
@@ -145,17 +94,12 @@ def fetch(chnl, start, end):
 
 def get_folder_time(folder):
     """
-    Cut up folder start time/duration
-    and return as datetime object
+    API search window from folder start
+    time, with the folder's duration
     """
 
-    tm = folder[0:8]
-    duration = folder[-8:]
-    tm = tm.replace("-", ":")
-    dt_str = f"{YEST_DATE} {tm}"
-    dt_start = datetime.strptime(dt_str, FORMAT)
-    dt_end = dt_start + timedelta(minutes=5)
-    return dt_end.strftime(TFORM), dt_start.strftime(TFORM), duration
+    dt_end = folder.start + timedelta(minutes=5)
+    return dt_end.strftime(TFORM), folder.start.strftime(TFORM), folder.duration_hms
 
 
 def configure_data(data, start, duration, stream_duration, chnl):
@@ -165,9 +109,7 @@ def configure_data(data, start, duration, stream_duration, chnl):
     second duration field.
     """
 
-    for key, val in CHANNELS.items():
-        if key == chnl:
-            chnl = val
+    chnl = channel_registry.channel(chnl).name
     if type(data) == list:
         data = data[0]
 
@@ -232,7 +174,7 @@ def get_metadata(fpath):
         return str(duration)[:8]
 
 
-def main():
+def main(today=None):
     """
     Iterate today's/yesterday's redux paths looking
     for folders that have end times > now time
@@ -240,10 +182,13 @@ def main():
     already present
     """
 
+    stora_core.require_env('STORAGE_PATH', 'STORA_PATH', 'STORA_FOLDERS', 'PATV_URL', 'PATV_KEY')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/make_info_from_schedule.log'))
+    yest = stora_core.day_paths(STORAGE_PATH, (today or datetime.now()) - timedelta(1))
     LOGGER.info("MAKE INFO FROM SCHEDULE START ==============================")
 
-    for chnl in CHANNELS.keys():
-        ypath = os.path.join(YEST_PATH, chnl)
+    for chnl in channel_registry.with_field('pa_id'):
+        ypath = os.path.join(yest.path, chnl)
 
         try:
             y_folders = [
@@ -254,14 +199,18 @@ def main():
 
         if not y_folders:
             continue
-        for folder in y_folders:
+        listing = folder_names.parse_listing(y_folders, yest.day)
+        for folder in listing.rejected:
+            LOGGER.warning("Skipping %s in %s, not a programme folder name", folder, chnl)
+        for prog in listing.folders():
+            folder = prog.name
             print(f"Channel {chnl}, Folder {folder}")
             fpath = os.path.join(ypath, folder)
             files = os.listdir(fpath)
 
             if "info.csv" in files:
                 continue
-            dt_end, dt_start, duration = get_folder_time(folder)
+            dt_end, dt_start, duration = get_folder_time(prog)
             LOGGER.info("Folder found without info.csv in %s: %s", chnl, folder)
             json_data = fetch(chnl, dt_start, dt_end)
             actual_duration, filepath = '', ''
@@ -18,71 +18,41 @@ import os
 import subprocess
 from datetime import datetime, timedelta
 
+import channel_registry
+import folder_names
+import stora_core
+
 # Static global variables
 FORMAT = '%Y-%m-%d %H-%M-%S'
-STORAGE_PATH = os.environ['STORAGE_PATH']
-CODEPTH = os.environ['CODE']
-FOLDERS = os.environ['STORA_FOLDERS']
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
 SCHEDULES = os.path.join(FOLDERS, 'schedules/')
-TODAY = datetime.now()
-YEST = TODAY - timedelta(1)
-DATE_PATH = os.path.join(
-    STORAGE_PATH, f"{str(TODAY)[0:4]}/{str(TODAY)[5:7]}/{str(TODAY)[8:10]}/"
-)
-YEST_PATH = os.path.join(
-    STORAGE_PATH, f"{str(YEST)[0:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/"
-)
-TODAY_DATE = f"{str(TODAY)[0:4]}-{str(TODAY)[5:7]}-{str(TODAY)[8:10]}"
-YEST_DATE = f"{str(YEST)[0:4]}-{str(YEST)[5:7]}-{str(YEST)[8:10]}"
-
-# Setup logging / yet to be implemented
+
+# Setup logging, file handler added in main()
 LOGGER = logging.getLogger('radox_make_subtitles')
-HDLR = logging.FileHandler(os.path.join(FOLDERS, 'logs/radox_make_subtitles.log'))
-FORMATTER = logging.Formatter('%(asctime)s\t%(levelname)s\t%(message)s')
-HDLR.setFormatter(FORMATTER)
-LOGGER.addHandler(HDLR)
-LOGGER.setLevel(logging.INFO)
-
-CHANNELS = [
-    'bbconehd',
-    'bbctwohd',
-    'bbcthree',
-    'bbcfourhd',
-    'bbcnewshd',
-    'cbbchd',
-    'cbeebieshd',
-    'channel4',
-    'five',
-    'film4',
-    '5star',
-    'itv1',
-    'itv2',
-    'itv3',
-    'itv4',
-    'more4',
-    'e4'
-]
-
-
-def get_end_time(folder, date):
+
+
+def subtitle_folders(chnl_path, folders, day):
     """
-    Cut up folder start time/duration
-    and return as datetime object
+    Make subtitles.vtt for each folder in a
+    channel/day whose broadcast has ended
     """
 
-    tm = folder[0:8]
-    duration = folder[-8:]
-    print(f"{tm} ---- {duration}")
-    dt_str = f"{date} {tm}"
-    dt_start = datetime.strptime(dt_str, FORMAT)
-    h, m, s = duration.split("-")
-    minutes = (
-        int(timedelta(hours=int(h), minutes=int(m), seconds=int(s)).total_seconds())
-        / 60
-    )
-
-    return dt_start + timedelta(minutes=minutes)
+    listing = folder_names.parse_listing(folders, day)
+    for folder in listing.ended(datetime.utcnow()):
+        fpath = os.path.join(chnl_path, folder.name)
+        LOGGER.info("Trying folder: %s", fpath)
+        LOGGER.info("Broadcast end: %s", datetime.strftime(folder.end, FORMAT))
+        files = os.listdir(fpath)
+        if "subtitles.vtt" in files:
+            LOGGER.info("SKIPPING: Subtitle already exists")
+            continue
+        if "stream.mpeg2.ts" in files:
+            LOGGER.info("Passed end time for broadcast, creating subtitles")
+            streampath = os.path.join(fpath, "stream.mpeg2.ts")
+            status = make_vtt(streampath, fpath)
+            if status:
+                LOGGER.info("Successfully created subtitle.vtt file")
 
 
 def make_vtt(filepath, folder):
@@ -105,41 +75,30 @@ def make_vtt(filepath, folder):
         LOGGER.warning("Error with subprocess call: %s", err)
 
 
-def main():
+def main(today=None):
     """
     Iterate today's/yesterday's redux paths looking
     for folders that have end times > now time
     Where found create subtitles.vtt if not
     already present.
     """
+    stora_core.require_env('STORAGE_PATH', 'STORA_FOLDERS')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/radox_make_subtitles.log'))
+    today = today or datetime.now()
+    tod = stora_core.day_paths(STORAGE_PATH, today)
+    yest = stora_core.day_paths(STORAGE_PATH, today - timedelta(1))
     LOGGER.info("MAKE SUBTITLES START ==============================")
 
-    for chnl in CHANNELS:
-        spath = os.path.join(DATE_PATH, chnl)
-        ypath = os.path.join(YEST_PATH, chnl)
+    for chnl in channel_registry.channels():
+        spath = os.path.join(tod.path, chnl)
+        ypath = os.path.join(yest.path, chnl)
         if not os.path.exists(spath):
             continue
         s_folders = [
             x for x in os.listdir(spath) if os.path.isdir(os.path.join(spath, x))
         ]
         LOGGER.info("Working in channel: %s", chnl)
-        for folder in s_folders:
-            fpath = os.path.join(spath, folder)
-            LOGGER.info("Trying folder: %s", folder)
-            dt_end = get_end_time(folder, TODAY_DATE)
-            now = datetime.utcnow()
-            LOGGER.info("Broadcast end: %s", datetime.strftime(dt_end, FORMAT))
-            if now > dt_end:
-                files = os.listdir(fpath)
-                if "subtitles.vtt" in files:
-                    LOGGER.info("SKIPPING: Subtitle already exists")
-                    continue
-                if "stream.mpeg2.ts" in files:
-                    LOGGER.info("Passed end time for broadcast, creating subtitles")
-                    streampath = os.path.join(fpath, "stream.mpeg2.ts")
-                    status = make_vtt(streampath, fpath)
-                    if status:
-                        LOGGER.info("Successfully created subtitle.vtt file")
+        subtitle_folders(spath, s_folders, tod.day)
 
         if not os.path.exists(ypath):
             continue
@@ -147,23 +106,7 @@ def main():
             x for x in os.listdir(ypath) if os.path.isdir(os.path.join(ypath, x))
         ]
         LOGGER.info("Working in channel: %s", chnl)
-        for folder in y_folders:
-            fpath = os.path.join(ypath, folder)
-            LOGGER.info(f"Trying folder: %s", fpath)
-            dt_end = get_end_time(folder, YEST_DATE)
-            now = datetime.utcnow()
-            LOGGER.info("Broadcast end: %s", datetime.strftime(dt_end, FORMAT))
-            if now > dt_end:
-                files = os.listdir(fpath)
-                if "subtitles.vtt" in files:
-                    LOGGER.info("SKIPPING: Subtitle already exists")
-                    continue
-                if "stream.mpeg2.ts" in files:
-                    LOGGER.info("Passed end time for broadcast, creating subtitles")
-                    streampath = os.path.join(fpath, "stream.mpeg2.ts")
-                    status = make_vtt(streampath, fpath)
-                    if status:
-                        LOGGER.info("Successfully created subtitle.vtt file")
+        subtitle_folders(ypath, y_folders, yest.day)
 
     LOGGER.info("MAKE SUBTITLES END ==============================\ns")
 
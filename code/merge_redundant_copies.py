@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""
+Merges redundant recordings, where a second recorder host captures
+the same channels into its own STORAGE_PATH, before
+stora_channel_move_qnap04.py moves one copy of each programme to
+designated storage. Runs on the primary host with the partner's
+STORAGE_PATH mounted at STORA_PARTNER_PATH. The partner host does
+not run stora_channel_move_qnap04.py.
+
+Programme folders are paired by the names initialise_ts() and
+initialise_ts_rs() give them, else by their HH-MM-SS start prefix.
+Quality is read from the quality.json capture_telemetry.py writes
+beside each stream.mpeg2.ts, or scanned from the file where absent.
+
+main():
+1. For each channel in channels.json take the programme folders
+   of the target date (as stora_channel_move_qnap04.py, two days ago)
+   from local and partner storage
+2. A folder only the partner recorded is copied to local storage
+3. For paired folders a copy more than SHORTFALL smaller than the
+   other is missing programme, a late start or truncation, and
+   loses. Otherwise the copy with fewer lost packets, then fewer
+   continuity errors, fewer gap seconds and more bytes is kept
+4. With --splice, packets missing at each loss in the kept copy are
+   filled from the other copy where the packets either side of the
+   loss are found there, so each splice falls on packet boundaries
+5. Files the local folder lacks are copied from the partner's, the
+   merge is noted in quality.json and, unless --keep-partner, the
+   partner's folder is removed so only one copy moves on
+
+Usage:
+python3 merge_redundant_copies.py [--splice] [--keep-partner] [--date YYYY-MM-DD]
+
+2026
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import channel_registry
+import stora_core
+
+# Global paths
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+PARTNER_PATH = os.environ.get('STORA_PARTNER_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
+LOG_FILE = os.path.join(FOLDERS, 'logs/merge_redundant_copies.log')
+STREAM = 'stream.mpeg2.ts'
+QUALITY = 'quality.json'
+TS_SIZE = 188
+SYNC = 0x47
+NULL_PID = 0x1FFF
+CHUNK = TS_SIZE * 7 * 1024
+ANCHOR = TS_SIZE * 4
+BACK = 14
+MAX_FILL = TS_SIZE * 7 * 2048
+WINDOW = 64 * 1024 * 1024
+# Fraction of the larger copy's bytes a copy may lack before
+# it counts as missing programme rather than lost packets
+SHORTFALL = 0.002
+
+
+def scan_quality(fpath):
+    """
+    Count bytes, continuity errors, lost packets
+    and loss offsets of a TS file where no
+    quality.json was written
+    """
+    quality = {'bytes': os.path.getsize(fpath), 'cc_errors': 0, 'lost': 0, 'gap_seconds': 0.0, 'losses': []}
+    counters = {}
+    offset = 0
+    with open(fpath, 'rb') as file:
+        while True:
+            data = file.read(CHUNK)
+            if not data:
+                break
+            for num in range(0, len(data) - TS_SIZE + 1, TS_SIZE):
+                if data[num] != SYNC:
+                    continue
+                pid = (data[num + 1] & 0x1F) << 8 | data[num + 2]
+                flags = data[num + 3]
+                if pid == NULL_PID or not flags & 0x10:
+                    continue
+                counter = flags & 0x0F
+                last = counters.get(pid)
+                counters[pid] = counter
+                if last is None or counter == last:
+                    continue
+                gap = (counter - last - 1) & 0x0F
+                if gap:
+                    quality['cc_errors'] += 1
+                    quality['lost'] += gap
+                    if not quality['losses'] or quality['losses'][-1] != offset + num:
+                        quality['losses'].append(offset + num)
+            offset += len(data)
+    return quality
+
+
+def read_quality(folder):
+    """
+    Quality stats for a programme folder's stream,
+    None where there is no stream
+    """
+    fpath = os.path.join(folder, STREAM)
+    if not os.path.exists(fpath):
+        return None
+    try:
+        with open(os.path.join(folder, QUALITY), 'r') as file:
+            quality = json.load(file)
+        quality['bytes'] = os.path.getsize(fpath)
+        return quality
+    except (OSError, ValueError):
+        logging.info("No quality.json, scanning %s", fpath)
+        return scan_quality(fpath)
+
+
+def score(quality, largest):
+    """
+    Sort key against the larger copy's bytes, lowest
+    is the better copy. Bytes missing beyond SHORTFALL
+    rank before lost packets and continuity errors
+    """
+    short = largest - quality['bytes']
+    missing = short if short > largest * SHORTFALL else 0
+    return (missing, quality['lost'], quality['cc_errors'], quality['gap_seconds'], -quality['bytes'])
+
+
+def programme_folders(date_path, channel):
+    """
+    Programme folder names and paths for a channel
+    """
+    chnl_path = os.path.join(date_path, channel)
+    if not os.path.isdir(chnl_path):
+        return {}
+    return {
+        name: os.path.join(chnl_path, name)
+        for name in os.listdir(chnl_path)
+        if os.path.isdir(os.path.join(chnl_path, name))
+    }
+
+
+def pair(name, local):
+    """
+    Local folder name matching a partner folder, by
+    full name then by HH-MM-SS start prefix
+    """
+    if name in local:
+        return name
+    matches = [key for key in local if key[:8] == name[:8]]
+    return matches[0] if len(matches) == 1 else None
+
+
+def splice(primary, secondary, losses, outfile):
+    """
+    Write primary to outfile, filling packets lost at
+    each loss offset from secondary. The packets before
+    a loss are found in secondary, followed forward to
+    where the copies differ, then secondary's packets
+    up to primary's next packet are inserted.
+    Returns count of packets filled
+    """
+    filled = 0
+    with open(primary, 'rb') as pfile, open(secondary, 'rb') as sfile, open(outfile, 'wb') as out:
+        if not os.path.getsize(primary) or not os.path.getsize(secondary):
+            shutil.copyfileobj(pfile, out)
+            return 0
+        prim = mmap.mmap(pfile.fileno(), 0, access=mmap.ACCESS_READ)
+        second = mmap.mmap(sfile.fileno(), 0, access=mmap.ACCESS_READ)
+        pos = 0
+        delta = None
+        for loss in sorted(set(losses)):
+            anchor_at = max(pos, loss - BACK * TS_SIZE)
+            anchor = prim[anchor_at : anchor_at + ANCHOR]
+            if len(anchor) < ANCHOR or anchor_at + ANCHOR > loss:
+                continue
+            if all((anchor[num + 1] & 0x1F) << 8 | anchor[num + 2] == NULL_PID for num in range(0, ANCHOR, TS_SIZE)):
+                continue
+            if delta is None:
+                found = second.find(anchor)
+            else:
+                found = second.find(anchor, max(0, anchor_at + delta - WINDOW), anchor_at + delta + WINDOW)
+            if found < 0:
+                continue
+
+            # Walk both copies to the first packet they differ on
+            ppos, spos = anchor_at, found
+            while ppos <= loss and prim[ppos : ppos + TS_SIZE] == second[spos : spos + TS_SIZE]:
+                ppos += TS_SIZE
+                spos += TS_SIZE
+            if ppos > loss or ppos + ANCHOR > len(prim):
+                continue
+            end = second.find(prim[ppos : ppos + ANCHOR], spos, spos + MAX_FILL + ANCHOR)
+            if end <= spos or (end - spos) % TS_SIZE:
+                continue
+
+            out.write(prim[pos:ppos])
+            out.write(second[spos:end])
+            filled += (end - spos) // TS_SIZE
+            pos = ppos
+            delta = end - ppos
+        out.write(prim[pos:])
+        prim.close()
+        second.close()
+    return filled
+
+
+def merge_pair(local, partner, splice_copies):
+    """
+    Keep the better stream of paired folders in
+    the local folder, spliced where asked
+    """
+    local_q = read_quality(local)
+    partner_q = read_quality(partner)
+    if partner_q is None:
+        return
+    local_stream = os.path.join(local, STREAM)
+    partner_stream = os.path.join(partner, STREAM)
+    largest = max(partner_q['bytes'], local_q['bytes'] if local_q else 0)
+    source = 'local'
+    if local_q is None or score(partner_q, largest) < score(local_q, largest):
+        source = 'partner'
+    best, other = (partner_stream, local_stream) if source == 'partner' else (local_stream, partner_stream)
+    best_q = partner_q if source == 'partner' else local_q
+    logging.info("%s: keeping %s copy, local %s, partner %s", local, source,
+                 local_q and score(local_q, largest), score(partner_q, largest))
+
+    temp_file = f"{local_stream}.merge"
+    filled = 0
+    if splice_copies and local_q and best_q['losses']:
+        filled = splice(best, other, best_q['losses'], temp_file)
+        logging.info("%s: %s packets spliced in from %s copy", local, filled, 'local' if source == 'partner' else 'partner')
+    elif source == 'partner':
+        shutil.copyfile(partner_stream, temp_file)
+    if os.path.exists(temp_file):
+        os.replace(temp_file, local_stream)
+
+    best_q.update({'bytes': os.path.getsize(local_stream), 'merged': {'source': source, 'spliced_packets': filled}})
+    with open(os.path.join(local, QUALITY), 'w') as file:
+        json.dump(best_q, file)
+
+
+def main():
+    """
+    Pair each channel's programme folders across
+    local and partner storage and keep one copy
+    """
+    parser = argparse.ArgumentParser(description="Merge redundant STORA recordings before moving to QNAP")
+    parser.add_argument('--splice', action='store_true', help="Fill lost packets from the other copy")
+    parser.add_argument('--keep-partner', action='store_true', help="Leave the partner's folders in place")
+    parser.add_argument('--date', default=(datetime.now() - timedelta(2)).strftime('%Y-%m-%d'))
+    args = parser.parse_args()
+    stora_core.require_env('STORAGE_PATH', 'STORA_PARTNER_PATH', 'STORA_FOLDERS')
+    logging.basicConfig(filename=LOG_FILE, filemode='a', format='%(asctime)s\t%(levelname)s\t%(message)s', level=logging.INFO)
+
+    date_path = f"{args.date[:4]}/{args.date[5:7]}/{args.date[8:10]}/"
+    channels = list(channel_registry.channels())
+
+    logging.info("========= MERGE REDUNDANT COPIES START %s ====================", args.date)
+    for channel in channels:
+        local = programme_folders(os.path.join(STORAGE_PATH, date_path), channel)
+        partner = programme_folders(os.path.join(PARTNER_PATH, date_path), channel)
+        for name, partner_folder in sorted(partner.items()):
+            match = pair(name, local)
+            try:
+                if match is None:
+                    target = os.path.join(STORAGE_PATH, date_path, channel, name)
+                    logging.info("Only partner recorded %s, copying to %s", partner_folder, target)
+                    shutil.copytree(partner_folder, target)
+                else:
+                    merge_pair(local[match], partner_folder, args.splice)
+                    for fname in os.listdir(partner_folder):
+                        if not os.path.exists(os.path.join(local[match], fname)):
+                            shutil.copy2(os.path.join(partner_folder, fname), local[match])
+            except OSError as err:
+                logging.warning("Unable to merge %s: %s", partner_folder, err)
+                continue
+            if not args.keep_partner:
+                shutil.rmtree(partner_folder, ignore_errors=True)
+    logging.info("========= MERGE REDUNDANT COPIES END ====================\n")
+
+
+if __name__ == '__main__':
+    main()
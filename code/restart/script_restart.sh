@@ -2,6 +2,8 @@
 
 # Receive channel name from crontab launch and populate $CHANNEL
 # Look for pid number of script, if running exit, if not, relaunch.
+# Where STORA_LEASES shares channels between hosts, only relaunch
+# on the host holding the channel's lease.
 
 DATE=$(date +%Y/%m/%d)
 CHANNEL="$1"
@@ -10,6 +12,10 @@ if pgrep -f "epg_assessment_channel_recorder.py ${CHANNEL}";
   then
     echo "SCRIPT IS ALREADY RUNNING. Exiting."
     exit 0
+  elif [ -n "${STORA_LEASES}" ] && ! "${PYENV}" "${CODE}channel_leases.py" --holds "$CHANNEL";
+  then
+    echo "CHANNEL LEASE HELD BY ANOTHER HOST. Exiting."
+    exit 0
   else
     echo "** SCRIPT NOT RUNNING. LAUNCHING NOW"
     DATETIME=$(date +%Y-%m-%d_%H:%M:%S)
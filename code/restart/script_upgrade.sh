@@ -0,0 +1,23 @@
+#!/bin/bash -x
+
+# Receive channel name and launch the current recorder code with
+# STORA_UPGRADE set, taking over the running recorder's capture
+# through its handover socket. The old recorder exits once the new
+# one confirms it is recording. libVLC keeps the RTP socket and dump
+# file inside its process so no descriptors are passed: the new one
+# prepares VLC on the same outfile and plays once the old one stops,
+# leaving a gap in the stream of the stop to play time (a second or
+# less, hand-overs still belong between programmes where possible).
+# Usage after a code deployment:
+# for chnl in bbconehd bbctwohd; do ${CODE}restart/script_upgrade.sh "$chnl"; done
+
+CHANNEL="$1"
+
+if pgrep -f "epg_assessment_channel_recorder.py ${CHANNEL}";
+  then
+    echo "** HANDING RUNNING RECORDER OVER TO NEW CODE"
+    STORA_UPGRADE=1 nohup "${PYENV}" "${CODE}epg_assessment_channel_recorder.py" "$CHANNEL" >> "${STORA_FOLDERS}logs/${CHANNEL}_vlc_recording.log" 2>&1 &
+  else
+    echo "SCRIPT NOT RUNNING. Exiting, script_restart.sh will launch it."
+    exit 0
+fi
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+Load benchmark for epg_assessment_channel_recorder.py against
+synthetic channels from stream_generator.py on localhost.
+Requires VLC Python bindings and DVBTEE as in production.
+
+main():
+1. Build temporary STORAGE_PATH/STORA_FOLDERS and a CODE folder
+   holding channels.json and stora_control.json for N synthetic
+   channels, pointing at the generator's localhost ports
+2. Start the generator, then launch one recorder process per
+   channel exactly as script_restart.sh would
+3. Sample CPU and RSS of each recorder process tree (including
+   dvbtee children) from /proc every --sample seconds
+4. After --duration seconds set every channel inactive in
+   stora_control.json, wait for recorders to exit, stop generator
+5. Scan recorded stream.mpeg2.ts files for the generator's video
+   PID counters to measure packet loss, and compare the send time
+   of each programme folder's first packet with the scripted
+   runningStatus flip for its EventId (boundary accuracy)
+6. Print per channel CPU, RSS, loss and boundary error table
+
+Usage:
+python3 benchmark_recorder_load.py --channels 4 --duration 600 --programme-seconds 120
+python3 benchmark_recorder_load.py --channels 4 --null-ratio 0.2 --pid-filter
+
+2026
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import stream_generator
+
+CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDER = os.path.join(CODE, "epg_assessment_channel_recorder.py")
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def write_configs(code_path, channels):
+    """
+    Write recorder JSON configs for synthetic channels
+    """
+    configs = {
+        "channels.json": {
+            chnl.name: {
+                "name": chnl.name,
+                "rtp": f"rtp://@:{chnl.rtp_addr[1]}",
+                "sid": chnl.sid,
+                "udp": f"udp://0:{chnl.udp_addr[1]}",
+                "timings": "00:00:00 - 24",
+            }
+            for chnl in channels
+        },
+        "stora_control.json": {chnl.name: True for chnl in channels},
+    }
+    for fname, data in configs.items():
+        with open(os.path.join(code_path, fname), "w") as file:
+            json.dump(data, file, indent=4)
+
+
+def process_tree(pid):
+    """
+    Return pid and all descendant pids from /proc
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as file:
+                ppid = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree = [pid]
+    for parent in tree:
+        tree.extend(children.get(parent, []))
+    return tree
+
+
+def sample_usage(pid):
+    """
+    CPU ticks and RSS KiB summed over process tree
+    """
+    ticks = rss = 0
+    for proc in process_tree(pid):
+        try:
+            with open(f"/proc/{proc}/stat", "r") as file:
+                fields = file.read().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])
+            rss += int(fields[21]) * PAGE_KB
+        except (OSError, IndexError, ValueError):
+            continue
+    return ticks, rss
+
+
+def scan_recording(fpath):
+    """
+    Read generator counters and send times from a
+    recording's video PID packets, returns sorted list
+    of (counter, send_time)
+    """
+    counters = []
+    with open(fpath, "rb") as file:
+        data = file.read()
+
+    pos = data.find(b"\x47")
+    while 0 <= pos <= len(data) - stream_generator.TS_SIZE:
+        if data[pos] != 0x47:
+            pos = data.find(b"\x47", pos + 1)
+            continue
+        pid = ((data[pos + 1] & 0x1F) << 8) | data[pos + 2]
+        if pid == stream_generator.VIDEO_PID:
+            counters.append(stream_generator.COUNTER.unpack_from(data, pos + 4))
+        pos += stream_generator.TS_SIZE
+    return counters
+
+
+def analyse_channel(storage_path, channel):
+    """
+    Packet loss and boundary accuracy for one channel
+    """
+    flips = {event["event_id"]: event["flip"] for event in channel.events}
+    folders = []
+    for root, _, files in os.walk(storage_path):
+        if os.path.basename(os.path.dirname(root)) != channel.name:
+            continue
+        if "stream.mpeg2.ts" in files:
+            folders.append(root)
+
+    seen = set()
+    recorded = 0
+    errors = []
+    for folder in folders:
+        counters = scan_recording(os.path.join(folder, "stream.mpeg2.ts"))
+        if not counters:
+            continue
+        recorded += len(counters)
+        seen.update(counter for counter, _ in counters)
+        try:
+            event_id = int(os.path.basename(folder)[9:-9])
+        except ValueError:
+            continue
+        if event_id in flips:
+            errors.append(counters[0][1] - flips[event_id])
+
+    if not seen:
+        return {"recorded": 0, "lost": 0, "overlap": 0, "errors": errors}
+    return {
+        "recorded": len(seen),
+        "lost": max(seen) - min(seen) + 1 - len(seen),
+        "overlap": recorded - len(seen),
+        "errors": errors,
+    }
+
+
+def main():
+    """
+    Run recorders against synthetic channels and report
+    """
+    parser = argparse.ArgumentParser(description="Recorder load benchmark on synthetic streams")
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--duration", type=int, default=600)
+    parser.add_argument("--programme-seconds", type=int, default=120)
+    parser.add_argument("--late", type=float, default=0)
+    parser.add_argument("--gap-every", type=int, default=0)
+    parser.add_argument("--bitrate", type=float, default=2.0)
+    parser.add_argument("--null-ratio", type=float, default=0.0)
+    parser.add_argument("--rtp-base", type=int, default=31001)
+    parser.add_argument("--udp-base", type=int, default=31101)
+    parser.add_argument("--sample", type=float, default=1.0)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--pid-filter", action="store_true", help="Set STORA_PID_FILTER for recorders")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    if "DVBTEE" not in os.environ:
+        sys.exit("DVBTEE environment variable must point to libdvbtee's dvbtee binary")
+
+    root = tempfile.mkdtemp(prefix="stora_load_")
+    code_path = os.path.join(root, "code/")
+    storage = os.path.join(root, "media/")
+    folders = os.path.join(root, "folders/")
+    for pth in (code_path, storage, os.path.join(folders, "logs"), os.path.join(folders, "schedules")):
+        os.makedirs(pth, exist_ok=True)
+
+    programmes = args.duration // args.programme_seconds + 2
+    channels = stream_generator.synthetic_channels(
+        args.channels, args.programme_seconds, programmes, args.late, args.gap_every,
+        args.rtp_base, args.udp_base, bitrate=args.bitrate, null_ratio=args.null_ratio,
+    )
+    write_configs(code_path, channels)
+    env = dict(os.environ, STORAGE_PATH=storage, STORA_FOLDERS=folders, CODE=code_path)
+    if args.pid_filter:
+        env["STORA_PID_FILTER"] = "1"
+
+    stop, threads = stream_generator.start_channels(channels)
+    procs = {}
+    for channel in channels:
+        log = open(os.path.join(folders, "logs", f"{channel.name}_vlc_recording.log"), "a")
+        procs[channel.name] = subprocess.Popen(
+            [args.python, RECORDER, channel.name], env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    print(f"Recording {args.channels} synthetic channels for {args.duration}s: {root}")
+
+    usage = {name: {"ticks": [], "rss": []} for name in procs}
+    start = time.monotonic()
+    while time.monotonic() - start < args.duration:
+        for name, proc in procs.items():
+            ticks, rss = sample_usage(proc.pid)
+            usage[name]["ticks"].append((time.monotonic(), ticks))
+            usage[name]["rss"].append(rss)
+        time.sleep(args.sample)
+
+    with open(os.path.join(code_path, "stora_control.json"), "w") as file:
+        json.dump({chnl.name: False for chnl in channels}, file)
+    for proc in procs.values():
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"{'channel':<10}{'cpu %':>8}{'rss MiB':>9}{'sent':>10}{'recorded':>10}"
+          f"{'lost':>8}{'loss %':>8}{'dupes':>8}{'folders':>8}{'bound ms':>10}{'max ms':>9}")
+    for channel in channels:
+        samples = usage[channel.name]["ticks"]
+        cpu = 0.0
+        if len(samples) > 1:
+            cpu = (samples[-1][1] - samples[0][1]) / CLK_TCK / (samples[-1][0] - samples[0][0]) * 100
+        rss = max(usage[channel.name]["rss"], default=0) / 1024
+        result = analyse_channel(storage, channel)
+        expected = result["recorded"] + result["lost"]
+        loss = result["lost"] / expected * 100 if expected else 0.0
+        errors = result["errors"]
+        mean = sum(errors) / len(errors) * 1000 if errors else 0.0
+        worst = max((abs(err) for err in errors), default=0.0) * 1000
+        print(f"{channel.name:<10}{cpu:>8.1f}{rss:>9.1f}{channel.video_counter:>10}"
+              f"{result['recorded']:>10}{result['lost']:>8}{loss:>8.2f}{result['overlap']:>8}{len(errors):>8}"
+              f"{mean:>10.0f}{worst:>9.0f}")
+
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+"""
+Offline benchmark of the EPG schedule pipeline in
+fetch_stora_schedule.py, run against patv_simulator.py
+so throughput changes can be measured reproducibly.
+
+main():
+1. Start a PATV simulator in a background thread, and
+   build temporary STORAGE_PATH/STORA_FOLDERS/STORA_COMPLETE
+   folders so nothing touches live storage
+2. Export simulator URL and channel environment variables,
+   then import fetch_stora_schedule with --channels channels
+3. For each pass, channel and day of the horizon time the stages:
+   - fetch: request sent until response headers received
+   - extraction: body streamed and parsed into schedule entries
+   - diff: existing day schedule loaded and compared
+   - write: update_schedule() writing/replacing the schedule
+   The first pass writes new schedules, later passes exercise
+   the compare path as a cron run would
+4. Print per stage count, total, mean, p95 and max milliseconds
+   with programmes/second, bytes streamed and peak traced memory
+5. With --end-to-end also time a full fetch_stora_schedule.main()
+
+Usage:
+python3 benchmark_schedule_pipeline.py --channels 17 --days 4 --passes 2 --density 60
+
+2026
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import closing
+
+import patv_simulator
+
+CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["fetch", "extraction", "diff", "write"]
+PA_KEYS = [
+    "PA_BBCONE", "PA_BBCTWO", "PA_BBCTHREE", "PA_BBCFOUR", "PA_BBCNEWS",
+    "PA_CBBC", "PA_CBEEBIES", "PA_ITV1", "PA_ITV2", "PA_ITV3", "PA_ITV4",
+    "PA_CHANNEL4", "PA_MORE4", "PA_FILM4", "PA_FIVE", "PA_5STAR", "PA_E4",
+]
+
+
+def build_environment(root, url):
+    """
+    Create temporary STORA folder layout and
+    export the variables the scripts read at import
+    """
+    paths = {
+        "STORAGE_PATH": os.path.join(root, "media/"),
+        "STORA_PATH": os.path.join(root, "qnap/"),
+        "STORA_FOLDERS": os.path.join(root, "folders/"),
+        "STORA_COMPLETE": os.path.join(root, "completed/"),
+    }
+    for pth in paths.values():
+        os.makedirs(pth, exist_ok=True)
+    os.makedirs(os.path.join(paths["STORA_FOLDERS"], "logs"), exist_ok=True)
+    os.makedirs(os.path.join(paths["STORA_FOLDERS"], "schedules"), exist_ok=True)
+    os.makedirs(os.path.join(paths["STORA_COMPLETE"], "schedules"), exist_ok=True)
+
+    os.environ.update(paths)
+    os.environ["CODE"] = f"{CODE}/"
+    os.environ["PATV_URL"] = url
+    os.environ["PATV_KEY"] = "simulated"
+    for key in PA_KEYS:
+        os.environ.setdefault(key, f"sim-{key[3:].lower()}")
+
+
+def percentile(values, pct):
+    """
+    Nearest rank percentile of values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def run_pass(fss, timings, totals):
+    """
+    Time each pipeline stage for every channel/day
+    """
+    today = datetime.date.today()
+    for day in fss.date_range(today + datetime.timedelta(days=1), fss.FETCH_DAYS, today):
+        for key, value in fss.CHANNEL.items():
+            os.makedirs(os.path.join(day["path"], key), exist_ok=True)
+            deadline = time.monotonic() + fss.REQUEST_DEADLINE
+
+            start = time.perf_counter()
+            try:
+                req = fss.fetch(value, day)
+            except (fss.FetchError, fss.ChannelError) as err:
+                totals["failures"] += 1
+                print(f"Fetch failed {key} {day['date']}: {err}")
+                continue
+            timings["fetch"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with closing(req):
+                digest = hashlib.sha256()
+                chunks = fss.iter_response_chunks(key, day["path"], req, digest, deadline)
+                schedule = fss.schedule_extraction(chunks, key)
+                totals["bytes"] += int(req.headers.get("Content-Length", 0))
+            timings["extraction"].append(time.perf_counter() - start)
+            if schedule is False:
+                totals["failures"] += 1
+                continue
+            totals["programmes"] += len(schedule)
+
+            start = time.perf_counter()
+            day_schedule = fss.schedule_path(key, day["date"])
+            if os.path.exists(day_schedule):
+                with open(day_schedule, "r") as inf:
+                    fss.compare_schedule(json.load(inf), schedule)
+            timings["diff"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            fss.update_schedule(key, day["date"], schedule)
+            timings["write"].append(time.perf_counter() - start)
+
+
+def report(timings, totals, elapsed, peak):
+    """
+    Print stage table and totals
+    """
+    print(f"{'stage':<12}{'count':>8}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = timings[stage]
+        total = sum(values)
+        mean = total / len(values) if values else 0.0
+        print(
+            f"{stage:<12}{len(values):>8}{total:>10.3f}{mean * 1000:>10.2f}"
+            f"{percentile(values, 95) * 1000:>10.2f}{max(values, default=0) * 1000:>10.2f}"
+        )
+    print(f"Elapsed {elapsed:.3f}s, {totals['programmes']} programmes, "
+          f"{totals['programmes'] / elapsed if elapsed else 0:.0f} programmes/s")
+    print(f"Streamed {totals['bytes']} bytes, {totals['failures']} failures, "
+          f"peak traced memory {peak / 1024:.0f} KiB")
+
+
+def main():
+    """
+    Parse arguments, serve simulator and run benchmark passes
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the EPG schedule pipeline offline")
+    parser.add_argument("--channels", type=int, default=17)
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--passes", type=int, default=2)
+    parser.add_argument("--density", type=int, help="Programmes per channel/day")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--oversize-rate", type=float, default=0.0)
+    parser.add_argument("--oversize-kb", type=int, default=512)
+    parser.add_argument("--end-to-end", action="store_true", help="Also time fetch_stora_schedule.main()")
+    parser.add_argument("--keep", action="store_true", help="Keep temporary folders for inspection")
+    args = parser.parse_args()
+
+    server = patv_simulator.PatvSimulator(
+        ("127.0.0.1", 0),
+        patv_simulator.load_template(patv_simulator.TEMPLATE),
+        density=args.density,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        oversize_rate=args.oversize_rate,
+        oversize_kb=args.oversize_kb,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    root = tempfile.mkdtemp(prefix="stora_bench_")
+    build_environment(root, server.url)
+    os.environ["STORA_FETCH_DAYS"] = str(args.days)
+    sys.path.insert(0, CODE)
+    import fetch_stora_schedule as fss
+
+    logging.basicConfig(filename=fss.LOG_FILE, filemode="a", format="%(asctime)s\t%(levelname)s\t%(message)s", level=logging.INFO)
+
+    fss.CHANNEL = {f"simchannel{num}": f"sim-{num}" for num in range(0, args.channels)}
+    print(f"Benchmarking {args.channels} channels x {args.days} days, {args.passes} passes: {root}")
+
+    timings = {stage: [] for stage in STAGES}
+    totals = {"programmes": 0, "bytes": 0, "failures": 0}
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(0, args.passes):
+        run_pass(fss, timings, totals)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    report(timings, totals, elapsed, peak)
+
+    if args.end_to_end:
+        start = time.perf_counter()
+        fss.main(argv=[])
+        print(f"End-to-end fetch_stora_schedule.main(): {time.perf_counter() - start:.3f}s")
+
+    server.shutdown()
+    print(f"Simulator served {server.requests} requests, {server.bytes_sent} bytes")
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""
+Offline stand-in for the PATV EPG metadata API, so
+fetch_stora_schedule.py and make_info_from_schedule.py
+can be exercised without PATV_URL and live keys.
+
+Serves GET requests with the same channelId/start/end
+params as the live API, returning {"item": [...]} payloads
+generated from a template schedule (default
+schedules/demonstration_schedule.json).
+
+main():
+1. Load the template schedule, its programme titles and
+   durations seed every generated channel/day
+2. Start a threaded HTTP server on the host/port supplied
+3. For each request build the channel's day of programmes
+   scaled to --density programmes per day, then return
+   only items starting within the requested start/end
+4. Optional faults: --latency before responding, --error-rate
+   of 503 responses, --oversize-rate of responses padded with
+   --oversize-kb of asset data per item. channelIds starting
+   'missing' return 404, as an unknown PATV channel would
+5. ETag headers are sent and If-None-Match honoured with 304
+
+Usage:
+python3 patv_simulator.py --port 8080 --density 40 --latency 0.2
+then export PATV_URL=http://127.0.0.1:8080/ before launching scripts
+
+2026
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TEMPLATE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "schedules/demonstration_schedule.json",
+)
+FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def load_template(template_path):
+    """
+    Return list of (title, duration) from
+    a STORA JSON schedule
+    """
+    with open(template_path, "r") as file:
+        schedule = json.load(file)
+
+    return [(entry["programme"], int(entry["duration"])) for entry in schedule]
+
+
+def build_day(template, channel_id, date, density, seed=0):
+    """
+    Generate one channel/day of PATV items, cycling the
+    template titles with durations scaled to fill the day.
+    Seeded per channel/day so repeat calls match.
+    """
+    rand = random.Random(f"{seed} {channel_id} {date}")
+    offset = rand.randrange(0, len(template))
+    picks = [template[(offset + num) % len(template)] for num in range(0, density)]
+    total = sum(duration for _, duration in picks)
+    scale = 1440 / total
+
+    items = []
+    start = datetime.datetime.strptime(f"{date}T00:00:00", FORMAT)
+    day_end = start + datetime.timedelta(days=1)
+    for num, (title, duration) in enumerate(picks):
+        minutes = max(1, round(duration * scale))
+        if num == len(picks) - 1 or start + datetime.timedelta(minutes=minutes) > day_end:
+            minutes = max(1, int((day_end - start).total_seconds() // 60))
+        items.append(make_item(channel_id, start, minutes, title, num))
+        start += datetime.timedelta(minutes=minutes)
+        if start >= day_end:
+            break
+
+    return items
+
+
+def make_item(channel_id, start, minutes, title, num):
+    """
+    Build a single item in the PATV response shape
+    """
+    return {
+        "id": f"{channel_id}-{start.strftime('%Y%m%d%H%M')}-{num}",
+        "type": "episode",
+        "dateTime": f"{start.strftime(FORMAT)}.000Z",
+        "duration": minutes,
+        "title": title,
+        "channel": {"id": channel_id},
+        "summary": {
+            "short": f"{title}.",
+            "medium": f"{title}. Simulated PATV programme description.",
+            "long": f"{title}. Simulated PATV programme description, generated offline from a template schedule.",
+        },
+        "attribute": ["subtitles", "hd"],
+    }
+
+
+def select_items(items, start, end):
+    """
+    Keep items whose dateTime falls within start/end
+    """
+    selected = []
+    for item in items:
+        if start <= item["dateTime"][:19] <= end:
+            selected.append(item)
+    return selected
+
+
+class PatvSimulator(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding the simulated API configuration
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, template, density=None, latency=0.0, error_rate=0.0,
+                 oversize_rate=0.0, oversize_kb=512, api_key=None, seed=0):
+        super().__init__(address, PatvHandler)
+        self.template = template
+        self.density = density or len(template)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.oversize_rate = oversize_rate
+        self.oversize_kb = oversize_kb
+        self.api_key = api_key
+        self.rand = random.Random(seed)
+        self.seed = seed
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def url(self):
+        """
+        Base URL to export as PATV_URL
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+class PatvHandler(BaseHTTPRequestHandler):
+    """
+    Answer PATV schedule requests from generated items
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.api_key and self.headers.get("apikey") != server.api_key:
+            self.send_json(401, {"error": "Invalid apikey"})
+            return
+        params = {key: val[0] for key, val in parse_qs(urlparse(self.path).query).items()}
+        channel_id = params.get("channelId")
+        start = params.get("start")
+        end = params.get("end")
+        if not channel_id or not start or not end:
+            self.send_json(400, {"error": "channelId, start and end required"})
+            return
+        if channel_id.startswith("missing"):
+            self.send_json(404, {"error": f"Channel {channel_id} not found"})
+            return
+        if server.rand.random() < server.error_rate:
+            self.send_json(503, {"error": "Simulated service unavailable"})
+            return
+
+        items = []
+        day = datetime.datetime.strptime(start[:10], "%Y-%m-%d").date()
+        last_day = datetime.datetime.strptime(end[:10], "%Y-%m-%d").date()
+        while day <= last_day:
+            items.extend(build_day(server.template, channel_id, str(day), server.density, server.seed))
+            day += datetime.timedelta(days=1)
+        items = select_items(items, start[:19], end[:19])
+
+        if server.rand.random() < server.oversize_rate:
+            padding = "x" * (server.oversize_kb * 1024)
+            for item in items:
+                item["asset"] = {"padding": padding}
+
+        self.send_json(200, {"hasNext": False, "total": len(items), "item": items})
+
+    def send_json(self, status, payload):
+        """
+        Send payload with ETag, 304 where unchanged
+        """
+        body = json.dumps(payload, indent=4).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        """
+        Silence per-request logging to STDERR
+        """
+
+
+def main():
+    """
+    Parse arguments and serve until interrupted
+    """
+    parser = argparse.ArgumentParser(description="Offline PATV EPG API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--template", default=TEMPLATE)
+    parser.add_argument("--density", type=int, help="Programmes per channel/day")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--oversize-rate", type=float, default=0.0, help="Fraction of padded responses")
+    parser.add_argument("--oversize-kb", type=int, default=512, help="Padding per item in oversize responses")
+    parser.add_argument("--api-key", help="Require this apikey header")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = PatvSimulator(
+        (args.host, args.port),
+        load_template(args.template),
+        density=args.density,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        oversize_rate=args.oversize_rate,
+        oversize_kb=args.oversize_kb,
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+    print(f"PATV simulator serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.requests} requests, {server.bytes_sent} bytes")
+
+
+if __name__ == "__main__":
+    main()
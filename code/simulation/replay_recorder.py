@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+
+"""
+Virtual clock replay harness for the decision logic in
+epg_assessment_channel_recorder.py main() and its EPG failover.
+
+The recorder's CLOCK is replaced by a VirtualClock, get_events()
+replays a recorded or generated EIT trace, record_stream() returns
+stub capture handles and check_control() ends the run when the
+trace is exhausted. A full broadcast day including EIT dropouts,
+EPG failover and schedule reloads replays in seconds.
+Playing stubs grow their outfile with each clock advance, except
+captures already playing when a "stalls" window opens, which stay
+wedged until the recorder's watchdog restarts them.
+
+Trace format (JSON):
+{"channel": "bbconehd", "start": "2026-10-19 00:00:00", "hours": 24,
+ "eit": [{"at": 0, "events": {<dvbtee NET_SVC_ID json>}}, {"at": 5400, "events": null}],
+ "schedules": [{"at": 0, "date": "2026-10-19", "schedule": [<STORA schedule>]}],
+ "stalls": [[36000, 36600]]}
+"at" is seconds from start. Each EIT sample holds until the next,
+null events replay a dvbtee failure. Schedules are written to the
+recorder's SCHEDULES folder at their "at" time with a new mtime.
+
+main():
+1. Load a trace (--trace), or build one from a STORA schedule
+   (--schedule) with --dropout windows, --stall windows and --late flips, or
+   --record a trace from a live UDP EIT feed with dvbtee
+2. Build temporary STORAGE_PATH/STORA_FOLDERS/CODE folders and
+   import the recorder for the trace channel
+3. Install VirtualClock and stubs, run recorder main() until the
+   virtual day ends
+4. Print each stub recording with virtual start/stop times, the
+   offset of each EIT start from its runningStatus flip, and with
+   --benchmark the real decision latency per loop iteration
+
+Usage:
+python3 replay_recorder.py --schedule ../schedules/demonstration_schedule.json --dropout 36000 39600 --benchmark
+python3 replay_recorder.py --trace day.json --benchmark
+python3 replay_recorder.py --record day.json --channel bbconehd --hours 24
+
+2026
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMAT = "%Y-%m-%d %H:%M:%S"
+EIT_SECONDS = 6
+EIT_TIMEOUT = 15
+PACKET = b"\x47\x1f\xff\x10" + b"\xff" * 184
+
+
+class VirtualClock:
+    """
+    Clock advanced only by EIT polls and loop sleeps,
+    measuring real time spent between those yield points
+    """
+
+    def __init__(self, start, end, on_advance=None):
+        self.current = start
+        self.end = end
+        self.on_advance = on_advance
+        self.latencies = []
+        self.mark = time.perf_counter()
+
+    def now(self):
+        """
+        Virtual local time, harness runs as UTC
+        """
+        return self.current
+
+    def utcnow(self):
+        """
+        Virtual UTC time
+        """
+        return self.current
+
+    def today(self):
+        """
+        Virtual date
+        """
+        return self.current.date()
+
+    def sleep(self, seconds):
+        """
+        Record loop latency then advance virtual time
+        """
+        self.lap()
+        self.advance(seconds)
+
+    def lap(self):
+        """
+        Real seconds of decision work since last yield
+        """
+        now = time.perf_counter()
+        self.latencies.append(now - self.mark)
+        self.mark = now
+
+    def advance(self, seconds):
+        """
+        Move virtual time on, applying due trace actions
+        """
+        self.current += datetime.timedelta(seconds=seconds)
+        if self.on_advance:
+            self.on_advance(self.current)
+        self.mark = time.perf_counter()
+
+    @property
+    def finished(self):
+        """
+        True once the virtual run window has passed
+        """
+        return self.current >= self.end
+
+
+class StubCapture:
+    """
+    Stands in for the VLC instance, player and media,
+    logging virtual play/stop times per output file
+    """
+
+    def __init__(self, clock, recordings, instream, outfile):
+        self.clock = clock
+        self.recordings = recordings
+        self.instream = instream
+        self.outfile = outfile
+        self.entry = None
+
+    def play(self):
+        """
+        Begin stub recording
+        """
+        self.entry = {"outfile": self.outfile, "start": self.clock.now(), "stop": None}
+        self.recordings.append(self.entry)
+
+    def stop(self):
+        """
+        End stub recording
+        """
+        if self.entry and self.entry["stop"] is None:
+            self.entry["stop"] = self.clock.now()
+
+    def release(self):
+        """
+        Nothing to release
+        """
+
+    def get_mrl(self):
+        """
+        Stream MRL as VLC media would report
+        """
+        return self.instream
+
+
+class Replay:
+    """
+    Trace lookups and schedule writes for one replay
+    """
+
+    def __init__(self, trace, schedules_path, start):
+        self.start = start
+        self.eit = sorted(trace.get("eit", []), key=lambda sample: sample["at"])
+        self.eit_at = [sample["at"] for sample in self.eit]
+        self.schedules = sorted(trace.get("schedules", []), key=lambda sample: sample["at"])
+        self.schedules_path = schedules_path
+        self.stalls = [(start + datetime.timedelta(seconds=first), last) for first, last in trace.get("stalls", [])]
+        self.channel = trace["channel"]
+        self.polls = 0
+        self.failures = 0
+
+    def offset(self, when):
+        """
+        Seconds of when from replay start
+        """
+        return (when - self.start).total_seconds()
+
+    def events_at(self, when):
+        """
+        EIT sample holding at virtual time when
+        """
+        index = bisect.bisect_right(self.eit_at, self.offset(when)) - 1
+        if index < 0:
+            return None
+        return self.eit[index]["events"]
+
+    def apply_schedules(self, when):
+        """
+        Write schedules whose time has come, stamping
+        mtime with virtual time so refresh_day() sees it
+        """
+        while self.schedules and self.schedules[0]["at"] <= self.offset(when):
+            sample = self.schedules.pop(0)
+            fname = os.path.join(self.schedules_path, f"{self.channel}_schedule_{sample['date']}.json")
+            with open(fname, "w") as file:
+                json.dump(sample["schedule"], file, indent=4)
+            stamp = when.replace(tzinfo=datetime.timezone.utc).timestamp()
+            os.utime(fname, (stamp, stamp))
+
+
+    def feed(self, when, recordings):
+        """
+        Grow playing stub outfiles, leaving captures
+        started before a current stall window wedged
+        """
+        offset = self.offset(when)
+        for entry in recordings:
+            if entry["stop"] is not None:
+                continue
+            if any(entry["start"] < first and self.offset(first) <= offset < last for first, last in self.stalls):
+                continue
+            with open(entry["outfile"], "ab") as file:
+                file.write(PACKET)
+
+
+def build_trace(schedule, channel, start, hours, dropouts=None, late=0, stalls=None):
+    """
+    Generate EIT present/following samples from a STORA
+    schedule, EventId from position, flips 'late' seconds
+    after each scheduled start and no EIT in dropouts
+    """
+    entries = []
+    for num, entry in enumerate(schedule):
+        begin = datetime.datetime.strptime(entry["start"], FORMAT)
+        begin = start.replace(hour=begin.hour, minute=begin.minute, second=begin.second)
+        entries.append((begin, int(entry["duration"]) * 60, entry["programme"], 100 + num))
+
+    def eit_event(entry, running_status):
+        begin, seconds, title, event_id = entry
+        stamp = begin.replace(tzinfo=datetime.timezone.utc).timestamp()
+        return {
+            "eventId": event_id,
+            "runningStatus": running_status,
+            "unixTimeBegin": int(stamp),
+            "unixTimeEnd": int(stamp) + seconds,
+            "descriptors": [{"name": title, "text": ""}],
+        }
+
+    eit = []
+    for num, entry in enumerate(entries):
+        events = [eit_event(entry, 4)]
+        if num + 1 < len(entries):
+            events.append(eit_event(entries[num + 1], 1))
+        at = (entry[0] - start).total_seconds() + late if num else 0
+        eit.append({"at": at, "events": {"version": num & 0x1F, "events": events}})
+
+    for first, last in dropouts or []:
+        holding = None
+        for sample in eit:
+            if sample["at"] <= last:
+                holding = sample
+        eit = [sample for sample in eit if not first <= sample["at"] < last]
+        eit.append({"at": first, "events": None})
+        if holding and holding["events"]:
+            eit.append({"at": last, "events": holding["events"]})
+
+    eit.sort(key=lambda sample: sample["at"])
+    date = start.strftime("%Y-%m-%d")
+    day_schedule = []
+    for begin, seconds, title, _ in entries:
+        day_schedule.append({
+            "start": begin.strftime(FORMAT), "duration": seconds // 60,
+            "channel": channel, "programme": title,
+        })
+    return {
+        "channel": channel,
+        "start": start.strftime(FORMAT),
+        "hours": hours,
+        "eit": eit,
+        "schedules": [{"at": 0, "date": date, "schedule": day_schedule}],
+        "stalls": stalls or [],
+    }
+
+
+def prepare_environment(root, channel):
+    """
+    Temporary folders and configs the recorder reads at import
+    """
+    paths = {
+        "STORAGE_PATH": os.path.join(root, "media/"),
+        "STORA_FOLDERS": os.path.join(root, "folders/"),
+        "CODE": os.path.join(root, "code/"),
+    }
+    for pth in paths.values():
+        os.makedirs(pth, exist_ok=True)
+    os.makedirs(os.path.join(paths["STORA_FOLDERS"], "logs"), exist_ok=True)
+    os.makedirs(os.path.join(paths["STORA_FOLDERS"], "schedules"), exist_ok=True)
+    shutil.copy(os.path.join(CODE, "stora_control.json"), paths["CODE"])
+    with open(os.path.join(CODE, "channels.json"), "r") as file:
+        channels = json.load(file)
+    channels[channel].setdefault("timings", "00:00:00 - 24")
+    with open(os.path.join(paths["CODE"], "channels.json"), "w") as file:
+        json.dump(channels, file, indent=4)
+
+    os.environ.update(paths)
+    os.environ.setdefault("DVBTEE", "dvbtee")
+    os.environ.setdefault("STORA_TELEMETRY", "0")
+    return paths
+
+
+def import_recorder(channel):
+    """
+    Import recorder module for channel as cron would launch it
+    """
+    sys.argv = [os.path.join(CODE, "epg_assessment_channel_recorder.py"), channel]
+    sys.path.insert(0, CODE)
+    # Capture is stubbed, VLC bindings are not needed for replay
+    if "vlc" not in sys.modules:
+        try:
+            import vlc  # noqa: F401
+        except ImportError:
+            sys.modules["vlc"] = types.ModuleType("vlc")
+    import epg_assessment_channel_recorder as recorder
+
+    return recorder
+
+
+def run_replay(trace, benchmark=False):
+    """
+    Replay trace through recorder main(), returning
+    clock, stub recordings and replay state
+    """
+    root = tempfile.mkdtemp(prefix="stora_replay_")
+    channel = trace["channel"]
+    paths = prepare_environment(root, channel)
+    recorder = import_recorder(channel)
+
+    start = datetime.datetime.strptime(trace["start"], FORMAT)
+    end = start + datetime.timedelta(hours=trace.get("hours", 24))
+    replay = Replay(trace, os.path.join(paths["STORA_FOLDERS"], "schedules"), start)
+    recordings = []
+
+    def advance(when):
+        replay.apply_schedules(when)
+        replay.feed(when, recordings)
+
+    clock = VirtualClock(start, end, advance)
+    replay.apply_schedules(start)
+
+    def get_events(udp, seconds=EIT_SECONDS):
+        replay.polls += 1
+        clock.lap()
+        events = replay.events_at(clock.now())
+        if events is None:
+            replay.failures += 1
+            clock.advance(EIT_TIMEOUT)
+            return None
+        clock.advance(seconds)
+        return events
+
+    def record_stream(instream, outfile, sid=None):
+        stub = StubCapture(clock, recordings, instream, outfile)
+        return (stub, stub, stub)
+
+    recorder.CLOCK = clock
+    recorder.get_events = get_events
+    recorder.record_stream = record_stream
+    recorder.check_control = lambda: not clock.finished
+
+    real_start = time.perf_counter()
+    try:
+        recorder.main()
+    except SystemExit:
+        pass
+    elapsed = time.perf_counter() - real_start
+    for entry in recordings:
+        if entry["stop"] is None:
+            entry["stop"] = clock.now()
+
+    report(trace, start, clock, recordings, replay, elapsed, root, benchmark)
+    shutil.rmtree(root, ignore_errors=True)
+    return clock, recordings, replay
+
+
+def percentile(values, pct):
+    """
+    Nearest rank percentile of values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, int(round(pct / 100 * len(ordered))) - 1)]
+
+
+def report(trace, start, clock, recordings, replay, elapsed, root, benchmark):
+    """
+    Print stub recordings, boundary offsets and latency
+    """
+    flips = {}
+    for sample in trace.get("eit", []):
+        events = sample["events"] or {}
+        for event in events.get("events", [])[:1]:
+            flips.setdefault(str(event["eventId"]), start + datetime.timedelta(seconds=sample["at"]))
+
+    print(f"{'start':<20}{'stop':<20}{'offset s':>9}  folder")
+    started = set()
+    for entry in recordings:
+        folder = os.path.basename(os.path.dirname(entry["outfile"]))
+        offset = ""
+        event_id = folder[9:-9]
+        if event_id in flips and entry["outfile"] not in started:
+            offset = f"{(entry['start'] - flips[event_id]).total_seconds():.0f}"
+        print(f"{entry['start'].strftime(FORMAT):<20}{entry['stop'].strftime(FORMAT):<20}"
+              f"{offset:>9}  {os.path.relpath(entry['outfile'], root)}")
+        started.add(entry["outfile"])
+
+    virtual = (clock.now() - start).total_seconds()
+    print(f"Replayed {virtual / 3600:.1f} virtual hours in {elapsed:.2f}s "
+          f"({virtual / elapsed if elapsed else 0:.0f}x), {len(recordings)} recordings, "
+          f"{len(recordings) - len({entry['outfile'] for entry in recordings})} in place restarts, "
+          f"{replay.polls} EIT polls, {replay.failures} EIT failures")
+    if benchmark:
+        latencies = clock.latencies
+        mean = sum(latencies) / len(latencies) if latencies else 0.0
+        print(f"Decision latency over {len(latencies)} loop iterations: "
+              f"mean {mean * 1e6:.0f}us, p50 {percentile(latencies, 50) * 1e6:.0f}us, "
+              f"p95 {percentile(latencies, 95) * 1e6:.0f}us, max {max(latencies, default=0) * 1e6:.0f}us")
+
+
+def record_trace(outfile, channel, hours, interval):
+    """
+    Poll live UDP EIT for channel with the recorder's
+    get_events(), writing samples to a replayable trace
+    """
+    root = tempfile.mkdtemp(prefix="stora_trace_")
+    prepare_environment(root, channel)
+    recorder = import_recorder(channel)
+    udp = recorder.fetch_udp()
+    start = datetime.datetime.utcnow().replace(microsecond=0)
+    trace = {"channel": channel, "start": start.strftime(FORMAT), "hours": hours, "eit": [], "schedules": []}
+    end = time.time() + hours * 3600
+    try:
+        while time.time() < end:
+            try:
+                events = recorder.get_events(udp)
+            except Exception:
+                events = None
+            at = (datetime.datetime.utcnow() - start).total_seconds()
+            trace["eit"].append({"at": at, "events": events})
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    with open(outfile, "w") as file:
+        json.dump(trace, file, indent=4)
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"Recorded {len(trace['eit'])} EIT samples to {outfile}")
+
+
+def main():
+    """
+    Parse arguments and replay, or record a trace
+    """
+    parser = argparse.ArgumentParser(description="Virtual clock replay of recorder decisions")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="Replay this JSON trace")
+    source.add_argument("--schedule", help="Build a trace from this STORA schedule")
+    source.add_argument("--record", help="Record a live EIT trace to this file")
+    parser.add_argument("--channel", default="bbconehd")
+    parser.add_argument("--start", help="Virtual start, default schedule's first day at midnight")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--dropout", nargs=2, type=float, action="append", metavar=("FROM", "TO"),
+                        help="Seconds from start with no EIT, repeatable")
+    parser.add_argument("--stall", nargs=2, type=float, action="append", metavar=("FROM", "TO"),
+                        help="Seconds from start captures already playing stop growing, repeatable")
+    parser.add_argument("--late", type=float, default=0, help="Seconds runningStatus flips lag schedule")
+    parser.add_argument("--interval", type=float, default=1, help="Seconds between live samples")
+    parser.add_argument("--benchmark", action="store_true", help="Report decision latency per loop iteration")
+    args = parser.parse_args()
+
+    if args.record:
+        record_trace(args.record, args.channel, args.hours, args.interval)
+        return
+    if args.trace:
+        with open(args.trace, "r") as file:
+            trace = json.load(file)
+    else:
+        with open(args.schedule, "r") as file:
+            schedule = json.load(file)
+        start = args.start or f"{schedule[0]['start'][:10]} 00:00:00"
+        start = datetime.datetime.strptime(start, FORMAT)
+        trace = build_trace(schedule, args.channel, start, args.hours, args.dropout, args.late, args.stall)
+
+    run_replay(trace, args.benchmark)
+
+
+if __name__ == "__main__":
+    main()
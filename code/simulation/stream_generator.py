@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic MPEG-TS stream generator for recorder load testing.
+Stands in for the FreeSat RTP and EIT UDP feeds in
+channels.json on localhost.
+
+Each synthetic channel sends:
+- RTP (payload type 33, 7 TS packets per datagram) to its rtp port
+  carrying PAT, PMT, SDT, TDT, EIT present/following, a video PID
+  and optional null packet padding at the configured bitrate
+- Plain UDP to its udp port carrying PAT, SDT, TDT and EIT p/f
+  only, as read by libdvbtee in get_events()
+
+Video PID payloads start with a packet counter and the send time
+so recordings can be checked for loss and boundary accuracy by
+benchmark_recorder_load.py.
+
+EIT present/following is scripted per channel from a list of
+events. Each event has a duration and an optional 'late' number
+of seconds by which the runningStatus flip (present 4, following 1)
+lags its start time, and channels can have 'eit_gaps' when no EIT
+is sent at all. Version numbers increment at every flip.
+
+Script file format (JSON), otherwise --channels builds synthetic ones:
+{"channels": [{"name": "bbconehd", "sid": 6941, "rtp_port": 30001,
+  "udp_port": 30097, "events": [{"title": "News", "seconds": 120,
+  "late": 0}], "eit_gaps": [[300, 360]]}]}
+
+Usage:
+python3 stream_generator.py --channels 4 --programme-seconds 120 --bitrate 2
+python3 stream_generator.py --script channels.json --manifest manifest.json
+
+2026
+"""
+
+import argparse
+import datetime
+import json
+import socket
+import struct
+import threading
+import time
+
+TS_SIZE = 188
+TS_PER_DATAGRAM = 7
+PAT_PID = 0x0000
+SDT_PID = 0x0011
+EIT_PID = 0x0012
+TDT_PID = 0x0014
+PMT_PID = 0x1000
+VIDEO_PID = 0x0100
+AUDIO_PID = 0x0101
+NULL_PID = 0x1FFF
+TRANSPORT_STREAM_ID = 0x0801
+ORIGINAL_NETWORK_ID = 0x233A
+PSI_INTERVAL = 0.1
+SI_INTERVAL = 0.5
+COUNTER = struct.Struct(">Qd")
+MJD_EPOCH = datetime.date(1858, 11, 17).toordinal()
+
+
+def crc32_mpeg(data):
+    """
+    CRC-32/MPEG-2 used by PSI/SI sections
+    """
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(0, 8):
+            if crc & 0x80000000:
+                crc = ((crc << 1) ^ 0x04C11DB7) & 0xFFFFFFFF
+            else:
+                crc = (crc << 1) & 0xFFFFFFFF
+    return crc
+
+
+def long_section(table_id, table_id_ext, version, section_number, last_section, body):
+    """
+    Build a section with syntax indicator, header and CRC
+    """
+    length = 5 + len(body) + 4
+    header = struct.pack(
+        ">BHHBBB",
+        table_id,
+        0xB000 | length,
+        table_id_ext,
+        0xC1 | ((version & 0x1F) << 1),
+        section_number,
+        last_section,
+    )
+    section = header + body
+    return section + struct.pack(">I", crc32_mpeg(section))
+
+
+def bcd(value):
+    """
+    Two digit binary coded decimal
+    """
+    return ((value // 10) << 4) | (value % 10)
+
+
+def dvb_time(epoch):
+    """
+    40 bit MJD + BCD UTC time
+    """
+    utc = datetime.datetime.utcfromtimestamp(int(epoch))
+    mjd = utc.date().toordinal() - MJD_EPOCH
+    return struct.pack(">HBBB", mjd, bcd(utc.hour), bcd(utc.minute), bcd(utc.second))
+
+
+def dvb_duration(seconds):
+    """
+    24 bit BCD HH MM SS duration
+    """
+    seconds = int(seconds)
+    return bytes([bcd(seconds // 3600 % 100), bcd(seconds // 60 % 60), bcd(seconds % 60)])
+
+
+def pat_section(sid, version=0):
+    """
+    PAT mapping programme SID to PMT PID
+    """
+    body = struct.pack(">HH", sid, 0xE000 | PMT_PID)
+    return long_section(0x00, TRANSPORT_STREAM_ID, version, 0, 0, body)
+
+
+def pmt_section(sid, version=0):
+    """
+    PMT with one video and one audio stream
+    """
+    body = struct.pack(">HH", 0xE000 | VIDEO_PID, 0xF000)
+    body += struct.pack(">BHH", 0x02, 0xE000 | VIDEO_PID, 0xF000)
+    body += struct.pack(">BHH", 0x03, 0xE000 | AUDIO_PID, 0xF000)
+    return long_section(0x02, sid, version, 0, 0, body)
+
+
+def sdt_section(sid, name, version=0):
+    """
+    SDT actual with service descriptor for SID
+    """
+    provider = b"STORA"
+    service = name.encode("latin1")
+    descriptor = bytes([0x48, 3 + len(provider) + len(service), 0x01, len(provider)])
+    descriptor += provider + bytes([len(service)]) + service
+    body = struct.pack(">HB", ORIGINAL_NETWORK_ID, 0xFF)
+    body += struct.pack(">HBH", sid, 0xFD, 0x8000 | len(descriptor)) + descriptor
+    return long_section(0x42, TRANSPORT_STREAM_ID, version, 0, 0, body)
+
+
+def tdt_section(epoch):
+    """
+    TDT short section carrying UTC time
+    """
+    return struct.pack(">BH", 0x70, 0x7005) + dvb_time(epoch)
+
+
+def eit_event(event_id, start, seconds, running_status, title, text=""):
+    """
+    EIT event loop entry with short event descriptor
+    """
+    name = title.encode("latin1", "replace")[:100]
+    info = text.encode("latin1", "replace")[:100]
+    descriptor = b"eng" + bytes([len(name)]) + name + bytes([len(info)]) + info
+    descriptor = bytes([0x4D, len(descriptor)]) + descriptor
+    event = struct.pack(">H", event_id) + dvb_time(start) + dvb_duration(seconds)
+    event += struct.pack(">H", ((running_status & 0x07) << 13) | len(descriptor))
+    return event + descriptor
+
+
+def eit_pf_sections(sid, version, present, following):
+    """
+    EIT actual present/following, section 0 present,
+    section 1 following. Events are dicts with event_id,
+    start, seconds, running_status, title or None.
+    """
+    sections = []
+    for number, event in enumerate([present, following]):
+        body = struct.pack(">HHBB", TRANSPORT_STREAM_ID, ORIGINAL_NETWORK_ID, 1, 0x4E)
+        if event:
+            body += eit_event(
+                event["event_id"], event["start"], event["seconds"],
+                event["running_status"], event["title"], event.get("text", ""),
+            )
+        sections.append(long_section(0x4E, sid, version, number, 1, body))
+    return sections
+
+
+def packetise(pid, section, counters):
+    """
+    Split a section across TS packets with pointer field,
+    updating the per PID continuity counter
+    """
+    packets = []
+    payload = b"\x00" + section
+    first = True
+    while payload:
+        chunk, payload = payload[:184], payload[184:]
+        cc = counters.get(pid, 0)
+        counters[pid] = (cc + 1) & 0x0F
+        header = struct.pack(">BHB", 0x47, (0x4000 if first else 0) | pid, 0x10 | cc)
+        packets.append(header + chunk + b"\xff" * (184 - len(chunk)))
+        first = False
+    return packets
+
+
+class SyntheticChannel:
+    """
+    One channel's scripted stream and send loop
+    """
+
+    def __init__(self, name, sid, rtp_port, udp_port, events, eit_gaps=None,
+                 host="127.0.0.1", bitrate=2.0, null_ratio=0.0):
+        self.name = name
+        self.sid = sid
+        self.rtp_addr = (host, rtp_port)
+        self.udp_addr = (host, udp_port)
+        self.eit_gaps = eit_gaps or []
+        self.null_ratio = null_ratio
+        self.datagram_rate = bitrate * 1_000_000 / (TS_SIZE * 8 * TS_PER_DATAGRAM)
+        self.counters = {}
+        self.udp_counters = {}
+        self.psi = [(PAT_PID, pat_section(sid)), (PMT_PID, pmt_section(sid))]
+        self.sdt = sdt_section(sid, name)
+        self.video_counter = 0
+        self.rtp_seq = 0
+        self.datagrams = 0
+        self.ts_packets = 0
+        self.null_packets = 0
+        self.start = None
+        self.events = []
+        self.script = events
+        self.version = 0
+        self.flip_index = -1
+
+    def schedule(self, start):
+        """
+        Fix scripted events to wall clock times from start
+        """
+        self.start = start
+        self.events = []
+        begin = start
+        for num, event in enumerate(self.script):
+            seconds = int(event["seconds"])
+            self.events.append({
+                "event_id": event.get("event_id", 1000 + num),
+                "title": event.get("title", f"{self.name} programme {num}"),
+                "start": begin,
+                "seconds": seconds,
+                "flip": begin + float(event.get("late", 0)),
+            })
+            begin += seconds
+
+    def present_index(self, now):
+        """
+        Index of event reported running at now
+        """
+        index = 0
+        for num, event in enumerate(self.events):
+            if event["flip"] <= now:
+                index = num
+        return index
+
+    def in_gap(self, now):
+        """
+        True when scripted EIT gap is active
+        """
+        offset = now - self.start
+        return any(gap[0] <= offset < gap[1] for gap in self.eit_gaps)
+
+    def si_sections(self, now):
+        """
+        SI sections due now as (pid, section),
+        EIT skipped during scripted gaps
+        """
+        sections = [(SDT_PID, self.sdt), (TDT_PID, tdt_section(now))]
+        if self.in_gap(now):
+            return sections
+
+        index = self.present_index(now)
+        if index != self.flip_index:
+            self.flip_index = index
+            self.version = (self.version + 1) & 0x1F
+        present = dict(self.events[index], running_status=4)
+        following = None
+        if index + 1 < len(self.events):
+            following = dict(self.events[index + 1], running_status=1)
+        for section in eit_pf_sections(self.sid, self.version, present, following):
+            sections.append((EIT_PID, section))
+        return sections
+
+    def video_packet(self, now):
+        """
+        Video PID packet carrying counter and send time
+        """
+        cc = self.counters.get(VIDEO_PID, 0)
+        self.counters[VIDEO_PID] = (cc + 1) & 0x0F
+        payload = COUNTER.pack(self.video_counter, now)
+        self.video_counter += 1
+        header = struct.pack(">BHB", 0x47, 0x4000 | VIDEO_PID, 0x10 | cc)
+        return header + payload + b"\x00" * (184 - len(payload))
+
+    def rtp_header(self, now):
+        """
+        RTP header, payload type 33 MP2T, 90kHz clock
+        """
+        self.rtp_seq = (self.rtp_seq + 1) & 0xFFFF
+        stamp = int(now * 90000) & 0xFFFFFFFF
+        return struct.pack(">BBHII", 0x80, 33, self.rtp_seq, stamp, self.sid)
+
+    def run(self, stop, duration=None):
+        """
+        Send RTP and UDP datagrams at the configured rate
+        until stop is set or duration passes
+        """
+        rtp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for sock in (rtp_sock, udp_sock):
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        null_packet = struct.pack(">BHB", 0x47, NULL_PID, 0x10) + b"\xff" * 184
+        pending = []
+        next_psi = next_si = 0.0
+        clock = time.monotonic()
+        null_credit = 0.0
+
+        while not stop.is_set():
+            now = time.time()
+            if duration and now - self.start >= duration:
+                break
+            due = int((time.monotonic() - clock) * self.datagram_rate) - self.datagrams
+            if due <= 0:
+                time.sleep(0.002)
+                continue
+            for _ in range(0, min(due, 500)):
+                if now >= next_psi:
+                    for pid, section in self.psi:
+                        pending += packetise(pid, section, self.counters)
+                    next_psi = now + PSI_INTERVAL
+                if now >= next_si:
+                    udp = packetise(PAT_PID, self.psi[0][1], self.udp_counters)
+                    for pid, section in self.si_sections(now):
+                        pending += packetise(pid, section, self.counters)
+                        udp += packetise(pid, section, self.udp_counters)
+                    for num in range(0, len(udp), TS_PER_DATAGRAM):
+                        udp_sock.sendto(b"".join(udp[num:num + TS_PER_DATAGRAM]), self.udp_addr)
+                    next_si = now + SI_INTERVAL
+
+                packets = pending[:TS_PER_DATAGRAM]
+                pending = pending[TS_PER_DATAGRAM:]
+                while len(packets) < TS_PER_DATAGRAM:
+                    null_credit += self.null_ratio
+                    if null_credit >= 1:
+                        null_credit -= 1
+                        packets.append(null_packet)
+                        self.null_packets += 1
+                    else:
+                        packets.append(self.video_packet(now))
+                rtp_sock.sendto(self.rtp_header(now) + b"".join(packets), self.rtp_addr)
+                self.datagrams += 1
+                self.ts_packets += TS_PER_DATAGRAM
+
+        rtp_sock.close()
+        udp_sock.close()
+
+    def manifest(self):
+        """
+        Scripted timings and counters for later analysis
+        """
+        return {
+            "name": self.name,
+            "sid": self.sid,
+            "rtp_port": self.rtp_addr[1],
+            "udp_port": self.udp_addr[1],
+            "start": self.start,
+            "events": self.events,
+            "eit_gaps": self.eit_gaps,
+            "datagrams": self.datagrams,
+            "ts_packets": self.ts_packets,
+            "video_packets": self.video_counter,
+            "null_packets": self.null_packets,
+        }
+
+
+def synthetic_channels(count, programme_seconds, programmes, late=0, gap_every=0,
+                       rtp_base=31001, udp_base=31101, host="127.0.0.1", bitrate=2.0,
+                       null_ratio=0.0):
+    """
+    Build count channels with identical scripted programmes,
+    every other boundary running late by 'late' seconds and an
+    EIT gap of one programme every gap_every programmes
+    """
+    channels = []
+    for num in range(0, count):
+        events = []
+        gaps = []
+        for prog in range(0, programmes):
+            events.append({
+                "event_id": 2000 + prog,
+                "title": f"Synthetic programme {prog}, part {num}",
+                "seconds": programme_seconds,
+                "late": late if prog % 2 else 0,
+            })
+            if gap_every and prog and prog % gap_every == 0:
+                gaps.append([prog * programme_seconds, (prog + 1) * programme_seconds])
+        channels.append(SyntheticChannel(
+            f"synth{num}", 7000 + num, rtp_base + num, udp_base + num, events,
+            gaps, host=host, bitrate=bitrate, null_ratio=null_ratio,
+        ))
+    return channels
+
+
+def script_channels(script_path, host="127.0.0.1", bitrate=2.0, null_ratio=0.0):
+    """
+    Build channels from a JSON script file
+    """
+    with open(script_path, "r") as file:
+        script = json.load(file)
+
+    return [
+        SyntheticChannel(
+            chnl["name"], chnl["sid"], chnl["rtp_port"], chnl["udp_port"], chnl["events"],
+            chnl.get("eit_gaps"), host=host, bitrate=chnl.get("bitrate", bitrate),
+            null_ratio=chnl.get("null_ratio", null_ratio),
+        )
+        for chnl in script["channels"]
+    ]
+
+
+def start_channels(channels, duration=None):
+    """
+    Schedule and start a sender thread per channel,
+    returns stop event and threads
+    """
+    stop = threading.Event()
+    start = time.time()
+    threads = []
+    for channel in channels:
+        channel.schedule(start)
+        thread = threading.Thread(target=channel.run, args=(stop, duration), daemon=True)
+        thread.start()
+        threads.append(thread)
+    return stop, threads
+
+
+def main():
+    """
+    Parse arguments and send streams until duration or interrupt
+    """
+    parser = argparse.ArgumentParser(description="Synthetic MPEG-TS RTP/UDP stream generator")
+    parser.add_argument("--script", help="JSON channel script")
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--programme-seconds", type=int, default=120)
+    parser.add_argument("--programmes", type=int, default=30)
+    parser.add_argument("--late", type=float, default=0, help="Seconds runningStatus flip lags on alternate boundaries")
+    parser.add_argument("--gap-every", type=int, default=0, help="Drop EIT for one programme every N")
+    parser.add_argument("--bitrate", type=float, default=2.0, help="Mbit/s per channel")
+    parser.add_argument("--null-ratio", type=float, default=0.0, help="Fraction of null packets")
+    parser.add_argument("--host", default="127.0.0.1", help="Destination, may be a multicast group")
+    parser.add_argument("--rtp-base", type=int, default=31001)
+    parser.add_argument("--udp-base", type=int, default=31101)
+    parser.add_argument("--duration", type=float, help="Seconds to run")
+    parser.add_argument("--manifest", help="Write scripted timings and counters to this JSON")
+    args = parser.parse_args()
+
+    if args.script:
+        channels = script_channels(args.script, args.host, args.bitrate, args.null_ratio)
+    else:
+        channels = synthetic_channels(
+            args.channels, args.programme_seconds, args.programmes, args.late, args.gap_every,
+            args.rtp_base, args.udp_base, args.host, args.bitrate, args.null_ratio,
+        )
+
+    stop, threads = start_channels(channels, args.duration)
+    print(f"Sending {len(channels)} channels to {args.host}")
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    for channel in channels:
+        print(f"{channel.name}: {channel.datagrams} datagrams, {channel.video_counter} video packets")
+    if args.manifest:
+        with open(args.manifest, "w") as file:
+            json.dump([channel.manifest() for channel in channels], file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ Runs in early hours targetting yesterday's
 recorded content.
 
 main():
-1. Iterates list of CHANNELS, creates
+1. Iterates channels in channels.json, creates
    fpath then generates list of folders
    contained within (programme folders).
 2. Checks if correct date path for yesterday
@@ -33,46 +33,17 @@ import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import channel_registry
+import stora_core
+
 # Global paths
-STORAGE_PATH = os.environ['STORAGE_PATH']
-CODEPTH = os.environ['CODE']
-STORA_PTH = os.environ['STORA_PATH']
-FOLDERS = os.environ['STORA_FOLDERS']
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+CODEPTH = os.environ.get('CODE', '')
+STORA_PTH = os.environ.get('STORA_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
 LOG_FILE = os.path.join(FOLDERS, 'logs/stora_channel_move_qnap04.log')
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
 STORA_CONTROL = os.path.join(CODEPTH, 'stora_control.json')
-RSYNC_LOG = os.environ['RSYNC_LOGS']
-
-# Date variables
-TODAY = datetime.now()
-YEST = TODAY - timedelta(2)
-YESTERDAY = int(YEST.strftime('%d'))
-DATE_PATH = os.path.join(STORAGE_PATH, f"{str(YEST)[:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/")
-MONTH_PATH = os.path.join(STORAGE_PATH, f"{str(YEST)[:4]}/{str(YEST)[5:7]}/")
-STORA = os.path.join(STORA_PTH, f"{str(YEST)[:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/")
-
-# Setup logging
-logging.basicConfig(filename=LOG_FILE, filemode='a', format='%(asctime)s\t%(levelname)s\t%(message)s', level=logging.INFO)
-
-CHANNELS = [
-    'bbconehd',
-    'bbctwohd',
-    'bbcthree',
-    'bbcfourhd',
-    'bbcnewshd',
-    'cbbchd',
-    'cbeebieshd',
-    'channel4',
-    'film4',
-    'five',
-    '5star',
-    'itv1',
-    'itv2',
-    'itv3',
-    'itv4',
-    'more4',
-    'e4'
-]
+RSYNC_LOG = os.environ.get('RSYNC_LOGS', '')
 
 
 def check_control():
@@ -87,16 +58,20 @@ def check_control():
             sys.exit("Script run prevented by stora_control.json. Script exiting.")
 
 
-def main():
+def main(today=None):
     """
-    Iterate list of CHANNEL folders for yesterday
+    Iterate list of CHANNEL folders for two days ago
     Copy to STORA/YYYY/MM/DD path with delete of original
     """
 
+    stora_core.require_env('STORAGE_PATH', 'CODE', 'STORA_PATH', 'STORA_FOLDERS', 'RSYNC_LOGS')
+    logging.basicConfig(filename=LOG_FILE, filemode='a', format=stora_core.LOG_FORMAT, level=logging.INFO)
     check_control()
-    print(STORA)
-    for chnl in CHANNELS:
-        fpath = os.path.join(DATE_PATH, chnl)
+    yest = stora_core.day_paths(STORAGE_PATH, (today or datetime.now()) - timedelta(2))
+    stora = stora_core.day_paths(STORA_PTH, yest.day).path
+    print(stora)
+    for chnl in channel_registry.channels():
+        fpath = os.path.join(yest.path, chnl)
         if not os.path.exists(fpath):
             logging.info("SKIPPING: Fault with STORA path: %s", fpath)
             continue
@@ -106,28 +81,28 @@ def main():
         ]
 
         logging.info("START MOVE_CONTENT.PY =============== %s", fpath)
-        print(f"Moving to destination: {os.path.join(STORA, chnl)}")
+        print(f"Moving to destination: {os.path.join(stora, chnl)}")
 
         for folder in folders:
             folderpath = os.path.join(fpath, folder)
             logging.info("Targeting folder path: %s", folderpath)
-            if not os.path.exists(STORA):
-                os.makedirs(STORA, exist_ok=True)
-                logging.info("Creating new folder paths in STORA QNAP: %s", STORA)
+            if not os.path.exists(stora):
+                os.makedirs(stora, exist_ok=True)
+                logging.info("Creating new folder paths in STORA QNAP: %s", stora)
             print(folderpath)
 
             fpath1 = folderpath.rstrip("/")
-            fpath2 = os.path.join(STORA, chnl)
+            fpath2 = os.path.join(stora, chnl)
             fpath2 = fpath2.rstrip("/")
 
             logging.info("Okay to copy to STORA QNAP and delete successful copies")
             logging.info("Copying %s to %s", fpath1, fpath2)
-            rsync(fpath1, fpath2, chnl)
+            rsync(fpath1, fpath2, chnl, yest.day)
 
     logging.info("END MOVE_CONTENT.PY ============================================")
 
 
-def rsync(fpath1, fpath2, chnl):
+def rsync(fpath1, fpath2, chnl, day):
     """
     Move Folders using rsync
     With archive and additional checksum
@@ -136,9 +111,7 @@ def rsync(fpath1, fpath2, chnl):
     """
 
     folder = os.path.split(fpath1)[1]
-    log_path = os.path.join(
-        RSYNC_LOG, f"{str(YEST)[:4]}/{str(YEST)[5:7]}/{str(YEST)[8:10]}/", chnl
-    )
+    log_path = os.path.join(stora_core.day_paths(RSYNC_LOG, day).path, chnl)
     if not os.path.exists(log_path):
         os.makedirs(log_path, exist_ok=True)
     new_log = Path(os.path.join(log_path, f"{folder}_move.log"))
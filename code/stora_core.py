@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Shared start up helpers so STORA scripts can be imported for
+reuse, replay and benchmarking without side effects, and short
+cron runs only pay for what they use.
+
+lazy_module() - vlc, requests or tenacity, imported on first
+                attribute use rather than at script import
+retry() - tenacity.retry decorator built on first call, so
+          defining a retried function does not import tenacity
+day_paths() - date and YYYY/MM/DD/ storage path for a given
+              day, in place of TODAY/YEST globals frozen at import
+log_to() - attach a script's log file handler from main()
+require_env() - exit from main() naming any environment variables
+                a cron run needs that are unset, as module globals
+                read them with defaults so scripts import without them
+
+2026
+"""
+
+import collections
+import functools
+import importlib
+import logging
+import os
+import sys
+
+LOG_FORMAT = "%(asctime)s\t%(levelname)s\t%(message)s"
+
+DayPaths = collections.namedtuple("DayPaths", ["day", "date", "path"])
+
+
+class LazyModule:
+    """
+    Stand in for a module, imported on first
+    attribute access. A missing package raises
+    ImportError only when first used
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_module(name):
+    """
+    LazyModule for name
+    """
+    return LazyModule(name)
+
+
+TENACITY = lazy_module("tenacity")
+
+
+def retry(spec=dict):
+    """
+    Decorator applying tenacity.retry(**spec())
+    on the first call. spec is called then, so
+    it may build tenacity stop/wait objects
+    """
+    def decorate(func):
+        wrapped = []
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            if not wrapped:
+                wrapped.append(TENACITY.retry(**spec())(func))
+            return wrapped[0](*args, **kwargs)
+
+        return call
+
+    return decorate
+
+
+def day_paths(root, day):
+    """
+    DayPaths for day under storage root
+    """
+    return DayPaths(day, day.strftime("%Y-%m-%d"), os.path.join(root, day.strftime("%Y/%m/%d/")))
+
+
+def log_to(logger, fpath):
+    """
+    Add file handler and INFO level to logger
+    once, returning logger
+    """
+    if not logger.handlers:
+        hdlr = logging.FileHandler(fpath)
+        hdlr.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(hdlr)
+        logger.setLevel(logging.INFO)
+    return logger
+
+
+def require_env(*names):
+    """
+    Exit naming any of the environment
+    variables given that are unset
+    """
+    missing = [name for name in names if not os.environ.get(name)]
+    if missing:
+        sys.exit(f"Environment variables not set: {', '.join(missing)}")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+Compact record types shared by the STORA recorder and schedule
+scripts, in place of comma-joined strings and dicts of dicts.
+Fields are read by name, so titles containing commas can no
+longer shift the fields that follow them.
+
+EitEvent - one dvbtee EIT present/following event, title and
+           description cleaned once when read
+ScheduleEntry - one {channel}_schedule_{YYYY-MM-DD}.json entry,
+                to_json() returns the existing JSON shape
+Recording - one parsed schedule programme for a channel's capture
+
+All are namedtuples without per-instance dicts.
+
+2026
+"""
+
+import collections
+import datetime
+
+FORMAT = "%Y-%m-%d %H:%M:%S"
+FTIME = "%H-%M-%S"
+RUNNING = "4"
+NOT_RUNNING = "1"
+
+
+def clean_text(text):
+    """
+    Remove DVB emphasis codes left by dvbtee
+    """
+    for char in ("\x86", "\x87", "Â"):
+        text = text.replace(char, "")
+    return text
+
+
+def hms(seconds):
+    """
+    Seconds as %H-%M-%S, as used in folder names
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600 % 24:02d}-{seconds // 60 % 60:02d}-{seconds % 60:02d}"
+
+
+class EitEvent(collections.namedtuple(
+    "EitEvent", ["event_id", "running", "start", "end", "title", "desc"]
+)):
+    """
+    EIT event with UTC start and end datetimes
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dvbtee(cls, event):
+        """
+        Build from a dvbtee event dict, None
+        where start or end are missing
+        """
+        try:
+            start = datetime.datetime.utcfromtimestamp(int(event["unixTimeBegin"]))
+            end = datetime.datetime.utcfromtimestamp(int(event["unixTimeEnd"]))
+        except (TypeError, KeyError, ValueError):
+            return None
+        try:
+            title = clean_text(event["descriptors"][0]["name"])
+        except (TypeError, IndexError, KeyError):
+            title = ""
+        try:
+            desc = clean_text(event["descriptors"][0]["text"])
+        except (TypeError, IndexError, KeyError):
+            desc = ""
+        return cls(event.get("eventId", ""), str(event.get("runningStatus", "")), start, end, title, desc)
+
+    @property
+    def seconds(self):
+        """
+        Event length in seconds
+        """
+        return int((self.end - self.start).total_seconds())
+
+    @property
+    def minutes(self):
+        """
+        Event length in whole minutes
+        """
+        return self.seconds // 60
+
+    @property
+    def start_hms(self):
+        """
+        Start time as %H-%M-%S
+        """
+        return self.start.strftime(FTIME)
+
+    @property
+    def end_hms(self):
+        """
+        End time as %H-%M-%S
+        """
+        return self.end.strftime(FTIME)
+
+    @property
+    def duration_hms(self):
+        """
+        Length as %H-%M-%S
+        """
+        return hms(self.seconds)
+
+
+def present_following(events):
+    """
+    Split dvbtee EIT into running and not running
+    dictionaries of EitEvent keyed by EventId
+    """
+    running = {}
+    not_running = {}
+    try:
+        entries = events["events"][:2]
+    except (TypeError, KeyError):
+        return running, not_running
+    for event in entries:
+        event = EitEvent.from_dvbtee(event)
+        if event is None:
+            continue
+        if event.running == RUNNING:
+            running[event.event_id] = event
+        elif event.running == NOT_RUNNING:
+            not_running[event.event_id] = event
+    return running, not_running
+
+
+class ScheduleEntry(collections.namedtuple(
+    "ScheduleEntry", ["start", "duration", "channel", "programme"]
+)):
+    """
+    Schedule JSON entry, start as datetime
+    and duration in minutes
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_json(cls, entry):
+        """
+        Build from a schedule JSON dict
+        """
+        return cls(
+            datetime.datetime.strptime(entry["start"], FORMAT),
+            int(entry.get("duration") or 0),
+            entry.get("channel"),
+            entry.get("programme"),
+        )
+
+    def to_json(self):
+        """
+        Schedule JSON dict for this entry
+        """
+        return {
+            "start": self.start.strftime(FORMAT),
+            "duration": self.duration,
+            "channel": self.channel,
+            "programme": self.programme,
+        }
+
+    @property
+    def end(self):
+        """
+        Scheduled end datetime
+        """
+        return self.start + datetime.timedelta(minutes=self.duration)
+
+
+class Recording(collections.namedtuple(
+    "Recording", ["url", "channel", "start", "duration", "end", "programme", "sid"]
+)):
+    """
+    Scheduled programme to capture from a channel's
+    RTP url, start and end as datetimes
+    """
+
+    __slots__ = ()
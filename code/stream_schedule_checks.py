@@ -19,8 +19,8 @@ main():
    c. Check 'Not Running' metadata for matching
       item with new 'next' start time
    d. Extract duration, channel and programme name
-      and generate new schedule dictionary
-   e. Replace scheduled index with new 'next' dict
+      and generate new ScheduleEntry
+   e. Replace scheduled index with new 'next' entry
    f. Update logs with programme 'EXTENSION'
 7. If duration does match but title does not:
    a. Leave as does not impact schedule recording
@@ -38,46 +38,19 @@ import os
 import subprocess
 from datetime import datetime, timedelta
 
+import channel_registry
+import folder_names
+import stora_core
+import stora_records
+
 # Static global variables
-STORAGE_PATH = os.environ['STORAGE_PATH']
-CODEPTH = os.environ['CODE']
-FOLDERS = os.environ['STORA_FOLDERS']
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
 SCHEDULES = os.path.join(FOLDERS, 'schedules/')
-TODAY = datetime.utcnow()
-START = TODAY.strftime("%Y-%m-%d")
-DATE_PATH = os.path.join(STORAGE_PATH, f"{START[0:4]}/{START[5:7]}/{START[8:10]}/")
-DATE = f"{START[0:4]}-{START[5:7]}-{START[8:10]}"
 FORMAT = "%Y-%m-%d %H:%M:%S"
 
-# Setup logging / yet to be implemented
+# Setup logging, file handler added in main()
 LOGGER = logging.getLogger('stream_schedule_checks')
-HDLR = logging.FileHandler(os.path.join(FOLDERS, 'logs/stream_schedule_checks.log'))
-FORMATTER = logging.Formatter('%(asctime)s\t%(levelname)s\t%(message)s')
-HDLR.setFormatter(FORMATTER)
-LOGGER.addHandler(HDLR)
-LOGGER.setLevel(logging.INFO)
-
-CHANNELS = {
-    'bbconehd': 'BBC One HD',
-    'bbctwohd': 'BBC Two HD',
-    'bbcthree': 'BBC Three HD',
-    'bbcfourhd': 'BBC Four HD',
-    'bbcnewshd': 'BBC NEWS HD',
-    'cbbchd': 'CBBC HD',
-    'cbeebieshd': 'CBeebies HD',
-    'channel4': 'Channel 4 HD',
-    'film4': 'Film4',
-    'five': 'Channel 5 HD',
-    '5star': '5STAR',
-    'itv1': 'ITV HD',
-    'itv2': 'ITV2',
-    'itv3': 'ITV3',
-    'itv4': 'ITV4',
-    'itvbe': 'ITV BE',
-    'more4': 'More4',
-    'e4': 'E4'
-}
 
 
 def get_metadata(filepath):
@@ -143,65 +116,41 @@ def configure_data(metadata):
         return None
 
 
-def get_datetime(folder, date):
+def open_schedule(schedule_path):
     """
-    Cut up folder start time/duration
-    and return as datetime object
+    Open schedule and return as list of ScheduleEntry
     """
 
-    print(folder)
-    tm = folder[0:8]
-    tm = tm.replace("-", ":")
-    duration = folder[-8:]
-    print(f"Folder timings: Start {tm} - Duration {duration}")
-    dt_str = f"{date} {tm}"
-    dt_start = datetime.strptime(dt_str, FORMAT)
-    hour, mins, sec = duration.split("-")
-    minutes = (
-        int(
-            timedelta(
-                hours=int(hour), minutes=int(mins), seconds=int(sec)
-            ).total_seconds()
-        )
-        / 60
-    )
-    dt_end = dt_start + timedelta(minutes=minutes)
-    return dt_end
+    with open(schedule_path) as json_file:
+        data = json.load(json_file)
+    return [stora_records.ScheduleEntry.from_json(entry) for entry in data]
 
 
-def open_schedule(schedule_path):
+def write_schedule(schedule_path, schedule):
     """
-    Open schedule and return as list of dicts
+    Overwrite schedule JSON from list of ScheduleEntry
     """
 
-    with open(schedule_path) as json_file:
-        data = json.load(json_file)
-    return data
+    with open(schedule_path, "w") as jsf:
+        json.dump([entry.to_json() for entry in schedule], jsf, indent=4)
 
 
-def check_for_match(sched_dict, utc_title, utc_time, utc_dur, chnl):
+def check_for_match(entry, utc_title, utc_time, utc_dur, chnl):
     """
-    Check for matching data in key, values of sched_dict
+    Compare schedule entry with stream 'Running'
+    metadata, returning replacement ScheduleEntry
+    where the durations differ
     """
 
-    s_dur = sched_dict.get("duration")
-    s_chnl = sched_dict.get("channel")
-    s_prog = sched_dict.get("programme")
-    print(sched_dict)
-    print(s_prog, s_dur, s_chnl)
+    print(entry)
     print(utc_title, utc_dur, chnl)
-    new_dct = {}
-    if chnl != s_chnl:
+    if chnl != entry.channel:
         return None
 
-    if str(s_dur) != str(utc_dur):
-        print(f"Replacing {s_prog} with {utc_title}")
-        print(f"New duration is {utc_dur} mins, not {s_dur} minutes")
-        new_dct["start"] = utc_time
-        new_dct["duration"] = utc_dur
-        new_dct["channel"] = chnl
-        new_dct["programme"] = utc_title
-        return new_dct
+    if entry.duration != utc_dur:
+        print(f"Replacing {entry.programme} with {utc_title}")
+        print(f"New duration is {utc_dur} mins, not {entry.duration} minutes")
+        return stora_records.ScheduleEntry(utc_time, utc_dur, chnl, utc_title)
 
 
 def get_next_start_time(utc_dt, utc_dur):
@@ -210,36 +159,29 @@ def get_next_start_time(utc_dt, utc_dur):
     Calculate new start time for next programme
     """
 
-    dt_start = datetime.strptime(utc_dt, FORMAT)
-    utc_dur = int(utc_dur)
-    dt_end = dt_start + timedelta(minutes=utc_dur)
-    print(dt_end, type(dt_end), dt_end.strftime(FORMAT))
-    return dt_end.strftime(FORMAT)
+    dt_end = utc_dt + timedelta(minutes=int(utc_dur))
+    print(dt_end.strftime(FORMAT))
+    return dt_end
 
 
-def get_next_dct(next_dt_start, chnl, data=None):
+def get_next_entry(next_dt_start, chnl, data=None):
     """
     Iterate 'Not running' returns looking for new
-    start date match, create new dictionary entry
+    start date match, create new ScheduleEntry
     """
 
-    print(f"get_next_dct(): Recieved {next_dt_start}, {chnl}, {data}")
+    print(f"get_next_entry(): Recieved {next_dt_start}, {chnl}, {data}")
     if data is None:
         return None
 
     title = dt = dur = ""
     for entry in data:
-        if next_dt_start in str(entry):
+        if next_dt_start.strftime(FORMAT) in str(entry):
             title, dt, dur = configure_data(entry)
-    print("Title retrieved: {title}")
+    print(f"Title retrieved: {title}")
 
     if title:
-        next_dct = {}
-        next_dct["start"] = dt
-        next_dct["duration"] = dur
-        next_dct["channel"] = chnl
-        next_dct["programme"] = title
-        return next_dct
+        return stora_records.ScheduleEntry(datetime.strptime(dt, FORMAT), dur, chnl, title)
 
 
 def check_remaining_schedule(schedule, sched_time, index, total_index):
@@ -254,45 +196,36 @@ def check_remaining_schedule(schedule, sched_time, index, total_index):
     index = index + 1
 
     for num in range(index, total_index):
-        dct = schedule[num]
-        start = dct["start"]
-        sched_start = datetime.strptime(start, FORMAT)
-        if sched_time > sched_start:
-            print(f"Schedule to be deleted: {dct}")
-            delete_list.append(schedule[num])
+        entry = schedule[num]
+        if sched_time > entry.start:
+            print(f"Schedule to be deleted: {entry}")
+            delete_list.append(entry)
 
     for item in delete_list:
         schedule.remove(item)
     return schedule
 
 
-def get_endtime(start, dur):
+def main(today=None):
     """
-    Return endtime formatted:
-    YYYY-mm-dd HH:MM:SS strftime
-    """
-
-    sched_start = datetime.strptime(start, FORMAT)
-    end_dt = sched_start + timedelta(minutes=int(dur))
-    return end_dt
-
-
-def main():
-    """
-    Iterate channels, extract schedule to dictionary
+    Iterate channels, extract schedule to entries
     Test stream metadata and fetch timings
     Replace in schedule where durations don't match
     """
 
+    stora_core.require_env('STORAGE_PATH', 'STORA_FOLDERS')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/stream_schedule_checks.log'))
+    day = stora_core.day_paths(STORAGE_PATH, today or datetime.utcnow())
+
     # Temp start for limited channel access
-    for chnl in CHANNELS.keys():
+    for chnl in channel_registry.channels():
         # Get paths
-        chnl_path = os.path.join(DATE_PATH, chnl)
+        chnl_path = os.path.join(day.path, chnl)
         if not os.path.exists(chnl_path):
             continue
         print(f"Channel being checked {chnl}")
-        # Load today's schedule (list of dicts)
-        schedule_path = os.path.join(SCHEDULES, f"{chnl}_schedule_{DATE}.json")
+        # Load today's schedule (list of ScheduleEntry)
+        schedule_path = os.path.join(SCHEDULES, f"{chnl}_schedule_{day.date}.json")
         schedule = open_schedule(schedule_path)
         folders = [
             d
@@ -300,13 +233,9 @@ def main():
             if os.path.isdir(os.path.join(chnl_path, d))
         ]
 
-        for folder in folders:
-            # Skip if programme finished recording
-            rec_end = get_datetime(folder, DATE)
-            now = datetime.now()
-            if now > rec_end:
-                continue
-
+        # Skip programmes already over, out of scope for extending
+        listing = folder_names.parse_listing(folders, day.day)
+        for folder in [fld.name for fld in listing.running(datetime.now())]:
             filepath = os.path.join(chnl_path, folder, "stream.mpeg2.ts")
             # Extract metadata lines to data[0] 'Running' and data[1] 'Not running'
             data = get_metadata(filepath)
@@ -322,18 +251,18 @@ def main():
                     f"UTC entry: Title {utc_title} - Datetime {utc_dt} - Duration {utc_dur}"
                 )
                 # Retrieve schedule indexes for entries with matching start time
-                index = [i for i, x in enumerate(schedule) if utc_dt in str(x)]
+                utc_start = datetime.strptime(utc_dt, FORMAT)
+                index = [i for i, x in enumerate(schedule) if x.start == utc_start]
                 if len(index) != 1:
                     continue
                 print(f"Schedule datetime match: {schedule[index[0]]}")
-                # matched must return [{dicts}]
                 mismatched = check_for_match(
-                    schedule[index[0]], utc_title, utc_dt, utc_dur, chnl
+                    schedule[index[0]], utc_title, utc_start, utc_dur, chnl
                 )
                 if not mismatched:
                     continue
 
-                # Here replace index of dict with new returned one
+                # Here replace schedule entry with new returned one
                 LOGGER.info(
                     "STREAM_SCHEDULE_CHECKS START - %s - %s =========================",
                     chnl,
@@ -355,13 +284,13 @@ def main():
                 )
                 if next_index < len(schedule):
                     # Update the next item's start time
-                    next_dt_start = get_next_start_time(utc_dt, utc_dur)
+                    next_dt_start = get_next_start_time(utc_start, utc_dur)
                     LOGGER.info(
                         "Calculating new start time for next programme: %s",
                         next_dt_start,
                     )
                     print(f"Next programme's start time: {next_dt_start}")
-                    next_sched = get_next_dct(next_dt_start, chnl, data)
+                    next_sched = get_next_entry(next_dt_start, chnl, data)
                     print(f"Next schedule: {next_sched}")
                     if not next_sched:
                         LOGGER.info(
@@ -371,13 +300,9 @@ def main():
                         continue
 
                     # Assess if schedule should have 'next' inserted or updated
-                    next_dt_sched = datetime.strptime(
-                        schedule[next_index]["start"], FORMAT
-                    )
-                    next_dt_end = get_endtime(
-                        next_sched["start"], next_sched["duration"]
-                    )
-                    next_schedule_mins = int(schedule[next_index]["duration"])
+                    next_dt_sched = schedule[next_index].start
+                    next_dt_end = next_sched.end
+                    next_schedule_mins = schedule[next_index].duration
 
                     if next_dt_end <= next_dt_sched or next_schedule_mins <= 5:
                         # Next schedule to be inserted
@@ -386,7 +311,7 @@ def main():
                             new_schedule.append(schedule[num])
                         new_schedule.append(next_sched)
                         LOGGER.info(
-                            "Inserting new dictionary entry for next item: %s",
+                            "Inserting new schedule entry for next item: %s",
                             next_sched,
                         )
                         for num in range(next_index, len(schedule)):
@@ -398,7 +323,7 @@ def main():
 
                     else:
                         # Update next start time
-                        schedule[next_index].update({"start": f"{next_sched['start']}"})
+                        schedule[next_index] = schedule[next_index]._replace(start=next_sched.start)
                         LOGGER.info(
                             "Next schedule entry updated with start time only from:\n%s",
                             next_sched,
@@ -408,7 +333,6 @@ def main():
                             schedule, next_dt_end, next_index, len(schedule)
                         )
 
-                    orig_sched = []
                     orig_sched = open_schedule(schedule_path)
 
                     if orig_sched != new_schedule:
@@ -417,9 +341,8 @@ def main():
                         print(orig_sched)
                         print(new_schedule)
 
-                    # Overwrite schedule dumping new dict to same filename
-                    with open(schedule_path, "w") as jsf:
-                        json.dump(new_schedule, jsf, indent=4)
+                    # Overwrite schedule with new entries to same filename
+                    write_schedule(schedule_path, new_schedule)
 
                     LOGGER.info(
                         "STREAM_SCHEDULE_CHECKS END - %s - %s ===========================",
@@ -5,9 +5,10 @@ Script to check stream now/next information
 and update schedule if changes occur.
 
 main():
-1. Begin iteration of CHANNEL keys and build
+1. Begin iteration of channels with a UDP EIT
+   feed in channels.json and build
    path to today's date/channel STORA recordings.
-2. Load today's schedule to memory as dict.
+2. Load today's schedule to memory as ScheduleEntry list.
 3. Compile list of folders, iterate list to locate
    folder that is currently recording.
 4. Extract CHANNEL UDP address and capture EIT
@@ -22,16 +23,16 @@ main():
      Move onto step 6
 6. Check if 'next' EIT data is present:
    - Yes, 'next' data is compiled into a new schedule
-     entry. Remaining schedule items in dictionary checked
+     entry. Remaining schedule entries are checked
      against 'next' start datetime object. If any schedule
      datetimes are lt/et next datetime they are removed.
      The schedule is rebuilt into a new schedule feature
      the next programme in the queue.
    - No, no 'next' data compiled.
-7. Re-opens schedule and saves to second dict, then
-   compares the old dictionary schedule with the new.
-   If there are changes the JSON schedule is opened
-   and the new dictionary data is overwritten.
+7. Re-opens schedule as a second list, then
+   compares the old schedule entries with the new.
+   If there are changes the JSON schedule is
+   overwritten with the new entries.
 
 2022
 """
@@ -41,69 +42,29 @@ import json
 import logging
 import os
 import subprocess
-import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
-import tenacity
+import channel_registry
+import folder_names
+import stora_core
+import stora_records
+
+tenacity = stora_core.lazy_module('tenacity')
 
 # Static global variables
-STORAGE_PATH = os.environ['STORAGE_PATH']
-CODEPTH = os.environ['CODE']
-FOLDERS = os.environ['STORA_FOLDERS']
-CONFIG_FILE = os.path.join(CODEPTH, 'stream_config.json')
-CONFIG_UDP = os.path.join(CODEPTH, 'stream_config_udp.json')
+STORAGE_PATH = os.environ.get('STORAGE_PATH', '')
+FOLDERS = os.environ.get('STORA_FOLDERS', '')
 SCHEDULES = os.path.join(FOLDERS, 'schedules/')
-TODAY = datetime.utcnow()
-START = TODAY.strftime("%Y-%m-%d")
-DATE_PATH = os.path.join(STORAGE_PATH, f"{START[0:4]}/{START[5:7]}/{START[8:10]}/")
-DATE = f"{START[0:4]}-{START[5:7]}-{START[8:10]}"
 FORMAT = "%Y-%m-%d %H:%M:%S"
 FDATE = "%Y-%m-%d"
 FTIME = "%H-%M-%S"
-DVBTEE = os.environ["DVBTEE"]
+DVBTEE = os.environ.get("DVBTEE", "")
 
-# Setup logging / yet to be implemented
+# Setup logging, file handler added in main()
 LOGGER = logging.getLogger('stream_schedule_checks')
-HDLR = logging.FileHandler(os.path.join(FOLDERS, 'logs/stream_schedule_checks_eit.log'))
-FORMATTER = logging.Formatter('%(asctime)s\t%(levelname)s\t%(message)s')
-HDLR.setFormatter(FORMATTER)
-LOGGER.addHandler(HDLR)
-LOGGER.setLevel(logging.INFO)
-
-CHANNELS = {'bbconehd': 'BBC One HD',
-            'bbctwohd': 'BBC Two HD',
-            'bbcthree': 'BBC Three HD',
-            'bbcfourhd': 'BBC Four HD',
-            'bbcnewshd': 'BBC NEWS HD',
-            'cbbchd': 'CBBC HD',
-            'cbeebieshd': 'CBeebies HD',
-            'five': 'Channel 5 HD',
-            '5star': '5STAR',
-            'itv1': 'ITV HD',
-            'itv2': 'ITV2',
-            'itv3': 'ITV3',
-            'itv4': 'ITV4',
-            'channel4': 'Channel 4 HD',
-            'film4': 'Film4',
-            'more4': 'More4',
-            'e4': 'E4'
-}
-
-
-def fetch_udp(channel):
-    """
-    Return UDP stream for channel
-    """
-
-    with open(CONFIG_UDP, "r") as file:
-        cjson = json.load(file)
 
-    for key, val in cjson.items():
-        if key == channel:
-            return val
 
-
-@tenacity.retry(stop=tenacity.stop_after_attempt(5))
+@stora_core.retry(lambda: {'stop': tenacity.stop_after_attempt(5)})
 def get_events(udp):
     """
     Dump libdvbtee EIT data to dict
@@ -136,155 +97,59 @@ def get_events(udp):
 
 def read_eit(events):
     """
-    Search through event data
-    clean up title, description entries
-    then return dictionaries for running
+    Search through event data, title and
+    description cleaned by EitEvent, then
+    return dictionaries for running
     and not running entries
     """
 
-    running = {}
-    not_running = {}
-
-    for num in range(0, 2):
-        try:
-            event_id = events["events"][num]["eventId"]
-        except (IndexError, KeyError, TypeError):
-            event_id = ""
-        try:
-            title = events["events"][num]["descriptors"][0]["name"]
-            title = title.replace("\x86", "")
-            title = title.replace("\x87", "")
-            title = title.replace("Â", "")
-        except (IndexError, KeyError, TypeError):
-            title = ""
-        try:
-            desc = events["events"][num]["descriptors"][0]["text"]
-            desc = desc.replace("\x86", "")
-            desc = desc.replace("\x87", "")
-            desc = desc.replace("Â", "")
-        except (IndexError, KeyError, TypeError):
-            desc = ""
-        try:
-            run_stat = events["events"][num]["runningStatus"]
-        except (IndexError, KeyError, TypeError):
-            run_stat = ""
-        try:
-            ts_start = events["events"][num]["unixTimeBegin"]
-            start = datetime.utcfromtimestamp(ts_start).strftime(FTIME)
-        except (IndexError, KeyError, TypeError):
-            ts_start = ""
-        try:
-            ts_end = events["events"][num]["unixTimeEnd"]
-            end = datetime.utcfromtimestamp(ts_end).strftime(FTIME)
-        except (IndexError, KeyError, TypeError):
-            ts_end = ""
-
-        if ts_end and ts_start:
-            seconds = int(ts_end) - int(ts_start)
-            duration = str(time.strftime(FTIME, time.gmtime(seconds)))
-        else:
-            duration = ""
-        if str(run_stat) == "4":
-            running[event_id] = (
-                f"{duration}, {start}, {end}, {run_stat}, {title}, {desc}"
-            )
-        if str(run_stat) == "1":
-            not_running[event_id] = (
-                f"{duration}, {start}, {end}, {run_stat}, {title}, {desc}"
-            )
-
-    return running, not_running
-
-
-def configure_duration(duration):
-    """
-    Take %H-%M-%S duration
-    convert to integer minutes
-    """
-
-    hour, mins, sec = duration.split("-")
-    minutes = (
-        int(
-            timedelta(
-                hours=int(hour), minutes=int(mins), seconds=int(sec)
-            ).total_seconds()
-        )
-        // 60
-    )
-    return minutes
+    return stora_records.present_following(events)
 
 
-def get_datetime(folder, date):
+def open_schedule(schedule_path):
     """
-    Cut up folder start time/duration
-    and return as datetime object
+    Open schedule and return as list of ScheduleEntry
     """
 
-    tm = folder[0:8]
-    tm = tm.replace("-", ":")
-    duration = folder[-8:]
-    dt_str = f"{date} {tm}"
-    dt_start = datetime.strptime(dt_str, FORMAT)
-    hour, mins, sec = duration.split("-")
-    minutes = (
-        int(
-            timedelta(
-                hours=int(hour), minutes=int(mins), seconds=int(sec)
-            ).total_seconds()
-        )
-        / 60
-    )
-
-    return dt_start + timedelta(minutes=minutes)
+    with open(schedule_path) as json_file:
+        data = json.load(json_file)
+    return [stora_records.ScheduleEntry.from_json(entry) for entry in data]
 
 
-def open_schedule(schedule_path):
+def write_schedule(schedule_path, schedule):
     """
-    Open schedule and return as list of dicts
+    Overwrite schedule JSON from list of ScheduleEntry
     """
 
-    with open(schedule_path) as json_file:
-        data = json.load(json_file)
-    return data
+    with open(schedule_path, "w") as jsf:
+        json.dump([entry.to_json() for entry in schedule], jsf, indent=4)
 
 
-def check_for_match(sched_dict, utc_title, utc_time, utc_dur, chnl):
+def check_for_match(entry, event, start, chnl):
     """
-    Check for matching data in key, values of sched_dict
+    Compare schedule entry with EIT 'now' event,
+    returning replacement ScheduleEntry where
+    the durations differ
     """
 
-    s_dur = sched_dict.get("duration")
-    s_chnl = sched_dict.get("channel")
-    s_prog = sched_dict.get("programme")
-    print(sched_dict)
-    print(s_prog, s_dur, s_chnl)
-    print(utc_title, utc_dur, chnl)
-    new_dct = {}
-    if chnl != s_chnl:
+    print(entry)
+    print(event.title, event.minutes, chnl)
+    if chnl != entry.channel:
         return None
 
-    if str(s_dur) != str(utc_dur):
-        print(f"Replacing {s_prog} with {utc_title}")
-        print(f"New duration is {utc_dur} mins, not {s_dur} minutes")
-        new_dct["start"] = utc_time
-        new_dct["duration"] = utc_dur
-        new_dct["channel"] = chnl
-        new_dct["programme"] = utc_title
-        return new_dct
+    if entry.duration != event.minutes:
+        print(f"Replacing {entry.programme} with {event.title}")
+        print(f"New duration is {event.minutes} mins, not {entry.duration} minutes")
+        return stora_records.ScheduleEntry(start, event.minutes, chnl, event.title)
 
 
-def get_next_dct(start, chnl, duration, title):
+def get_next_entry(event, start, chnl):
     """
-    Create new dictionary entry for 'next'
+    Create new ScheduleEntry for EIT 'next' event
     """
 
-    if start and chnl and duration and title:
-        next_dct = {}
-        next_dct["start"] = start
-        next_dct["duration"] = duration
-        next_dct["channel"] = chnl
-        next_dct["programme"] = title
-        return next_dct
+    if start and chnl and event.minutes and event.title:
+        return stora_records.ScheduleEntry(start, event.minutes, chnl, event.title)
 
 
 def check_remaining_schedule(schedule, sched_time, index, total_index):
@@ -298,45 +163,45 @@ def check_remaining_schedule(schedule, sched_time, index, total_index):
     delete_list = []
     index = index + 1
 
-    dt = datetime.strptime(sched_time, FORMAT)
     for num in range(index, total_index):
-        dct = schedule[num]
-        print(f"Assessing for deletion: {dct}")
-        start = dct["start"]
-        sched_start = datetime.strptime(start, FORMAT)
-        if dt > sched_start:
-            print(f"DELETED: {dct}")
-            delete_list.append(dct)
+        entry = schedule[num]
+        print(f"Assessing for deletion: {entry}")
+        if sched_time > entry.start:
+            print(f"DELETED: {entry}")
+            delete_list.append(entry)
 
     for item in delete_list:
         schedule.remove(item)
     return schedule
 
 
-def main():
+def main(today=None):
     """
-    Iterate channels, extract schedule to dictionary
+    Iterate channels, extract schedule to entries
     Collect UDP EIT data and fetch to variables
     Replace in schedule where durations don't match *now*
     Update *next* where different and remove schedules
     that are no longer relevant
     """
 
+    stora_core.require_env('STORAGE_PATH', 'STORA_FOLDERS', 'DVBTEE')
+    stora_core.log_to(LOGGER, os.path.join(FOLDERS, 'logs/stream_schedule_checks_eit.log'))
+    day = stora_core.day_paths(STORAGE_PATH, today or datetime.utcnow())
+
     # Temp start for limited channel access
-    for chnl in CHANNELS.keys():
+    for chnl, config in channel_registry.with_field('udp').items():
         # Get paths
-        chnl_path = os.path.join(DATE_PATH, chnl)
+        chnl_path = os.path.join(day.path, chnl)
         if not os.path.exists(chnl_path):
             continue
         print(f"Channel being checked {chnl}")
 
         # Get channel's UDP address
-        chnl_udp = fetch_udp(chnl)
+        chnl_udp = config.udp
         print(chnl_udp)
 
-        # Load today's schedule (list of dicts)
-        schedule_path = os.path.join(SCHEDULES, f"{chnl}_schedule_{DATE}.json")
-        schedule = []
+        # Load today's schedule (list of ScheduleEntry)
+        schedule_path = os.path.join(SCHEDULES, f"{chnl}_schedule_{day.date}.json")
         schedule = open_schedule(schedule_path)
         folders = [
             d
@@ -344,13 +209,9 @@ def main():
             if os.path.isdir(os.path.join(chnl_path, d))
         ]
 
-        for folder in folders:
-            # Skip if programme over, out of scope for extending
-            rec_end = get_datetime(folder, DATE)
-            now = datetime.now()
-            if now > rec_end:
-                continue
-
+        # Skip programmes already over, out of scope for extending
+        listing = folder_names.parse_listing(folders, day.day)
+        for folder in [fld.name for fld in listing.running(datetime.now())]:
             # Extract EIT data for active programme
             data = get_events(chnl_udp)
             if not data:
@@ -364,50 +225,42 @@ def main():
 
             if len(running) == 0:
                 continue
-            for items in running.values():
-                rsplit = items.split(", ")
+            for event in running.values():
+                now_event = event
 
             # Collect data to vars
-            now_dur = rsplit[0]
-            now_start = rsplit[1]
-            now_end = rsplit[2]
-            now_title = rsplit[4]
-            now_duration = configure_duration(now_dur)
+            now_start = now_event.start_hms
+            now_title = now_event.title
+            now_duration = now_event.minutes
             print(
-                f"UTC entry: Title {now_title} - Datetime {DATE} {now_start} - Duration {now_duration}"
+                f"UTC entry: Title {now_title} - Datetime {day.date} {now_start} - Duration {now_duration}"
             )
-            now_dt = f"{DATE} {now_start.replace('-',':')}"
+            now_dt = datetime.combine(day.day.date(), now_event.start.time())
 
             # Retrieve schedule indexes for entries with matching start time
-            index = [i for i, x in enumerate(schedule) if now_dt in str(x)]
+            index = [i for i, x in enumerate(schedule) if x.start == now_dt]
             if len(index) < 1:
                 continue
             elif len(index) > 1:
                 LOGGER.warning("More than one matching time found: %s", index)
-                first = index[0]
-                for num in index:
-                    if num == first:
-                        continue
-                    schedule.remove(schedule[num])
+                for num in reversed(index[1:]):
                     LOGGER.info(
                         "Deleted duplicate schedule start time: %s", schedule[num]
                     )
+                    del schedule[num]
 
-            # Compare data to schedule and look for mismatch - must return [{dicts}]
-            mismatched = []
-            mismatched = check_for_match(
-                schedule[index[0]], now_title, now_dt, now_duration, chnl
-            )
+            # Compare data to schedule and look for mismatch
+            mismatched = check_for_match(schedule[index[0]], now_event, now_dt, chnl)
             if not mismatched:
                 continue
 
-            # Here replace index of dict with new returned one
+            # Here replace schedule entry with new returned one
             LOGGER.info(
                 "STREAM_SCHEDULE_CHECKS - %s - %s =====================", chnl, folder
             )
             LOGGER.info(
                 "UTC Entry: %s %s, %s mins, %s",
-                DATE,
+                day.date,
                 now_start,
                 now_duration,
                 now_title,
@@ -419,6 +272,7 @@ def main():
             )
             print(f"Replacing:\n {schedule[index[0]]}\n-----------\n{mismatched}")
             schedule[index[0]] = mismatched
+            new_schedule = schedule
 
             # Check if remaining programmes in schedule and action 'next' updates
             next_index = index[0] + 1
@@ -428,47 +282,42 @@ def main():
 
             if next_index < len(schedule) and len(not_running) == 1:
 
-                for items in not_running.values():
-                    nrsplit = items.split(", ")
+                for event in not_running.values():
+                    next_event = event
 
-                next_dur = nrsplit[0]
-                next_start = nrsplit[1]
-                next_end = nrsplit[2]
-                next_title = nrsplit[4]
-                next_duration = configure_duration(next_dur)
+                next_start = next_event.start_hms
+                next_title = next_event.title
+                next_duration = next_event.minutes
 
                 print(
-                    f"UTC entry: Title {next_title} - Datetime {DATE} {next_start} - Duration {next_duration}"
+                    f"UTC entry: Title {next_title} - Datetime {day.date} {next_start} - Duration {next_duration}"
                 )
                 LOGGER.info(
                     "UTC Entry: %s %s, %s mins, %s",
-                    DATE,
+                    day.date,
                     next_start,
                     next_duration,
                     next_title,
                 )
-                next_dt_start = f"{DATE} {next_start.replace('-',':')}"
-                next_dt_end = f"{DATE} {next_end.replace('-',':')}"
+                next_dt_start = datetime.combine(day.day.date(), next_event.start.time())
+                next_dt_end = datetime.combine(day.day.date(), next_event.end.time())
                 print(
                     f"******* NEXT INDEX: {next_index} LENGTH OF SCHED: {len(schedule)} *********"
                 )
 
                 # Assess if schedule should have 'next' inserted or updated
-                next_dt_udp = datetime.strptime(next_dt_end, FORMAT)
-                next_dt_sched = datetime.strptime(schedule[next_index]["start"], FORMAT)
-                next_schedule_mins = int(schedule[next_index]["duration"])
+                next_dt_sched = schedule[next_index].start
+                next_schedule_mins = schedule[next_index].duration
 
-                if next_dt_udp >= next_dt_sched or next_schedule_mins <= 5:
+                if next_dt_end >= next_dt_sched or next_schedule_mins <= 5:
                     # Next schedule to be inserted
                     new_schedule = []
                     for num in range(0, next_index):
                         new_schedule.append(schedule[num])
-                    next_sched = get_next_dct(
-                        next_dt_start, chnl, next_duration, next_title
-                    )
+                    next_sched = get_next_entry(next_event, next_dt_start, chnl)
                     new_schedule.append(next_sched)
                     LOGGER.info(
-                        "Inserting new dictionary entry for next item: %s", next_sched
+                        "Inserting new schedule entry for next item: %s", next_sched
                     )
                     for num in range(next_index, len(schedule)):
                         new_schedule.append(schedule[num])
@@ -479,24 +328,21 @@ def main():
 
                 else:
                     # Update the next item's start time instead
-                    next_duration = configure_duration(next_dur)
-                    schedule[next_index].update({"start": f"{next_dt_start}"})
+                    schedule[next_index] = schedule[next_index]._replace(start=next_dt_start)
                     LOGGER.info("New start time for next programme: %s", next_dt_start)
                     # Remove schedule items that have been replaced by different start time
                     new_schedule = check_remaining_schedule(
                         schedule, next_dt_end, next_index, len(schedule)
                     )
 
-            orig_sched = []
             orig_sched = open_schedule(schedule_path)
 
             if orig_sched != new_schedule:
                 LOGGER.info("********* ORIGINAL SCHEDULE:\n%s", orig_sched)
                 LOGGER.info("********* NEW SCHEDULE:\n%s", new_schedule)
 
-                # Overwrite schedule dumping new dict to same filename
-                with open(schedule_path, "w") as jsf:
-                    json.dump(new_schedule, jsf, indent=4)
+                # Overwrite schedule with new entries to same filename
+                write_schedule(schedule_path, new_schedule)
 
             LOGGER.info(
                 "STREAM_SCHEDULE_CHECKS END - %s - %s =====================\n",
@@ -0,0 +1,9 @@
+"""
+Put the STORA scripts folder on sys.path so
+tests import modules as the cron scripts do
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+"""
+Tests for capture_telemetry scans, sampling loop and quality.json
+"""
+
+import json
+
+import capture_telemetry
+
+
+def packet(counter, pid=0x100):
+    return bytes([capture_telemetry.SYNC, pid >> 8, pid & 0xFF, 0x10 | counter]) + bytes(184)
+
+
+def test_scan_carries_partial_packet(tmp_path):
+    outfile = tmp_path / "stream.mpeg2.ts"
+    outfile.write_bytes(b"")
+    telemetry = capture_telemetry.ChannelTelemetry("bbconehd", 0, str(tmp_path))
+    telemetry.track(str(outfile))
+    cap = telemetry.captures[str(outfile)]
+    stream = packet(0) + packet(1) + packet(3)
+
+    outfile.write_bytes(stream[:300])
+    cap["size"] = 300
+    telemetry.scan(str(outfile), cap, 0)
+    assert (cap["offset"], len(cap["pending"])) == (300, 112)
+
+    outfile.write_bytes(stream)
+    cap["size"] = len(stream)
+    telemetry.scan(str(outfile), cap, 1)
+    assert (cap["offset"], cap["pending"]) == (len(stream), b"")
+    assert (cap["quality"]["cc_errors"], cap["quality"]["lost"]) == (1, 1)
+    assert cap["quality"]["losses"] == [376]
+
+
+def test_run_survives_failed_sample(tmp_path):
+    telemetry = capture_telemetry.ChannelTelemetry("bbconehd", 0.001, str(tmp_path))
+    calls = []
+
+    def sample():
+        calls.append(1)
+        if len(calls) == 2:
+            telemetry.halt.set()
+        raise KeyError("losses")
+
+    telemetry.sample = sample
+    telemetry.run()
+    assert len(calls) == 2
+
+
+def test_load_quality_fills_missing_keys(tmp_path):
+    outfile = tmp_path / "stream.mpeg2.ts"
+    outfile.write_bytes(b"")
+    (tmp_path / "quality.json").write_text(json.dumps({"bytes": 100, "lost": 2}))
+    quality = capture_telemetry.load_quality(str(outfile))
+    assert (quality["bytes"], quality["lost"], quality["cc_errors"], quality["losses"]) == (100, 2, 0, [])
+
+    (tmp_path / "quality.json").write_text(json.dumps({"bytes": "many", "losses": [1]}))
+    assert capture_telemetry.load_quality(str(outfile))["bytes"] == 0
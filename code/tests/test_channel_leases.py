@@ -0,0 +1,117 @@
+"""
+Tests for channel_leases placement, claims and expiry
+"""
+
+import os
+import time
+
+import channel_leases
+
+CHANNELS = ["bbconehd", "bbctwohd", "itv1hd", "channel4hd", "five", "film4"]
+
+
+class Clock:
+    """
+    Settable time for LeaseStore
+    """
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_placement_is_stable_and_independent_of_order():
+    hosts = {"host-a": 0, "host-b": 0, "host-c": 0}
+    for chnl in CHANNELS:
+        target = channel_leases.placement(chnl, hosts)
+        assert target == channel_leases.placement(chnl, list(reversed(sorted(hosts))))
+        # Removing another host never moves the channel
+        others = [host for host in hosts if host != target]
+        assert channel_leases.placement(chnl, {target: 0, others[0]: 0}) == target
+    assert channel_leases.placement("bbconehd", {}) is None
+
+
+def test_two_hosts_share_channels(tmp_path):
+    clock = Clock()
+    store = channel_leases.LeaseStore(str(tmp_path), clock)
+    store.heartbeat("host-a")
+    first = channel_leases.balance(store, CHANNELS, "host-b")
+    second = channel_leases.balance(store, CHANNELS, "host-a")
+    assert sorted(first + second) == sorted(CHANNELS)
+    assert not set(first) & set(second)
+    for chnl in first:
+        assert channel_leases.holds(str(tmp_path), chnl, "host-b")
+        assert not channel_leases.holds(str(tmp_path), chnl, "host-a")
+    assert not channel_leases.holds(str(tmp_path), "unknown", "host-a")
+
+
+def test_dead_host_leases_claimed(tmp_path):
+    clock = Clock()
+    store = channel_leases.LeaseStore(str(tmp_path), clock)
+    store.heartbeat("host-a")
+    store.heartbeat("host-b")
+    held_b = channel_leases.balance(store, CHANNELS, "host-b")
+    channel_leases.balance(store, CHANNELS, "host-a")
+
+    # host-b stops heartbeating, host-a takes its channels
+    clock.now += channel_leases.HOST_TIMEOUT + 1
+    held_a = channel_leases.balance(store, CHANNELS, "host-a")
+    assert sorted(held_a) == sorted(CHANNELS)
+    assert all(store.lease(chnl)["host"] == "host-a" for chnl in held_b)
+
+
+def test_lease_held_until_new_host_stable(tmp_path):
+    clock = Clock()
+    store = channel_leases.LeaseStore(str(tmp_path), clock)
+    held = channel_leases.balance(store, CHANNELS, "host-a")
+    assert sorted(held) == sorted(CHANNELS)
+
+    # host-b joins, host-a keeps everything until host-b has been up STABLE_SECONDS
+    store.heartbeat("host-b")
+    assert channel_leases.balance(store, CHANNELS, "host-b") == []
+    assert sorted(channel_leases.balance(store, CHANNELS, "host-a")) == sorted(CHANNELS)
+
+    for _ in range(channel_leases.STABLE_SECONDS // 60 + 1):
+        clock.now += 60
+        store.heartbeat("host-b")
+    kept = channel_leases.balance(store, CHANNELS, "host-a")
+    moved = channel_leases.balance(store, CHANNELS, "host-b")
+    assert sorted(kept + moved) == sorted(CHANNELS)
+    assert moved
+    assert all(channel_leases.placement(chnl, ["host-a", "host-b"]) == "host-b" for chnl in moved)
+
+
+def test_grant_refused_when_lease_changed(tmp_path):
+    clock = Clock()
+    store = channel_leases.LeaseStore(str(tmp_path), clock)
+    assert store.grant("bbconehd", "host-a", None)
+    # host-b saw no lease, host-a claimed it meanwhile
+    assert not store.grant("bbconehd", "host-b", None)
+    assert store.lease("bbconehd")["host"] == "host-a"
+    assert store.grant("bbconehd", "host-a", store.lease("bbconehd"))
+
+
+def test_grant_refused_while_claim_held(tmp_path):
+    store = channel_leases.LeaseStore(str(tmp_path), Clock())
+    claim = tmp_path / "channels" / "bbconehd.claim"
+    claim.write_text("host-b")
+    assert not store.grant("bbconehd", "host-a", None)
+    assert store.lease("bbconehd") is None
+    assert claim.exists()
+
+    # Claim left by a host that died mid write is cleared
+    old = time.time() - channel_leases.HOST_TIMEOUT - 1
+    os.utime(claim, (old, old))
+    assert not store.grant("bbconehd", "host-a", None)
+    assert not claim.exists()
+    assert store.grant("bbconehd", "host-a", None)
+
+
+def test_holds_unparsed_lease(tmp_path):
+    channel_leases.LeaseStore(str(tmp_path))
+    (tmp_path / "channels" / "bbconehd.json").write_text('{"host": "ho')
+    assert channel_leases.holds(str(tmp_path), "bbconehd", "host-a") is None
+    (tmp_path / "channels" / "bbconehd.json").write_text('["host-a"]')
+    assert channel_leases.holds(str(tmp_path), "bbconehd", "host-a") is None
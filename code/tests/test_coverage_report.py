@@ -0,0 +1,137 @@
+"""
+Tests for coverage_report sweep, windows and channel/day scans
+"""
+
+import array
+import datetime
+import os
+import time
+
+import pytest
+
+import channel_registry
+import coverage_report
+import folder_names
+
+DAY = datetime.datetime(2026, 3, 14)
+BST_DAY = datetime.datetime(2026, 6, 14)
+
+
+@pytest.fixture
+def london():
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'Europe/London'
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+def channel(start="00:00:00", hours=24):
+    return channel_registry.Channel(
+        "bbconehd", "BBC One HD", "rtp://@:30001", 6941, None, "PA_BBCONE", None, start, hours,
+    )
+
+
+def channel_day(names, sizes, day=DAY, markers=None):
+    listing = folder_names.parse_listing(names, day)
+    found = {'restarts': [], 'epg': [], 'missed': []}
+    found.update(markers or {})
+    return coverage_report.ChannelDay(listing, array.array('q', sizes), found)
+
+
+def test_clock():
+    assert coverage_report.clock(0) == "00:00:00"
+    assert coverage_report.clock(3725) == "01:02:05"
+    assert coverage_report.clock(86400) == "24:00:00"
+
+
+def test_sweep_gaps_and_overlap():
+    starts = array.array('l', [3600, 0, 1800])
+    ends = array.array('l', [7200, 2400, 3000])
+    covered, overlap, gaps = coverage_report.sweep(starts, ends, 0, 10800)
+    assert covered == 2400 + 600 + 3600
+    assert overlap == 600
+    assert gaps == [(3000, 3600), (7200, 10800)]
+
+
+def test_sweep_clips_to_window():
+    covered, overlap, gaps = coverage_report.sweep(array.array('l', [-600]), array.array('l', [600]), 0, 1200)
+    assert (covered, overlap, gaps) == (600, 0, [(600, 1200)])
+    assert coverage_report.sweep(array.array('l'), array.array('l'), 0, 60) == (0, 0, [(0, 60)])
+
+
+def test_expected_includes_previous_window_past_midnight():
+    assert coverage_report.expected(channel(), DAY) == [(0, 86400)]
+    assert coverage_report.expected(channel("06:00:00", 20), DAY) == [(0, 7200), (21600, 86400)]
+    assert coverage_report.expected(channel("06:00:00", 12), DAY) == [(21600, 64800)]
+
+
+def test_intervals_skip_empty_and_shift_yesterday():
+    today = channel_day(["00-30-00-bbconehd-01-00-00", "02-00-00-bbconehd-01-00-00"], [100, 0])
+    yesterday = channel_day(
+        ["22-00-00-bbconehd-01-00-00", "23-30-00-bbconehd-01-00-00"], [100, 100], DAY - datetime.timedelta(1),
+    )
+    starts, ends = coverage_report.intervals(today, yesterday)
+    assert list(zip(starts, ends)) == [(1800, 5400), (-1800, 1800)]
+
+
+def test_analyse_annotates_gaps():
+    today = channel_day(
+        ["00-00-00-bbconehd-12-00-00", "13-00-00-bbconehd-11-00-00", "bad-folder"], [100, 100],
+        markers={'restarts': [43500], 'missed': [46500, 80000]},
+    )
+    entry = coverage_report.analyse(channel(), DAY, today, None)
+    assert entry['covered'] == 82800
+    assert entry['coverage'] == 95.83
+    assert entry['rejected'] == ["bad-folder"]
+    gap = entry['gaps'][0]
+    assert (gap['start'], gap['end'], gap['seconds']) == ("12:00:00", "13:00:00", 3600)
+    assert gap['restarts'] == ["12:05:00"]
+    assert gap['missed'] == ["12:55:00"]
+
+
+def test_channel_day_scans_both_paths(tmp_path, monkeypatch):
+    storage = tmp_path / "storage"
+    stora = tmp_path / "stora"
+    monkeypatch.setattr(coverage_report, "STORAGE_PATH", str(storage))
+    monkeypatch.setattr(coverage_report, "STORA_PTH", str(stora))
+    local = storage / "2026/03/14/bbconehd"
+    moved = stora / "2026/03/14/bbconehd"
+    os.makedirs(local / "06-00-00-bbconehd-00-30-00")
+    os.makedirs(moved / "05-00-00-bbconehd-01-00-00")
+    (moved / "05-00-00-bbconehd-01-00-00" / coverage_report.STREAM).write_bytes(b"\x47" * 188)
+    (local / "restart_2026-03-14_06:10:00.txt").write_text("")
+    (local / coverage_report.RECORDING_LOG).write_text(
+        f"06:40:00 {coverage_report.MISSED}:\n06:41:00 Recording started\n"
+    )
+
+    day = coverage_report.channel_day("bbconehd", DAY)
+    assert day.listing.names == ["05-00-00-bbconehd-01-00-00", "06-00-00-bbconehd-00-30-00"]
+    assert list(day.sizes) == [188, 0]
+    assert day.markers == {'restarts': [22200], 'epg': [], 'missed': [24000]}
+
+
+def test_bst_windows_and_restarts_converted_to_utc(tmp_path, monkeypatch, london):
+    assert coverage_report.expected(channel("06:00:00", 12), BST_DAY) == [(18000, 61200)]
+    assert coverage_report.expected(channel(), BST_DAY) == [(0, 86400)]
+
+    storage = tmp_path / "storage"
+    monkeypatch.setattr(coverage_report, "STORAGE_PATH", str(storage))
+    monkeypatch.setattr(coverage_report, "STORA_PTH", str(tmp_path / "stora"))
+    today = storage / "2026/06/14/bbconehd"
+    tomorrow = storage / "2026/06/15/bbconehd"
+    os.makedirs(today / "10-00-00-bbconehd-01-00-00")
+    os.makedirs(tomorrow / "00-00-00-bbconehd-01-00-00")
+    (today / "restart_2026-06-14_00:30:00.txt").write_text("")
+    (today / "restart_2026-06-14_12:00:00.txt").write_text("")
+    (tomorrow / "restart_2026-06-15_00:30:00.txt").write_text("")
+    (today / "epgrecording_2026-06-14_10:00:00.txt").write_text("")
+    (tomorrow / "epgrecording_2026-06-15_00:10:00.txt").write_text("")
+
+    day = coverage_report.channel_day("bbconehd", BST_DAY)
+    assert day.listing.names == ["10-00-00-bbconehd-01-00-00"]
+    assert day.markers == {'restarts': [39600, 84600], 'epg': [36000], 'missed': []}
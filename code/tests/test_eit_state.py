@@ -0,0 +1,50 @@
+"""
+Tests for eit_state section tracking
+"""
+
+import eit_state
+
+
+def table(version, *events):
+    return {"serviceId": 6941, "tableId": 0x4E, "version": version, "events": list(events)}
+
+
+def test_first_read_reports_each_section():
+    state = eit_state.EitState(6941)
+    changes = state.update(table(3, {"eventId": 1, "runningStatus": 4}, {"eventId": 2, "runningStatus": 1}))
+    assert [change.key for change in changes] == [(6941, 0x4E, 0), (6941, 0x4E, 1)]
+    assert changes[0].event_id == 1
+    assert changes[0].running == "4"
+    assert state.running() == 1
+
+
+def test_unchanged_section_not_reported():
+    state = eit_state.EitState(6941)
+    events = table(3, {"eventId": 1, "runningStatus": 4}, {"eventId": 2, "runningStatus": 1})
+    state.update(events)
+    assert state.update(events) == []
+
+
+def test_version_change_reported():
+    state = eit_state.EitState(6941)
+    state.update(table(3, {"eventId": 1, "runningStatus": 4}, {"eventId": 2, "runningStatus": 1}))
+    changes = state.update(table(4, {"eventId": 2, "runningStatus": 4}, {"eventId": 3, "runningStatus": 1}))
+    assert [(change.version, change.event_id) for change in changes] == [(4, 2), (4, 3)]
+    assert state.running() == 2
+
+
+def test_running_flip_without_version():
+    state = eit_state.EitState(6941)
+    state.update(table(None, {"eventId": 2, "runningStatus": 1}))
+    assert state.running() is None
+    changes = state.update(table(None, {"eventId": 2, "runningStatus": 4}))
+    assert len(changes) == 1
+    assert state.running() == 2
+
+
+def test_bad_input_ignored():
+    state = eit_state.EitState()
+    assert state.update(None) == []
+    assert state.update("not a table") == []
+    assert state.update({"serviceId": "x"}) == []
+    assert state.update(table(1, "not an event")) == []
@@ -0,0 +1,180 @@
+"""
+Tests for fetch_stora_schedule horizon, conditional
+requests, breakers and streamed item parsing
+"""
+
+import datetime
+import os
+import types
+
+import pytest
+
+import fetch_stora_schedule as fetch
+
+BODY = (
+    '{"hasNext": false, "item": [{"title": "News", "dateTime": "2026-03-14T18:00:00.000Z", "duration": 30},'
+    ' {"title": "Gap", "dateTime": "2026-03-14T18:30:00.000Z", "duration": 0},'
+    ' {"title": "Film, part 1", "dateTime": "2026-03-14T18:30:00.000Z", "duration": 90}]}'
+)
+DAY = {"date": "2026-03-14", "offset": 3, "start": "2026-03-14T00:00:00", "end": "2026-03-14T23:59:00", "path": ""}
+
+
+class Response:
+    """
+    Streamed PATV response with a status and body
+    """
+
+    def __init__(self, status_code, body="", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+        self.closed = False
+
+    def iter_content(self, chunk_size, decode_unicode):
+        for pos in range(0, len(self.body), 7):
+            yield self.body[pos : pos + 7]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def patv(monkeypatch):
+    """
+    Replace requests.request with a recorder of
+    sent headers returning queued responses
+    """
+    sent = types.SimpleNamespace(headers=[], responses=[])
+
+    def request(method, url, headers, params, timeout, stream):
+        sent.headers.append(headers)
+        return sent.responses.pop(0)
+
+    module = types.SimpleNamespace(
+        request=request, exceptions=types.SimpleNamespace(RequestException=OSError),
+    )
+    monkeypatch.setattr(fetch, "requests", module)
+    monkeypatch.setattr(fetch, "BREAKERS", {})
+    return sent
+
+
+@pytest.fixture
+def schedules(tmp_path, monkeypatch):
+    """
+    Empty schedules folder in place of STORA_FOLDERS
+    """
+    monkeypatch.setattr(fetch, "SCHEDULE_PATH", str(tmp_path))
+    return tmp_path
+
+
+def test_date_range_offsets():
+    today = datetime.date(2026, 3, 11)
+    horizon = fetch.date_range(today + datetime.timedelta(days=1), 3, today)
+    assert [day["offset"] for day in horizon] == [1, 2, 3]
+    assert horizon[2]["date"] == "2026-03-14"
+    assert (horizon[2]["start"], horizon[2]["end"]) == ("2026-03-14T00:00:00", "2026-03-14T23:59:00")
+
+
+def test_refresh_due_far_days(schedules, monkeypatch):
+    monkeypatch.setattr(fetch, "NEAR_DAYS", 2)
+    recent = {"fetched": datetime.datetime.now().strftime(fetch.STATE_FORMAT)}
+    stale = {"fetched": (datetime.datetime.now() - datetime.timedelta(hours=fetch.FAR_REFRESH)).strftime(fetch.STATE_FORMAT)}
+    assert fetch.refresh_due({}, "bbconehd", DAY)
+    assert fetch.refresh_due(recent, "bbconehd", dict(DAY, offset=2))
+    # No schedule written yet for the far day
+    assert fetch.refresh_due(recent, "bbconehd", DAY)
+    with open(fetch.schedule_path("bbconehd", DAY["date"]), "w") as file:
+        file.write("[]")
+    assert not fetch.refresh_due(recent, "bbconehd", DAY)
+    assert fetch.refresh_due(stale, "bbconehd", DAY)
+
+
+def test_fetch_sends_conditional_headers(patv):
+    entry = {"etag": '"abc"', "last_modified": "Sat, 14 Mar 2026 06:00:00 GMT"}
+    patv.responses.extend([Response(304), Response(200, BODY)])
+    assert fetch.fetch("PA_BBCONE", DAY, entry).status_code == 304
+    assert patv.headers[0]["If-None-Match"] == '"abc"'
+    assert patv.headers[0]["If-Modified-Since"] == entry["last_modified"]
+    fetch.fetch("PA_BBCONE", DAY)
+    assert "If-None-Match" not in patv.headers[1]
+
+
+def test_stream_items_across_chunks():
+    chunks = [BODY[pos : pos + 5] for pos in range(0, len(BODY), 5)]
+    titles = [item["title"] for item in fetch.stream_items(chunks)]
+    assert titles == ["News", "Gap", "Film, part 1"]
+    with pytest.raises(ValueError):
+        list(fetch.stream_items(['{"item": [{"title": "News"}']))
+    with pytest.raises(ValueError):
+        list(fetch.stream_items(['{"error": "none"}']))
+
+
+def test_schedule_extraction_skips_empty_items():
+    assert fetch.schedule_extraction([BODY], "bbconehd") == [
+        {"start": "2026-03-14 18:00:00", "duration": 30, "channel": "bbconehd", "programme": "News"},
+        {"start": "2026-03-14 18:30:00", "duration": 90, "channel": "bbconehd", "programme": "Film, part 1"},
+    ]
+    assert fetch.schedule_extraction(['{"item": [{"title"'], "bbconehd") is False
+
+
+def test_breaker_opens_at_threshold(monkeypatch):
+    monkeypatch.setattr(fetch, "BREAKERS", {})
+    monkeypatch.setattr(fetch, "BREAKER_THRESHOLD", 2)
+    fetch.trip_breaker("bbconehd")
+    assert not fetch.breaker_open("bbconehd")
+    fetch.trip_breaker("bbconehd")
+    assert fetch.breaker_open("bbconehd")
+    fetch.trip_breaker("itv1", permanent=True)
+    assert fetch.breaker_open("itv1")
+    assert not fetch.breaker_open("five")
+
+
+def test_fetch_status_errors(patv):
+    patv.responses.extend([Response(404), Response(503), Response(429)])
+    with pytest.raises(fetch.ChannelError):
+        fetch.fetch("PA_BBCONE", DAY)
+    with pytest.raises(fetch.FetchError):
+        fetch.fetch("PA_BBCONE", DAY)
+    with pytest.raises(fetch.FetchError):
+        fetch.fetch("PA_BBCONE", DAY)
+
+
+def test_fetch_schedule_parses_and_hashes(patv):
+    patv.responses.append(Response(200, BODY, {"ETag": '"abc"', "Last-Modified": "Sat, 14 Mar 2026 06:00:00 GMT"}))
+    result = fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY)
+    assert result["etag"] == '"abc"'
+    assert len(result["hash"]) == 64
+    assert [item["programme"] for item in result["schedule"]] == ["News", "Film, part 1"]
+
+
+def test_fetch_schedule_not_modified(patv, schedules):
+    fetch.update_schedule("bbconehd", DAY["date"], [])
+    response = Response(304, headers={"ETag": '"abc"'})
+    patv.responses.append(response)
+    result = fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY, {"etag": '"abc"'})
+    assert "schedule" not in result
+    assert response.closed
+
+
+def test_fetch_schedule_unconditional_once_file_deleted(patv, schedules):
+    patv.responses.append(Response(200, BODY, {"ETag": '"abc"'}))
+    entry = fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY)
+    fetch.update_schedule("bbconehd", DAY["date"], entry.pop("schedule"))
+    patv.responses.append(Response(304, headers={"ETag": '"abc"'}))
+    assert "schedule" not in fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY, entry)
+    assert patv.headers[1]["If-None-Match"] == '"abc"'
+
+    os.remove(fetch.schedule_path("bbconehd", DAY["date"]))
+    patv.responses.append(Response(200, BODY, {"ETag": '"abc"'}))
+    result = fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY, entry)
+    assert "If-None-Match" not in patv.headers[2]
+    assert len(result["schedule"]) == 2
+
+
+def test_fetch_schedule_stops_when_budget_spent(patv, monkeypatch):
+    monkeypatch.setitem(fetch.RETRY_BUDGET, "remaining", 0)
+    patv.responses.extend([Response(200, '{"item": [{"title"'), Response(200, BODY)])
+    with pytest.raises(fetch.FetchError):
+        fetch.fetch_schedule("bbconehd", "PA_BBCONE", DAY)
+    assert len(patv.headers) == 1
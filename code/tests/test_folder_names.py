@@ -0,0 +1,67 @@
+"""
+Tests for folder_names encode, parse and listings
+"""
+
+import datetime
+
+import folder_names
+
+DAY = "2026-03-14"
+
+
+def test_encode_parse_round_trip():
+    start = datetime.datetime(2026, 3, 14, 21, 5, 30)
+    name = folder_names.encode(start, "12345", 3600 + 25 * 60)
+    assert name == "21-05-30-12345-01-25-00"
+    folder = folder_names.parse(name, DAY)
+    assert folder.ident == "12345"
+    assert folder.start == start
+    assert folder.seconds == 5100
+    assert folder.duration_hms == "01-25-00"
+
+
+def test_parse_channel_ident_with_hyphens():
+    folder = folder_names.parse("06-00-00-bbc-news-00-30-00", DAY)
+    assert folder.ident == "bbc-news"
+    assert folder.end == datetime.datetime(2026, 3, 14, 6, 30)
+
+
+def test_parse_end_past_midnight():
+    folder = folder_names.parse("23-30-00-bbconehd-01-00-00", DAY)
+    assert folder.end == datetime.datetime(2026, 3, 15, 0, 30)
+
+
+def test_parse_rejects_other_names():
+    assert folder_names.parse("restart_2026-03-14_06:00:00.txt", DAY) is None
+    assert folder_names.parse("24-00-00-bbconehd-01-00-00", DAY) is None
+    assert folder_names.parse("06-00-00-bbconehd-01-60-00", DAY) is None
+
+
+def test_listing_matches_parse():
+    names = [
+        "06-00-00-bbconehd-00-30-00",
+        "recording.log",
+        "06-30-00-98765-01-00-00",
+        "23-45-00-bbconehd-00-30-00",
+    ]
+    listing = folder_names.parse_listing(names, DAY)
+    assert listing.rejected == ["recording.log"]
+    assert listing.names == [names[0], names[2], names[3]]
+    assert list(listing.starts) == [21600, 23400, 85500]
+    assert list(listing.ends) == [23400, 27000, 87300]
+    assert listing.folders() == [folder_names.parse(name, DAY) for name in listing.names]
+
+
+def test_listing_ended_and_running():
+    names = ["06-00-00-bbconehd-00-30-00", "06-30-00-bbconehd-01-00-00"]
+    listing = folder_names.parse_listing(names, DAY)
+    now = datetime.datetime(2026, 3, 14, 7, 0)
+    assert [folder.name for folder in listing.ended(now)] == [names[0]]
+    assert [folder.name for folder in listing.running(now)] == [names[1]]
+
+
+def test_midnight_accepts_str_date_and_datetime():
+    expected = datetime.datetime(2026, 3, 14)
+    assert folder_names.midnight(DAY) == expected
+    assert folder_names.midnight(datetime.date(2026, 3, 14)) == expected
+    assert folder_names.midnight(datetime.datetime(2026, 3, 14, 12, 1)) == expected
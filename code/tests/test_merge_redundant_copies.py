@@ -0,0 +1,88 @@
+"""
+Tests for merge_redundant_copies pairing, scoring and splicing
+"""
+
+import json
+import os
+
+import merge_redundant_copies as merge
+
+
+def packet(pid, counter, fill=0):
+    return bytes([0x47, pid >> 8, pid & 0xFF, 0x10 | counter]) + bytes([fill]) * 184
+
+
+def stream(pid, counters):
+    return b"".join(packet(pid, num % 16, num % 251) for num in counters)
+
+
+def test_pair_by_name_then_start():
+    local = {"06-00-00-12345-00-30-00": "", "07-00-00-bbconehd-01-00-00": ""}
+    assert merge.pair("06-00-00-12345-00-30-00", local) == "06-00-00-12345-00-30-00"
+    assert merge.pair("07-00-00-67890-01-00-00", local) == "07-00-00-bbconehd-01-00-00"
+    assert merge.pair("08-00-00-bbconehd-01-00-00", local) is None
+
+
+def test_score_prefers_fewer_losses_then_more_bytes():
+    clean = {'lost': 0, 'cc_errors': 0, 'gap_seconds': 0.0, 'bytes': 100000}
+    bigger = dict(clean, bytes=100010)
+    lossy = dict(clean, lost=3, cc_errors=1, bytes=100020)
+    assert sorted([lossy, clean, bigger], key=lambda quality: merge.score(quality, 100020)) == [bigger, clean, lossy]
+
+
+def test_score_missing_programme_before_losses():
+    full = {'lost': 1, 'cc_errors': 1, 'gap_seconds': 0.0, 'bytes': 100000}
+    short = {'lost': 0, 'cc_errors': 0, 'gap_seconds': 0.0, 'bytes': 90000}
+    assert merge.score(full, 100000) < merge.score(short, 100000)
+
+
+def test_merge_pair_keeps_full_copy_over_short_clean_one(tmp_path):
+    local = tmp_path / "local"
+    partner = tmp_path / "partner"
+    local.mkdir()
+    partner.mkdir()
+    full = stream(0x100, list(range(59)) + [60])
+    (local / merge.STREAM).write_bytes(stream(0x100, range(30)))
+    (partner / merge.STREAM).write_bytes(full)
+    merge.merge_pair(str(local), str(partner), False)
+    assert (local / merge.STREAM).read_bytes() == full
+    assert json.loads((local / merge.QUALITY).read_text())['lost'] == 1
+
+
+def test_scan_quality_counts_continuity_gaps(tmp_path):
+    fpath = tmp_path / merge.STREAM
+    counters = list(range(0, 20)) + list(range(23, 40))
+    fpath.write_bytes(stream(0x100, counters) + packet(merge.NULL_PID, 0))
+    quality = merge.scan_quality(str(fpath))
+    assert quality['cc_errors'] == 1
+    assert quality['lost'] == 3
+    assert quality['losses'] == [20 * merge.TS_SIZE]
+    assert quality['bytes'] == 38 * merge.TS_SIZE
+
+
+def test_splice_fills_lost_packets(tmp_path):
+    whole = stream(0x100, range(60))
+    lossy = stream(0x100, list(range(30)) + list(range(34, 60)))
+    primary = tmp_path / "primary.ts"
+    secondary = tmp_path / "secondary.ts"
+    outfile = tmp_path / "out.ts"
+    primary.write_bytes(lossy)
+    secondary.write_bytes(whole)
+    losses = merge.scan_quality(str(primary))['losses']
+    assert merge.splice(str(primary), str(secondary), losses, str(outfile)) == 4
+    assert outfile.read_bytes() == whole
+
+
+def test_merge_pair_keeps_better_copy(tmp_path):
+    local = tmp_path / "local"
+    partner = tmp_path / "partner"
+    local.mkdir()
+    partner.mkdir()
+    whole = stream(0x100, range(60))
+    (local / merge.STREAM).write_bytes(stream(0x100, list(range(30)) + list(range(34, 60))))
+    (partner / merge.STREAM).write_bytes(whole)
+    merge.merge_pair(str(local), str(partner), False)
+    assert (local / merge.STREAM).read_bytes() == whole
+    quality = json.loads((local / merge.QUALITY).read_text())
+    assert quality['merged'] == {'source': 'partner', 'spliced_packets': 0}
+    assert os.path.exists(partner / merge.STREAM)
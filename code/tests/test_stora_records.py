@@ -0,0 +1,62 @@
+"""
+Tests for stora_records record types
+"""
+
+import calendar
+import datetime
+
+import stora_records
+
+
+def dvbtee_event(event_id, running, start, minutes, title="News"):
+    begin = calendar.timegm(start.timetuple())
+    return {
+        "eventId": event_id,
+        "runningStatus": running,
+        "unixTimeBegin": begin,
+        "unixTimeEnd": begin + minutes * 60,
+        "descriptors": [{"name": f"\x86{title}\x87", "text": "Latest headlines"}],
+    }
+
+
+def test_hms_wraps_at_day():
+    assert stora_records.hms(3725) == "01-02-05"
+    assert stora_records.hms(86400 + 60) == "00-01-00"
+
+
+def test_eit_event_from_dvbtee():
+    start = datetime.datetime(2026, 3, 14, 18, 0)
+    event = stora_records.EitEvent.from_dvbtee(dvbtee_event(101, 4, start, 30))
+    assert event.event_id == 101
+    assert event.running == "4"
+    assert event.title == "News"
+    assert event.start == start
+    assert event.minutes == 30
+    assert (event.start_hms, event.end_hms, event.duration_hms) == ("18-00-00", "18-30-00", "00-30-00")
+
+
+def test_eit_event_missing_times():
+    assert stora_records.EitEvent.from_dvbtee({"eventId": 1}) is None
+    event = stora_records.EitEvent.from_dvbtee({"unixTimeBegin": 0, "unixTimeEnd": 60})
+    assert (event.title, event.desc) == ("", "")
+
+
+def test_present_following():
+    start = datetime.datetime(2026, 3, 14, 18, 0)
+    events = {"events": [
+        dvbtee_event(101, 4, start, 30),
+        dvbtee_event(102, 1, start + datetime.timedelta(minutes=30), 60, "Film"),
+        dvbtee_event(103, 1, start + datetime.timedelta(minutes=90), 60),
+    ]}
+    running, not_running = stora_records.present_following(events)
+    assert list(running) == [101]
+    assert list(not_running) == [102]
+    assert stora_records.present_following(None) == ({}, {})
+
+
+def test_schedule_entry_json_round_trip():
+    entry = {"start": "2026-03-14 23:30:00", "duration": 45, "channel": "bbconehd", "programme": "Film, part 1"}
+    record = stora_records.ScheduleEntry.from_json(entry)
+    assert record.end == datetime.datetime(2026, 3, 15, 0, 15)
+    assert record.programme == "Film, part 1"
+    assert record.to_json() == entry
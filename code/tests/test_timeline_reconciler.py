@@ -0,0 +1,109 @@
+"""
+Tests for timeline_reconciler boundary choice and drift
+"""
+
+import calendar
+import datetime
+
+import stora_records
+import timeline_reconciler
+
+START = datetime.datetime(2026, 3, 14, 18, 0)
+
+
+def recording(start, minutes, title):
+    return stora_records.Recording(
+        "rtp://@:30001", "bbconehd", start, minutes,
+        start + datetime.timedelta(minutes=minutes), title, 6941,
+    )
+
+
+def schedule():
+    half = datetime.timedelta(minutes=30)
+    return {
+        "news": recording(START, 30, "News"),
+        "quiz": recording(START + half, 30, "Quiz"),
+        "film": recording(START + 2 * half, 90, "Film"),
+    }
+
+
+def eit(*events):
+    table = []
+    for event_id, running, start, minutes, title in events:
+        begin = calendar.timegm(start.timetuple())
+        table.append({
+            "eventId": event_id, "runningStatus": running, "unixTimeBegin": begin,
+            "unixTimeEnd": begin + minutes * 60, "descriptors": [{"name": title, "text": ""}],
+        })
+    return {"events": table}
+
+
+def reconciler():
+    logged = []
+    timeline = timeline_reconciler.TimelineReconciler(logged.append)
+    timeline.update_schedule(schedule())
+    return timeline, logged
+
+
+def test_current_from_schedule():
+    timeline, logged = reconciler()
+    data, start = timeline.current(START + datetime.timedelta(minutes=40))
+    assert data.programme == "Quiz"
+    assert start == data.start
+    assert logged[-1].startswith("Boundary from schedule")
+    assert timeline.current(START - datetime.timedelta(minutes=1)) == (None, None)
+
+
+def test_match_prefers_title():
+    timeline, _ = reconciler()
+    between = START + datetime.timedelta(minutes=15)
+    event = stora_records.EitEvent(1, "1", between, between, "\x86QUIZ", "")
+    assert timeline.match(event).programme == "Quiz"
+    assert timeline.match(event._replace(title="News")).programme == "News"
+    assert timeline.match(event._replace(start=START - datetime.timedelta(hours=1))) is None
+
+
+def test_eit_following_moves_boundary():
+    timeline, logged = reconciler()
+    late = START + datetime.timedelta(minutes=35)
+    now = START + datetime.timedelta(minutes=31)
+    timeline.update_eit(eit((1, 4, START, 35, "News"), (2, 1, late, 25, "Quiz")), now)
+    data, start = timeline.current(now)
+    assert data.programme == "News"
+    data, start = timeline.current(late)
+    assert (data.programme, start) == ("Quiz", late)
+    assert any("starts +300s from schedule" in line for line in logged)
+    assert logged[-1].startswith("Boundary from EIT following")
+
+
+def test_drift_from_observed_flips():
+    timeline, logged = reconciler()
+    before = START + datetime.timedelta(minutes=29)
+    flip = START + datetime.timedelta(minutes=32)
+    timeline.update_eit(eit((1, 4, START, 30, "News")), flip - datetime.timedelta(seconds=60))
+    timeline.update_eit(eit((2, 4, START + datetime.timedelta(minutes=30), 30, "Quiz")), flip)
+    assert timeline.drift(flip) == 120
+    assert any("flipped +120s" in line for line in logged)
+    # Held drift shifts schedule starts without fresh EIT
+    later = flip + datetime.timedelta(minutes=29)
+    timeline.following = None
+    data, start = timeline.current(later)
+    assert data.programme == "Quiz"
+    assert start == START + datetime.timedelta(minutes=32)
+    assert timeline.drift(flip + datetime.timedelta(seconds=timeline_reconciler.DRIFT_HOLD + 1)) == 0
+    assert timeline.current(before)[0].programme == "News"
+
+
+def test_flip_after_long_gap_not_drift():
+    timeline, _ = reconciler()
+    flip = START + datetime.timedelta(minutes=32)
+    timeline.update_eit(eit((1, 4, START, 30, "News")), START)
+    timeline.update_eit(eit((2, 4, START + datetime.timedelta(minutes=30), 30, "Quiz")), flip)
+    assert timeline.drifts == []
+
+
+def test_drift_capped():
+    timeline, _ = reconciler()
+    timeline.drifts = [5000, 5000, 5000]
+    timeline.drift_seen = START
+    assert timeline.drift(START) == timeline_reconciler.MAX_DRIFT
@@ -0,0 +1,51 @@
+"""
+Tests for ts_filter ServiceFilter PID selection
+"""
+
+import ts_filter
+
+
+def packet(pid, payload=b"", start=False):
+    header = bytes([0x47, (0x40 if start else 0) | pid >> 8, pid & 0xFF, 0x10])
+    return (header + payload).ljust(ts_filter.TS_SIZE, b"\xff")
+
+
+def section(table_id, ident, body):
+    length = 5 + len(body) + 4
+    return bytes([table_id, 0xB0 | length >> 8, length & 0xFF, ident >> 8, ident & 0xFF, 0xC1, 0, 0]) + body + b"\0" * 4
+
+
+def pat(*programmes):
+    body = b"".join(bytes([num >> 8, num & 0xFF, 0xE0 | pid >> 8, pid & 0xFF]) for num, pid in programmes)
+    return packet(ts_filter.PAT_PID, b"\0" + section(0x00, 1, body), True)
+
+
+def pmt(pid, sid, pcr, *streams):
+    body = bytes([0xE0 | pcr >> 8, pcr & 0xFF, 0xF0, 0])
+    body += b"".join(bytes([0x02, 0xE0 | es >> 8, es & 0xFF, 0xF0, 0]) for es in streams)
+    return packet(pid, b"\0" + section(0x02, sid, body), True)
+
+
+def test_keeps_service_pids_after_pmt():
+    service = ts_filter.ServiceFilter(6941)
+    table = pat((6941, 0x100), (6942, 0x200))
+    programme = pmt(0x100, 6941, 0x101, 0x101, 0x102)
+    other = pmt(0x200, 6942, 0x201, 0x201)
+    video, foreign, null = packet(0x101), packet(0x201), packet(ts_filter.NULL_PID)
+
+    # Everything but nulls is kept until the PMT is read
+    assert service.filter(table + foreign + null) == table + foreign
+    assert service.filter(other + programme + video + foreign + packet(ts_filter.EIT_PID)) == (
+        other + programme + video + packet(ts_filter.EIT_PID)
+    )
+    assert service.keep == ts_filter.SI_PIDS | {0x100, 0x101, 0x102}
+    assert service.counts == {"kept": 6, "null": 1, "foreign": 1, "unsynced": 0}
+
+
+def test_partial_packets_and_resync():
+    service = ts_filter.ServiceFilter(6941)
+    data = packet(0x101) + packet(0x102)
+    assert service.filter(data[:200]) == data[:188]
+    assert service.filter(data[200:]) == data[188:]
+    assert service.filter(b"\x00" * 12 + data) == data
+    assert service.counts["unsynced"] == 12
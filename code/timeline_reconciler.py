@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Keeps the PATV schedule and EIT present/following timelines for
+one channel in memory, so epg_assessment_channel_recorder.py can
+pick each programme boundary from the fresher, more trustworthy
+source without waiting on stream_schedule_checks*.py rewriting
+the schedule JSON.
+
+Trust order for the next boundary:
+1. EIT runningStatus flip, while EIT is being read
+2. EIT following event start, seen within EIT_HOLD seconds
+3. Schedule start shifted by the channel's observed drift, the
+   median difference of recent EIT flips from their scheduled
+   starts, held for DRIFT_HOLD seconds and capped at MAX_DRIFT
+4. Schedule start as published
+
+TimelineReconciler:
+1. update_schedule() takes parse_schedule() recordings
+2. update_eit() takes dvbtee EIT, matching present and following
+   events to schedule entries by start time and title, logging
+   each divergence once and recording drift at flips seen between
+   reads less than FLIP_GAP seconds apart
+3. current() returns the schedule entry on air by the reconciled
+   timeline and its start, logging which source decided it
+
+2026
+"""
+
+import datetime
+import statistics
+
+import stora_records
+
+MATCH_WINDOW = 900
+TOLERANCE = 60
+EIT_HOLD = 3600
+FLIP_GAP = 120
+DRIFT_HOLD = 7200
+MAX_DRIFT = 900
+DRIFT_SAMPLES = 3
+
+
+def clean_title(title):
+    """
+    Strip DVB emphasis codes and case for comparison
+    """
+    return " ".join(stora_records.clean_text(title).lower().split())
+
+
+class TimelineReconciler:
+    """
+    Schedule and EIT timelines for one channel
+    """
+
+    def __init__(self, log=print):
+        self.log = log
+        self.schedule = []
+        self.present = None
+        self.following = None
+        self.eit_seen = None
+        self.drifts = []
+        self.drift_seen = None
+        self.logged = set()
+        self.decided = None
+
+    def update_schedule(self, recordings):
+        """
+        Replace schedule timeline with parsed recordings
+        """
+        self.schedule = sorted(recordings.values(), key=lambda data: data.start)
+
+    def match(self, event):
+        """
+        Schedule entry nearest the event's start within
+        MATCH_WINDOW, preferring a title match
+        """
+        best = None
+        for data in self.schedule:
+            offset = abs((data.start - event.start).total_seconds())
+            if offset > MATCH_WINDOW:
+                continue
+            same = clean_title(data.programme or "") == clean_title(event.title)
+            rank = (not same, offset)
+            if best is None or rank < best[0]:
+                best = (rank, data)
+        return best[1] if best else None
+
+    def update_eit(self, events, now):
+        """
+        Take present/following from dvbtee EIT read
+        at UTC now, logging divergence from schedule
+        and recording drift when present changes
+        """
+        present = following = None
+        for event in (events or {}).get("events", [])[:2]:
+            event = stora_records.EitEvent.from_dvbtee(event)
+            if event is None:
+                continue
+            if event.running == "4":
+                present = event
+            elif event.running == "1":
+                following = event
+        if present is None and following is None:
+            return
+
+        # Only a change seen between close reads times a flip
+        watched = self.eit_seen and (now - self.eit_seen).total_seconds() <= FLIP_GAP
+        self.eit_seen = now
+        if present:
+            if watched and self.present and present.event_id != self.present.event_id:
+                self.record_drift(present, now)
+            self.present = present
+            self.diverge(present)
+        if following:
+            self.following = following
+            self.diverge(following)
+
+    def record_drift(self, present, now):
+        """
+        Drift of an observed flip from its scheduled start
+        """
+        data = self.match(present)
+        if not data:
+            return
+        drift = (now - data.start).total_seconds()
+        self.drifts = (self.drifts + [drift])[-DRIFT_SAMPLES:]
+        self.drift_seen = now
+        if abs(drift) > TOLERANCE:
+            self.log(f"Divergence: EventId {present.event_id} flipped {drift:+.0f}s from scheduled {data.start}")
+
+    def diverge(self, event):
+        """
+        Log once per event where EIT and schedule disagree
+        """
+        key = (event.event_id, event.start, event.end)
+        if key in self.logged or not self.schedule:
+            return
+        self.logged.add(key)
+        data = self.match(event)
+        if not data:
+            self.log(f"Divergence: EventId {event.event_id} {event.title} at {event.start} not in schedule")
+            return
+        offset = (event.start - data.start).total_seconds()
+        length = (event.end - event.start).total_seconds() - (data.end - data.start).total_seconds()
+        if abs(offset) > TOLERANCE:
+            self.log(f"Divergence: EventId {event.event_id} starts {offset:+.0f}s from schedule {data.start}")
+        if abs(length) > TOLERANCE:
+            self.log(f"Divergence: EventId {event.event_id} runs {length:+.0f}s from scheduled duration")
+        if clean_title(data.programme or "") != clean_title(event.title):
+            self.log(f"Divergence: EventId {event.event_id} '{event.title}' scheduled as '{data.programme}'")
+
+    def drift(self, now):
+        """
+        Median recent drift, zero once stale
+        """
+        if not self.drifts or (now - self.drift_seen).total_seconds() > DRIFT_HOLD:
+            return 0
+        return max(-MAX_DRIFT, min(MAX_DRIFT, statistics.median(self.drifts)))
+
+    def starts(self, now):
+        """
+        Reconciled start and source for every schedule entry
+        """
+        shift = datetime.timedelta(seconds=self.drift(now))
+        following = None
+        if self.following and self.eit_seen and (now - self.eit_seen).total_seconds() <= EIT_HOLD:
+            following = self.match(self.following)
+
+        timeline = []
+        for data in self.schedule:
+            if data is following:
+                timeline.append((self.following.start, "EIT following", data))
+            elif shift:
+                timeline.append((data.start + shift, "schedule with drift", data))
+            else:
+                timeline.append((data.start, "schedule", data))
+        timeline.sort(key=lambda item: item[0])
+        return timeline
+
+    def current(self, now):
+        """
+        Schedule entry on air at UTC now by the reconciled
+        timeline, with its reconciled start, or (None, None)
+        """
+        timeline = self.starts(now)
+        for num, (start, source, data) in enumerate(timeline):
+            end = timeline[num + 1][0] if num + 1 < len(timeline) else data.end
+            if start <= now < end:
+                if self.decided != (start, data.start):
+                    self.decided = (start, data.start)
+                    self.log(f"Boundary from {source}: {data.programme} at {start}, scheduled {data.start}")
+                return data, start
+        return None, None
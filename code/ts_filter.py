@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+"""
+Service level PID filter for MPEG-TS captures. Used by
+epg_assessment_channel_recorder.py when STORA_PID_FILTER is set
+so VLC's demux dump is written through a FIFO and only the
+configured SID's packets reach stream.mpeg2.ts.
+
+ServiceFilter.filter():
+1. Split incoming data into whole TS packets, holding any
+   partial packet over to the next chunk
+2. Drop null packets (PID 0x1FFF) always
+3. Assemble PAT sections to find the PMT PID for the SID,
+   then PMT sections for its PCR and elementary stream PIDs
+4. Once the PMT is known keep only PAT, CAT, the PMT, SDT,
+   EIT, TDT/TOT and the programme PIDs. Until then every
+   non-null packet is kept so nothing is lost at startup
+5. PAT or PMT version changes rebuild the kept PID set
+
+start_filter():
+1. Make a FIFO in a temporary folder and return its path
+   for VLC's --demuxdump-file
+2. A daemon thread reads the FIFO, filters and appends to
+   the real outfile until VLC closes it, then logs counts
+   and removes the FIFO
+3. cancel() releases a FIFO VLC never opened, for prepared
+   captures discarded before play()
+
+Usage, filtering an existing capture:
+python3 ts_filter.py stream.mpeg2.ts filtered.ts 6941
+
+2026
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+TS_SIZE = 188
+SYNC = 0x47
+CHUNK_SIZE = TS_SIZE * 7 * 64
+PAT_PID = 0x0000
+CAT_PID = 0x0001
+SDT_PID = 0x0011
+EIT_PID = 0x0012
+TDT_PID = 0x0014
+NULL_PID = 0x1FFF
+SI_PIDS = {PAT_PID, CAT_PID, SDT_PID, EIT_PID, TDT_PID}
+PENDING = {}
+
+
+class SectionReader:
+    """
+    Reassemble PSI/SI sections for one PID from
+    its TS packets using the pointer field
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.started = False
+
+    def feed(self, packet):
+        """
+        Add a packet's payload, return list of
+        complete sections it finished
+        """
+        flags = packet[3]
+        if not flags & 0x10:
+            return []
+        start = 4
+        if flags & 0x20:
+            start += 1 + packet[4]
+        payload = packet[start:TS_SIZE]
+        sections = []
+
+        if packet[1] & 0x40:
+            if not payload:
+                return []
+            pointer = payload[0]
+            if self.started:
+                self.buffer += payload[1 : 1 + pointer]
+                sections.extend(self.drain())
+            self.buffer = payload[1 + pointer :]
+            self.started = True
+        elif self.started:
+            self.buffer += payload
+        else:
+            return []
+
+        sections.extend(self.drain())
+        return sections
+
+    def drain(self):
+        """
+        Pop complete sections from the buffer
+        """
+        sections = []
+        while len(self.buffer) >= 3 and self.buffer[0] != 0xFF:
+            length = 3 + ((self.buffer[1] & 0x0F) << 8 | self.buffer[2])
+            if len(self.buffer) < length:
+                break
+            sections.append(self.buffer[:length])
+            self.buffer = self.buffer[length:]
+        if self.buffer[:1] == b"\xff":
+            self.buffer = b""
+            self.started = False
+        return sections
+
+
+def parse_pat(section):
+    """
+    Map of programme number to PMT PID
+    """
+    programmes = {}
+    end = len(section) - 4
+    for pos in range(8, end - 3, 4):
+        number = section[pos] << 8 | section[pos + 1]
+        pid = (section[pos + 2] & 0x1F) << 8 | section[pos + 3]
+        if number:
+            programmes[number] = pid
+    return programmes
+
+
+def parse_pmt(section):
+    """
+    Set of PCR and elementary stream PIDs
+    """
+    pids = {(section[8] & 0x1F) << 8 | section[9]}
+    pos = 12 + ((section[10] & 0x0F) << 8 | section[11])
+    end = len(section) - 4
+    while pos + 5 <= end:
+        pids.add((section[pos + 1] & 0x1F) << 8 | section[pos + 2])
+        pos += 5 + ((section[pos + 3] & 0x0F) << 8 | section[pos + 4])
+    pids.discard(NULL_PID)
+    return pids
+
+
+class ServiceFilter:
+    """
+    Keep one service's packets from a multi service TS
+    """
+
+    def __init__(self, sid):
+        self.sid = int(sid)
+        self.pmt_pid = None
+        self.versions = {}
+        self.readers = {PAT_PID: SectionReader()}
+        self.keep = None
+        self.carry = b""
+        self.counts = {"kept": 0, "null": 0, "foreign": 0, "unsynced": 0}
+
+    def filter(self, data):
+        """
+        Return kept whole packets from data,
+        holding a trailing partial packet
+        """
+        data = self.carry + data
+        kept = []
+        pos = 0
+        end = len(data) - TS_SIZE
+        while pos <= end:
+            if data[pos] != SYNC:
+                nxt = data.find(b"\x47", pos + 1)
+                self.counts["unsynced"] += (nxt if nxt >= 0 else len(data)) - pos
+                if nxt < 0:
+                    pos = len(data)
+                    break
+                pos = nxt
+                continue
+            packet = data[pos : pos + TS_SIZE]
+            pos += TS_SIZE
+            pid = (packet[1] & 0x1F) << 8 | packet[2]
+            if pid == NULL_PID:
+                self.counts["null"] += 1
+                continue
+            if pid in self.readers:
+                self.read_tables(pid, packet)
+            if self.keep is None or pid in self.keep:
+                kept.append(packet)
+            else:
+                self.counts["foreign"] += 1
+        self.carry = data[pos:]
+        self.counts["kept"] += len(kept)
+        return b"".join(kept)
+
+    def read_tables(self, pid, packet):
+        """
+        Update PMT PID and kept PIDs from PAT/PMT sections
+        """
+        for section in self.readers[pid].feed(packet):
+            if len(section) < 12:
+                continue
+            table_id = section[0]
+            version = (section[5] >> 1) & 0x1F
+            if pid == PAT_PID and table_id == 0x00:
+                if self.versions.get(PAT_PID) == version and self.pmt_pid is not None:
+                    continue
+                self.versions[PAT_PID] = version
+                pmt_pid = parse_pat(section).get(self.sid)
+                if pmt_pid is not None and pmt_pid != self.pmt_pid:
+                    self.readers.pop(self.pmt_pid, None)
+                    self.pmt_pid = pmt_pid
+                    self.readers[pmt_pid] = SectionReader()
+                    self.versions.pop("pmt", None)
+            elif pid == self.pmt_pid and table_id == 0x02:
+                programme = section[3] << 8 | section[4]
+                if programme != self.sid or self.versions.get("pmt") == version:
+                    continue
+                self.versions["pmt"] = version
+                self.keep = SI_PIDS | {self.pmt_pid} | parse_pmt(section)
+
+
+def filter_fifo(fifo, outfile, sid, folder):
+    """
+    Read VLC demux dump from FIFO, append kept
+    packets to outfile, then remove the FIFO
+    """
+    service = ServiceFilter(sid)
+    dest = None
+    try:
+        with open(fifo, "rb", buffering=0) as source:
+            PENDING.pop(outfile, None)
+            while True:
+                data = source.read(CHUNK_SIZE)
+                if not data:
+                    break
+                if dest is None:
+                    dest = open(outfile, "ab")
+                dest.write(service.filter(data))
+    except OSError as err:
+        print(f"PID filter failed for {outfile}: {err}")
+    finally:
+        if dest:
+            dest.close()
+        shutil.rmtree(folder, ignore_errors=True)
+    print(f"PID filter SID {sid} closed {outfile}: {service.counts}")
+
+
+def start_filter(outfile, sid):
+    """
+    Return FIFO path for VLC to dump into while
+    a thread filters it into outfile
+    """
+    folder = tempfile.mkdtemp(prefix="stora_filter_")
+    fifo = os.path.join(folder, "dump.ts")
+    os.mkfifo(fifo)
+    thread = threading.Thread(
+        target=filter_fifo, args=(fifo, outfile, sid, folder), name=f"filter-{sid}", daemon=True
+    )
+    PENDING[outfile] = fifo
+    thread.start()
+    return fifo
+
+
+def cancel(outfile):
+    """
+    Open and close a FIFO VLC never opened so
+    its filter thread sees EOF and cleans up
+    """
+    fifo = PENDING.pop(outfile, None)
+    if not fifo:
+        return
+    # No reader yet raises ENXIO, give the thread time to open
+    for _ in range(0, 10):
+        try:
+            os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            time.sleep(0.05)
+
+
+def main():
+    """
+    Filter an existing capture to one SID
+    """
+    if len(sys.argv) != 4:
+        sys.exit("Usage: ts_filter.py <infile> <outfile> <sid>")
+    service = ServiceFilter(sys.argv[3])
+    with open(sys.argv[1], "rb") as source, open(sys.argv[2], "wb") as dest:
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                break
+            dest.write(service.filter(data))
+    print(service.counts)
+
+
+if __name__ == "__main__":
+    main()